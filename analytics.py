@@ -0,0 +1,290 @@
+# analytics.py
+# Writing statistics for one diary: activity per day/week/month, streaks,
+# word counts, locked ratio and top terms.
+#
+#   stats = svc.analytics                 # DiaryStats, built on first use
+#   stats.summary()                       # everything below, as one dict
+#   stats.days["2025-01-02"], stats.weeks["2025-W01"], stats.months["2025-01"]
+#   stats.streaks()                       # (current, longest, last day of the longest)
+#   stats.heatmap(2025, 1)                # {day: level 1..4} for the calendar
+#
+# DiaryStats is a listener on the service's change feed (changes.py): each
+# change subtracts the entry's old contribution and adds the new one, so
+# the aggregates stay current without rescanning the diary. Word counts
+# come from the search index (SearchIndex.words), so no body is read.
+# A full build uses NumPy when it is installed, plain Python otherwise.
+
+import bisect
+import heapq
+from collections import Counter
+from datetime import date
+from changes import DELETED, RESET
+from instrument import traced
+
+WORD_BUCKETS = (0, 50, 100, 250, 500, 1000, 2500)  # lower edges of the histogram bins
+HEAT_WORDS = (150, 400, 900)  # words written on a day for heat levels 2, 3 and 4
+TOP_TERMS = 20
+STOP_WORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can
+could day did do does doing done down for from get got had has have he her here him his how i if
+in into is it its just like me more most my no not now of off on one only or other our out over
+so some than that the their them then there these they this to today too up us very was we
+were what when where which while who why will with would you your
+""".split())
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def heat_level(words: int) -> int:
+    """1 for a day with entries, up to 4 for a long writing day."""
+    return 1 + bisect.bisect_right(HEAT_WORDS, words or 0)
+
+
+def bucket_label(i: int) -> str:
+    lo = WORD_BUCKETS[i]
+    return f"{lo}-{WORD_BUCKETS[i + 1] - 1}" if i + 1 < len(WORD_BUCKETS) else f"{lo}+"
+
+
+class DiaryStats:
+    """Aggregates over a diary's entries, kept current by change events.
+
+    Per entry only (date, words, locked) is remembered, to take it back out
+    on an update or delete. Locked entries have no word count (their
+    content is ciphertext), nor do entries the index hasn't seen.
+    """
+
+    def __init__(self, entries, index, vectorized: bool = None):
+        self.entries = entries  # the service's list (reload() replaces it in place)
+        self.index = index
+        self.rebuild(vectorized)
+
+    # ---------------- building ----------------
+    @traced("analytics.rebuild")
+    def rebuild(self, vectorized: bool = None):
+        """Recount everything; vectorized=None uses NumPy if it is installed."""
+        words = self.index.words
+        self._rows = {}
+        for e in self.entries:
+            locked = bool(e.get("locked"))
+            self._rows[e["id"]] = (e.get("date") or "", None if locked else words.get(e["id"]), locked)
+        self.locked = 0
+        self.words_total = self.word_entries = 0
+        self.days, self.day_words = Counter(), Counter()
+        self.weeks, self.months = Counter(), Counter()
+        self.buckets = [0] * len(WORD_BUCKETS)
+        self._keys = {}       # day -> (week, month), None for a malformed date
+        self._ordinals = None  # sorted day ordinals, while the set of days is unchanged
+        self._top = None      # cached top_terms()
+        rows = list(self._rows.values())
+        self.total = len(rows)
+        if not rows:
+            return
+        np = _numpy() if vectorized is not False else None
+        if np is not None:
+            day_counts, day_words = self._count_numpy(np, rows)
+        else:
+            day_counts, day_words = self._count_python(rows)
+        for day, n in day_counts.items():
+            keys = self._keys_of(day)
+            if keys is None:
+                continue
+            self.days[day] = n
+            if day_words.get(day):
+                self.day_words[day] = day_words[day]
+            self.weeks[keys[0]] += n
+            self.months[keys[1]] += n
+
+    def _count_python(self, rows):
+        day_words = Counter()
+        for day, n, locked in rows:
+            if locked:
+                self.locked += 1
+            elif n is not None:
+                self.word_entries += 1
+                self.words_total += n
+                self.buckets[bisect.bisect_right(WORD_BUCKETS, n) - 1] += 1
+                if n:
+                    day_words[day] += n
+        return Counter(row[0] for row in rows), day_words
+
+    def _count_numpy(self, np, rows):
+        days, words, locked = zip(*rows)
+        words = np.array([-1 if n is None else n for n in words], dtype=np.int64)
+        locked = np.array(locked, dtype=bool)
+        self.locked = int(locked.sum())
+        known = words >= 0
+        self.word_entries = int(known.sum())
+        self.words_total = int(words[known].sum())
+        bins = np.searchsorted(np.array(WORD_BUCKETS), words[known], side="right") - 1
+        self.buckets = np.bincount(bins, minlength=len(WORD_BUCKETS)).tolist()
+        uniq, inverse, counts = np.unique(np.array(days), return_inverse=True, return_counts=True)
+        per_day_words = np.bincount(inverse, weights=np.where(known, words, 0), minlength=len(uniq))
+        uniq = uniq.tolist()
+        return dict(zip(uniq, counts.tolist())), {d: int(w) for d, w in zip(uniq, per_day_words.tolist()) if w}
+
+    def _keys_of(self, day):
+        keys = self._keys.get(day, False)
+        if keys is False:
+            try:
+                year, week, _ = date.fromisoformat(day).isocalendar()
+                keys = (f"{year}-W{week:02d}", day[:7])
+            except (TypeError, ValueError):
+                keys = None
+            self._keys[day] = keys
+        return keys
+
+    def _add(self, day, words, locked, sign):
+        self.total += sign
+        if locked:
+            self.locked += sign
+        if words is not None:
+            self.word_entries += sign
+            self.words_total += sign * words
+            self.buckets[bisect.bisect_right(WORD_BUCKETS, words) - 1] += sign
+        keys = self._keys_of(day)
+        if keys is None:
+            return
+        if _bump(self.days, day, sign) in (0, sign):
+            self._ordinals = None  # a day gained its first entry or lost its last
+        if words:
+            _bump(self.day_words, day, sign * words)
+        _bump(self.weeks, keys[0], sign)
+        _bump(self.months, keys[1], sign)
+
+    # ---------------- change listener ----------------
+    def __call__(self, changes):
+        for change in changes:
+            if change.kind == RESET:
+                self.rebuild()
+                return
+            self._top = None
+            old = self._rows.pop(change.entry_id, None)
+            if old is not None:
+                self._add(*old, -1)
+            if change.kind != DELETED:
+                entry = change.entry
+                locked = bool(entry.get("locked"))
+                row = (entry.get("date") or "", None if locked else self.index.words.get(entry["id"]), locked)
+                self._rows[entry["id"]] = row
+                self._add(*row, 1)
+
+    # ---------------- queries ----------------
+    def _sorted_ordinals(self):
+        if self._ordinals is None:
+            self._ordinals = sorted(date.fromisoformat(d).toordinal() for d in self.days)
+        return self._ordinals
+
+    def streaks(self, today: date = None):
+        """(current, longest, last day of the longest) in consecutive days with entries.
+
+        The current streak ends today or yesterday (today may still be written).
+        """
+        days = self._sorted_ordinals()
+        longest, end, run = 0, None, 0
+        for i, o in enumerate(days):
+            run = run + 1 if i and o == days[i - 1] + 1 else 1
+            if run > longest:
+                longest, end = run, o
+        t = (today or date.today()).toordinal()
+        i = bisect.bisect_right(days, t) - 1
+        current = 0
+        if i >= 0 and days[i] >= t - 1:
+            current = 1
+            while i > 0 and days[i - 1] == days[i] - 1:
+                current, i = current + 1, i - 1
+        return current, longest, date.fromordinal(end).isoformat() if end else None
+
+    def word_histogram(self):
+        """[(bucket label, entries)] for entries with a known word count."""
+        return [(bucket_label(i), n) for i, n in enumerate(self.buckets)]
+
+    def top_terms(self, n: int = TOP_TERMS):
+        """[(term, entries using it)] by document frequency, from the index's posting lists.
+
+        The counts are kept by the index; the top n is cached until the next change.
+        """
+        if self._top is None or self._top[0] < n:
+            postings = self.index.postings
+            self._top = (n, heapq.nlargest(n, ((len(docs), term) for term, docs in postings.items()
+                                               if len(term) > 2 and term not in STOP_WORDS and not term.isdigit())))
+        return [(term, count) for count, term in self._top[1][:n]]
+
+    def heatmap(self, year: int, month: int):
+        """{day: heat level} for the days of a month that have entries."""
+        prefix = f"{year:04d}-{month:02d}-"
+        levels = {}
+        for d in range(1, 32):
+            day = f"{prefix}{d:02d}"
+            if day in self.days:
+                levels[day] = heat_level(self.day_words.get(day, 0))
+        return levels
+
+    def summary(self, today: date = None) -> dict:
+        current, longest, longest_end = self.streaks(today)
+        days = self._sorted_ordinals()
+        busiest = max(self.days.items(), key=lambda kv: (kv[1], kv[0])) if self.days else None
+        return {
+            "entries": self.total,
+            "locked": self.locked,
+            "locked_ratio": round(self.locked / self.total, 4) if self.total else 0.0,
+            "days_written": len(days),
+            "first_date": date.fromordinal(days[0]).isoformat() if days else None,
+            "last_date": date.fromordinal(days[-1]).isoformat() if days else None,
+            "entries_per_day": round(self.total / len(days), 2) if days else 0.0,
+            "busiest_day": list(busiest) if busiest else None,
+            "streak": {"current": current, "longest": longest, "longest_end": longest_end},
+            "per_month": dict(sorted(self.months.items())),
+            "per_week": dict(sorted(self.weeks.items())),
+            "words": {"total": self.words_total, "entries": self.word_entries,
+                      "mean": round(self.words_total / self.word_entries, 1) if self.word_entries else 0.0,
+                      "histogram": dict(self.word_histogram())},
+            "top_terms": self.top_terms(),
+        }
+
+
+def _bump(counter, key, n):
+    """counter[key] += n, dropping keys that reach zero; returns the new value."""
+    value = counter[key] + n
+    if value:
+        counter[key] = value
+    else:
+        del counter[key]
+    return value
+
+
+def format_summary(s: dict, months: int = 12, weeks: int = 8) -> str:
+    """Plain-text report of a summary() (the dashboard's stats panel)."""
+    lines = [f"Entries      {s['entries']}   locked {s['locked']} ({s['locked_ratio']:.0%})"]
+    if s.get("first_date"):
+        lines.append(f"Written      {s['days_written']} days, {s['first_date']} to {s['last_date']}"
+                     f"   ({s['entries_per_day']} entries per day)")
+    if s.get("busiest_day"):
+        lines.append(f"Busiest day  {s['busiest_day'][0]} ({s['busiest_day'][1]} entries)")
+    streak = s["streak"]
+    lines.append(f"Streak       current {streak['current']} days, longest {streak['longest']}"
+                 + (f" (to {streak['longest_end']})" if streak["longest_end"] else ""))
+    words = s["words"]
+    lines.append(f"Words        {words['total']:,} in {words['entries']} entries, {words['mean']} on average")
+    for title, counts, keep in (("Per month", s["per_month"], months), ("Per week", s["per_week"], weeks)):
+        recent = list(counts.items())[-keep:]
+        if recent:
+            lines += ["", title]
+            lines += _bars(recent)
+    if words["entries"]:
+        lines += ["", "Words per entry"]
+        lines += _bars(list(words["histogram"].items()))
+    if s["top_terms"]:
+        lines += ["", "Top terms"]
+        lines += [f"  {term:<18} {count}" for term, count in s["top_terms"]]
+    return "\n".join(lines)
+
+
+def _bars(pairs, width=40):
+    top = max((n for _, n in pairs), default=0) or 1
+    return [f"  {label:<10} {n:>6}  {'#' * max(1 if n else 0, round(n * width / top))}" for label, n in pairs]
@@ -0,0 +1,55 @@
+# app.py
+# Single-process application shell: one Tk root that swaps the login and
+# dashboard frames, so logging in or out doesn't start a new interpreter.
+# Run with: python app.py  (login.py and dashboard.py start the same shell)
+import customtkinter as ctk
+from login import LoginFrame
+
+ctk.set_appearance_mode("light")
+ctk.set_default_color_theme("green")
+
+
+class DiaryApp(ctk.CTk):
+    def __init__(self):
+        super().__init__()
+        self.frame = None
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.show_login()
+
+    def _swap(self, frame):
+        if self.frame is not None:
+            if hasattr(self.frame, "close"):
+                self.frame.close()
+            self.frame.destroy()
+        self.frame = frame
+        frame.pack(fill="both", expand=True)
+
+    def show_login(self):
+        self.title("Diary — Login / Sign Up")
+        self.geometry("480x420")
+        self.resizable(False, False)
+        self._swap(LoginFrame(self, on_login=self.show_dashboard, on_login_started=self.preload_dashboard))
+
+    def preload_dashboard(self):
+        """Import the dashboard (tkcalendar, the service and its stores) before it is needed; crypto loads at unlock."""
+        import dashboard  # noqa: F401
+
+    def show_dashboard(self, username):
+        from dashboard import Dashboard
+        self.title(f"Diary — {username}")
+        self.resizable(True, True)
+        self.geometry("1100x650")
+        self._swap(Dashboard(self, username, on_logout=self.show_login))
+
+    def on_close(self):
+        if hasattr(self.frame, "close"):
+            self.frame.close()
+        self.destroy()
+
+
+def main():
+    DiaryApp().mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,55 @@
-import json
-import os
-import hashlib
 import base64
 import secrets
-
-USERS_FILE = "users.json"
+from passwords import hash_password, verify_password, needs_rehash
+from storage import get_driver
 
 
 def _load_users():
-    """Load user data from file."""
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
+    """Load user data from the storage driver."""
+    return get_driver().load_users()
 
 
 def _save_users(users):
-    """Save user data to file."""
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
-
-
-def hash_password(password: str):
-    """Generate a secure hash using PBKDF2."""
-    salt = secrets.token_bytes(16)
-    key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000)
-    return base64.b64encode(salt + key).decode()
-
-
-def verify_password(stored_hash: str, password: str):
-    """Verify a password against stored hash."""
-    data = base64.b64decode(stored_hash.encode())
-    salt, key = data[:16], data[16:]
-    new_key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000)
-    return new_key == key
+    """Save user data through the storage driver."""
+    get_driver().save_users(users)
 
 
 def signup(username: str, password: str):
     """Register a new user."""
-    users = _load_users()
-    if username in users:
+    # add_user checks and creates atomically, so two instances can't both win
+    if not get_driver().add_user(username, {"password": hash_password(password)}):
         return False, "Username already exists!"
-    users[username] = {"password": hash_password(password)}
-    _save_users(users)
     return True, "Account created successfully!"
 
 
 def login(username: str, password: str):
     """Validate login credentials."""
-    users = _load_users()
-    if username not in users:
+    user = get_driver().get_user(username)
+    if user is None:
         return False, "User not found!"
-    stored_hash = users[username]["password"]
+    stored_hash = user["password"]
     if verify_password(stored_hash, password):
+        if needs_rehash(stored_hash):
+            # upgrade to the current algorithm/cost while we have the password
+            _rehash(username, stored_hash, password)
         return True, "Login successful!"
     return False, "Incorrect password!"
+
+
+def _rehash(username: str, old_hash: str, password: str):
+    new_hash = hash_password(password)
+
+    def swap(user):
+        if user.get("password") == old_hash:  # unless it changed meanwhile
+            user["password"] = new_hash
+
+    get_driver().update_user(username, swap)
+
+
+def get_key_salt(username: str) -> bytes:
+    """Per-user salt for the encryption master key (created on first use)."""
+    def add_salt(user):
+        user.setdefault("key_salt", base64.b64encode(secrets.token_bytes(16)).decode())
+
+    user = get_driver().update_user(username, add_salt)
+    return base64.b64decode(user["key_salt"])
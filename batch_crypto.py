@@ -0,0 +1,72 @@
+# batch_crypto.py
+# Fan encrypt_text/decrypt_text out over a process pool for whole-diary jobs
+# (bulk unlock of per-entry-salt blobs, re-encryption, unlock-for-export).
+#
+# Each legacy blob needs its own 200k-iteration PBKDF2 run, so the work is
+# CPU-bound and independent per entry: processes (not threads) scale it.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils import encrypt_text, decrypt_text
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _encrypt_chunk(password, start, texts):
+    return start, [(True, encrypt_text(password, t)) for t in texts]
+
+
+def _decrypt_chunk(password, start, blobs):
+    out = []
+    for blob in blobs:
+        try:
+            out.append((True, decrypt_text(password, blob)))
+        except Exception as exc:
+            out.append((False, str(exc) or exc.__class__.__name__))
+    return start, out
+
+
+def _run(fn, password, items, workers=None, chunk_size=None, progress=None):
+    """Yield (index, ok, value) as chunks finish; progress(done, total) after each chunk."""
+    items = list(items)
+    total = len(items)
+    if not total:
+        return
+    workers = workers or default_workers()
+    # a few chunks per worker keeps the pool busy without per-item IPC overhead
+    chunk_size = chunk_size or max(1, total // (workers * 4))
+
+    if workers == 1:
+        done = 0
+        for start in range(0, total, chunk_size):
+            _, results = fn(password, start, items[start:start + chunk_size])
+            for k, (ok, value) in enumerate(results):
+                yield start + k, ok, value
+            done += len(results)
+            if progress:
+                progress(done, total)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fn, password, start, items[start:start + chunk_size])
+                   for start in range(0, total, chunk_size)]
+        done = 0
+        for fut in as_completed(futures):
+            start, results = fut.result()
+            for k, (ok, value) in enumerate(results):
+                yield start + k, ok, value
+            done += len(results)
+            if progress:
+                progress(done, total)
+
+
+def encrypt_many(password, texts, workers=None, chunk_size=None, progress=None):
+    """Encrypt many plaintexts; yields (index, ok, blob) in completion order."""
+    return _run(_encrypt_chunk, password, texts, workers, chunk_size, progress)
+
+
+def decrypt_many(password, blobs, workers=None, chunk_size=None, progress=None):
+    """Decrypt many blobs; yields (index, ok, plaintext or error message) in completion order."""
+    return _run(_decrypt_chunk, password, blobs, workers, chunk_size, progress)
@@ -0,0 +1,45 @@
+# bench_batch_crypto.py
+# Speedup of batch_crypto over worker counts.
+# Run from the repo root: python benchmarks/bench_batch_crypto.py [entries] [max_workers]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_crypto import encrypt_many, decrypt_many, default_workers  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = list(fn())
+    return time.perf_counter() - t0, out
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(8, default_workers())
+    texts = [f"Entry {i}: " + "lorem ipsum dolor sit amet " * 20 for i in range(n)]
+
+    print(f"{n} entries, {default_workers()} cores available")
+    print(f"{'workers':>8} {'encrypt s':>10} {'decrypt s':>10} {'speedup':>8}")
+    base = None
+    workers = 1
+    while workers <= max_workers:
+        enc_t, enc = timed(lambda: encrypt_many(PASSWORD, texts, workers=workers))
+        blobs = [None] * n
+        for i, ok, blob in enc:
+            blobs[i] = blob
+        dec_t, dec = timed(lambda: decrypt_many(PASSWORD, blobs, workers=workers))
+        assert all(ok for _, ok, _ in dec)
+        total = enc_t + dec_t
+        base = base or total
+        print(f"{workers:>8} {enc_t:>10.2f} {dec_t:>10.2f} {base / total:>7.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
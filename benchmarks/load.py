@@ -0,0 +1,208 @@
+# load.py
+# Load test for server.py: many concurrent keep-alive clients against one server process.
+#
+#   python benchmarks/load.py                                  # 20 users x 2k entries, 64 clients, 10 s
+#   python benchmarks/load.py --users 100 --entries 10000 --clients 256 --seconds 30
+#   python benchmarks/load.py --url http://127.0.0.1:8765 ...  # an already running server
+#
+# The server runs in its own process, in a scratch directory with fast
+# password hashing. Each client logs in as one of the users and loops over a
+# mix of reads (GET entry, search, list page) and writes (add, edit). Prints
+# requests/s and latency percentiles per kind.
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from urllib.parse import quote, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from synth import write_diary  # noqa: E402
+
+PASSWORD = "load-test-password"
+MIX = (("get", 50), ("search", 25), ("list", 10), ("add", 10), ("edit", 5))  # percent
+WORDS = ("coffee", "trip*", "rain walk", "\"morning coffee\"", "dinner", "proj*")
+
+
+class Conn:
+    """Minimal HTTP/1.1 keep-alive client on asyncio streams."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+        self.token = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b""
+        auth = f"Authorization: Bearer {self.token}\r\n" if self.token else ""
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n{auth}"
+                           f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode() + data)
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        length = 0
+        for line in lines[1:]:
+            if line.lower().startswith("content-length:"):
+                length = int(line.split(":", 1)[1])
+        payload = await self.reader.readexactly(length) if length else b""
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} -> {status} {payload[:200]!r}")
+        return json.loads(payload) if payload else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def client(host, port, username, ids, deadline, seed, timings):
+    rng = random.Random(seed)
+    conn = Conn(host, port)
+    conn.token = (await conn.request("POST", "/api/login", {"username": username, "password": PASSWORD}))["token"]
+    kinds = [kind for kind, weight in MIX for _ in range(weight)]
+    mine = []  # entries this client added, the only ones it edits (no lock conflicts)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rng.choice(kinds)
+            if kind == "edit" and not mine:
+                kind = "add"
+            t0 = time.perf_counter()
+            if kind == "get":
+                await conn.request("GET", "/api/entries/" + quote(rng.choice(ids)))
+            elif kind == "search":
+                await conn.request("GET", "/api/search?q=" + quote(rng.choice(WORDS)) + "&limit=50")
+            elif kind == "list":
+                await conn.request("GET", f"/api/entries?offset={rng.randrange(len(ids))}&limit=50")
+            elif kind == "add":
+                entry = await conn.request("POST", "/api/entries", {"title": "Load", "content": "coffee " * 40})
+                mine.append(entry["id"])
+            else:
+                await conn.request("PUT", "/api/entries/" + quote(rng.choice(mine)),
+                                   {"title": "Edited", "content": "rain walk " * 30})
+            timings.setdefault(kind, []).append(time.perf_counter() - t0)
+    finally:
+        conn.close()
+
+
+async def warm_up(host, port, username):
+    """Open the user's diary (load + search index) so the measurement is steady state."""
+    conn = Conn(host, port)
+    try:
+        conn.token = (await conn.request("POST", "/api/login", {"username": username, "password": PASSWORD}))["token"]
+        await conn.request("GET", "/api/stats")
+    finally:
+        conn.close()
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(timings, seconds):
+    total = sum(len(v) for v in timings.values())
+    print(f"{total} requests in {seconds:.1f} s: {total / seconds:,.0f} req/s")
+    print(f"{'kind':8} {'count':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    everything = []
+    for kind, _ in MIX:
+        values = sorted(timings.get(kind, ()))
+        everything += values
+        if values:
+            print(f"{kind:8} {len(values):8} {statistics.median(values) * 1e3:9.2f} "
+                  f"{_percentile(values, 0.99) * 1e3:9.2f} {values[-1] * 1e3:9.2f}")
+    everything.sort()
+    if everything:
+        print(f"{'all':8} {len(everything):8} {statistics.median(everything) * 1e3:9.2f} "
+              f"{_percentile(everything, 0.99) * 1e3:9.2f} {everything[-1] * 1e3:9.2f}")
+    return {"requests": total, "req_per_s": total / seconds,
+            "p50_ms": statistics.median(everything) * 1e3 if everything else None,
+            "p99_ms": _percentile(everything, 0.99) * 1e3 if everything else None}
+
+
+def setup(users, entries):
+    """Accounts and synthetic diaries in the current (scratch) directory."""
+    import auth
+    import passwords
+    passwords.save_params({"algorithm": "pbkdf2-sha256", "i": 1000})  # logins are not what we measure
+    for u in range(users):
+        username = f"load{u}"
+        auth.signup(username, PASSWORD)
+        write_diary("data", username, entries, seed=u)
+
+
+def _serve(workdir, workers, ports):
+    """Server process: the load generator must not share its CPU."""
+    os.chdir(workdir)
+    from server import DiaryServer
+
+    async def go():
+        server = DiaryServer(workers)
+        ports.put((await server.start("127.0.0.1", 0))[1])
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+    asyncio.run(go())
+
+
+async def run(args, host, port):
+    await asyncio.gather(*(warm_up(host, port, f"load{u}") for u in range(args.users)))
+    timings = {}
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    await asyncio.gather(*(client(host, port, f"load{c % args.users}", _ids(c % args.users, args.entries),
+                                  deadline, c, timings) for c in range(args.clients)))
+    return report(timings, time.perf_counter() - start)
+
+
+def _ids(user, entries):
+    return [f"{user:04x}{i:028x}" for i in range(entries)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the diary HTTP API.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--entries", type=int, default=2000, help="entries per diary")
+    parser.add_argument("--clients", type=int, default=64, help="concurrent connections")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, help="server executor threads")
+    parser.add_argument("--url", help="load an already running server (its users must exist)")
+    parser.add_argument("--json", help="also write the summary here")
+    args = parser.parse_args(argv)
+
+    out = os.path.abspath(args.json) if args.json else None
+    if args.url:
+        parts = urlsplit(args.url)
+        summary = asyncio.run(run(args, parts.hostname, parts.port or 80))
+    else:
+        with tempfile.TemporaryDirectory(prefix="diary-load-") as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                setup(args.users, args.entries)
+            finally:
+                os.chdir(cwd)
+            ports = multiprocessing.Queue()
+            proc = multiprocessing.Process(target=_serve, args=(workdir, args.workers, ports), daemon=True)
+            proc.start()
+            try:
+                summary = asyncio.run(run(args, "127.0.0.1", ports.get(timeout=60)))
+            finally:
+                proc.terminate()
+                proc.join()
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+# run.py
+# Benchmark suite for the diary's hot paths, on deterministic synthetic diaries.
+#
+#   python benchmarks/run.py                                  # all groups at 1k and 10k entries
+#   python benchmarks/run.py --sizes 1000,1000000 --only storage,search --json out.json
+#   python benchmarks/run.py --compare out.json               # exit 1 on a regression
+#   xvfb-run python benchmarks/run.py --only widgets          # widgets need a display
+#
+# Each benchmark reports the median and best per-call time of --repeat timed
+# samples (fast calls are looped), plus the peak traced allocation of one
+# extra call (skip with --no-memory).
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from synth import generate, write_diary  # noqa: E402
+
+PASSWORD = "benchmark-password"
+BENCHES = []  # (group, name, make) ; make(ctx) returns the callable to time
+
+
+class Skip(Exception):
+    """Raised by a benchmark whose dependencies (display, cryptography) are missing."""
+
+
+def bench(group, name):
+    def register(make):
+        BENCHES.append((group, name, make))
+        return make
+    return register
+
+
+class Context:
+    """Per-size fixtures, built on first use."""
+
+    def __init__(self, n, workdir):
+        self.n = n
+        self.workdir = workdir
+        self._entries = None
+        self._path = None
+        self._chunk_path = None
+        self._index = None
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = list(generate(self.n))
+        return self._entries
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = write_diary(os.path.join(self.workdir, "data"), "bench", self.n)
+        return self._path
+
+    @property
+    def chunk_path(self):
+        if self._chunk_path is None:
+            from chunkstore import ChunkedStore
+            store = ChunkedStore(self.scratch("bench.dat"))
+            store.compact(self.entries)
+            store.close()
+            self._chunk_path = store.snapshot_path
+        return self._chunk_path
+
+    @property
+    def index(self):
+        if self._index is None:
+            from search_index import SearchIndex
+            self._index = SearchIndex()
+            self._index.rebuild(self.entries)
+        return self._index
+
+    def scratch(self, name):
+        return os.path.join(self.workdir, name)
+
+
+# ---------------- storage ----------------
+@bench("storage", "load_eager")
+def _load_eager(ctx):
+    from journal import JournalStore
+    path = ctx.path
+    return lambda: JournalStore(path).load()
+
+
+@bench("storage", "load_lazy")
+def _load_lazy(ctx):
+    from journal import JournalStore
+    path = ctx.path
+    return lambda: JournalStore(path).load(lazy=True)
+
+
+@bench("storage", "load_chunked")
+def _load_chunked(ctx):
+    from chunkstore import ChunkedStore
+    path = ctx.chunk_path
+    return lambda: ChunkedStore(path).load(lazy=True)
+
+
+@bench("storage", "compact")
+def _compact(ctx):
+    from journal import JournalStore
+    store = JournalStore(ctx.scratch("compact.json"))
+    entries = ctx.entries
+    return lambda: store.compact(entries)
+
+
+@bench("storage", "compact_chunked")
+def _compact_chunked(ctx):
+    from chunkstore import ChunkedStore
+    store = ChunkedStore(ctx.scratch("compact.dat"))
+    entries = ctx.entries
+    return lambda: store.compact(entries)
+
+
+@bench("storage", "journal_append_100")
+def _append(ctx):
+    from journal import JournalStore
+    path = ctx.scratch("append.json")
+    shutil.copy(ctx.path, path)
+    store = JournalStore(path)
+    store.auto_compact = False
+    entries = store.load(lazy=True)[:100]
+
+    def run():
+        for entry in entries:
+            store.update(entry)
+    return run
+
+
+@bench("storage", "edit_burst_100")
+def _edit_burst(ctx):
+    """100 edits of 10 entries through the dashboard's write window: one 10-record write."""
+    from changes import Change, UPDATED, WriteCoalescer
+    from journal import JournalStore
+    path = ctx.scratch("burst.json")
+    shutil.copy(ctx.path, path)
+    store = JournalStore(path)
+    store.auto_compact = False
+    entries = store.load(lazy=True)[:10]
+    writes = WriteCoalescer(store.write_many, schedule=lambda: None)
+
+    def run():
+        for i in range(100):
+            writes([Change(UPDATED, entries[i % len(entries)])])
+        writes.flush()
+    return run
+
+
+@bench("storage", "import_parse")
+def _import_parse(ctx):
+    """importer.py's streaming read + validation of a JSONL export (no indexing, no write)."""
+    from importer import read_source, to_entry
+    from dates import parse_date
+    path = ctx.scratch("import.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in ctx.entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return lambda: [to_entry(item, "2025-01-01", parse_date) for _, item in read_source(path)]
+
+
+# ---------------- search ----------------
+@bench("search", "index_build")
+def _index_build(ctx):
+    from search_index import SearchIndex
+    entries = ctx.entries
+    return lambda: SearchIndex().rebuild(entries)
+
+
+@bench("search", "query_terms")
+def _query_terms(ctx):
+    index = ctx.index
+    return lambda: index.search("coffee garden")
+
+
+@bench("search", "query_prefix")
+def _query_prefix(ctx):
+    index = ctx.index
+    return lambda: index.search("moun*")
+
+
+@bench("search", "query_phrase")
+def _query_phrase(ctx):
+    index = ctx.index
+    return lambda: index.search('"morning coffee"')
+
+
+@bench("search", "linear_scan")
+def _linear_scan(ctx):
+    # what Dashboard.search did before the index, for comparison
+    entries = ctx.entries
+
+    def run():
+        kw = "coffee"
+        return [e for e in entries if kw in e.get("title", "").lower()
+                or (isinstance(e.get("content"), str) and kw in e["content"].lower())]
+    return run
+
+
+@bench("search", "date_range")
+def _date_range(ctx):
+    from date_index import DateIndex
+    dates = DateIndex(ctx.entries)
+    return lambda: dates.between("2019-01-01", "2019-12-31")
+
+
+# ---------------- analytics ----------------
+@bench("analytics", "rebuild")
+def _analytics_rebuild(ctx):
+    from analytics import DiaryStats
+    stats = DiaryStats(ctx.entries, ctx.index, vectorized=False)
+    return lambda: stats.rebuild(vectorized=False)
+
+
+@bench("analytics", "rebuild_numpy")
+def _analytics_rebuild_numpy(ctx):
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        raise Skip("numpy not installed")
+    from analytics import DiaryStats
+    stats = DiaryStats(ctx.entries, ctx.index, vectorized=True)
+    return lambda: stats.rebuild(vectorized=True)
+
+
+@bench("analytics", "update_100")
+def _analytics_update(ctx):
+    """100 change events (dates moved back and forth) applied to the aggregates."""
+    from analytics import DiaryStats
+    from changes import Change, UPDATED
+    stats = DiaryStats(ctx.entries, ctx.index, vectorized=False)
+    entries = [dict(e) for e in ctx.entries[:100]]
+
+    def run():
+        for e in entries:
+            e["date"], old = "2020-02-02" if e["date"] != "2020-02-02" else "2021-03-03", e["date"]
+            stats([Change(UPDATED, e, old)])
+    return run
+
+
+@bench("analytics", "summary")
+def _analytics_summary(ctx):
+    from analytics import DiaryStats
+    stats = DiaryStats(ctx.entries, ctx.index, vectorized=False)
+    return stats.summary
+
+
+# ---------------- crypto ----------------
+def _need_cryptography():
+    try:
+        import cryptography  # noqa: F401
+    except ImportError:
+        raise Skip("cryptography not installed")
+
+
+@bench("crypto", "encrypt_text_x5")
+def _encrypt_text(ctx):
+    _need_cryptography()
+    from utils import encrypt_text
+    texts = [e["content"] for e in ctx.entries if isinstance(e["content"], str)][:5]
+    return lambda: [encrypt_text(PASSWORD, t) for t in texts]
+
+
+@bench("crypto", "decrypt_text_x5")
+def _decrypt_text(ctx):
+    _need_cryptography()
+    from utils import encrypt_text, decrypt_text
+    blobs = [encrypt_text(PASSWORD, e["content"]) for e in ctx.entries if isinstance(e["content"], str)][:5]
+    return lambda: [decrypt_text(PASSWORD, b) for b in blobs]
+
+
+@bench("crypto", "session_roundtrip_x1000")
+def _session(ctx):
+    _need_cryptography()
+    from key_session import KeySession
+    keys = KeySession(PASSWORD, b"0" * 16)
+    texts = [e["content"] for e in ctx.entries if isinstance(e["content"], str)][:1000]
+    return lambda: [keys.decrypt(keys.encrypt(t)) for t in texts]
+
+
+@bench("crypto", "password_hash")
+def _password_hash(ctx):
+    from passwords import hash_password
+    return lambda: hash_password(PASSWORD)
+
+
+# ---------------- export ----------------
+def _export(fmt):
+    def make(ctx):
+        from exporter import export_entries
+        entries, out = ctx.entries, ctx.scratch(f"export.{fmt}")
+        return lambda: export_entries(entries, out, fmt)
+    return make
+
+
+for _fmt in ("pdf", "md", "jsonl"):
+    bench("export", _fmt)(_export(_fmt))
+
+
+# ---------------- widgets (needs a display, e.g. xvfb-run) ----------------
+_tk_root = None
+
+
+def _root():
+    global _tk_root
+    if _tk_root is not None:
+        for child in _tk_root.winfo_children():
+            child.destroy()
+        return _tk_root
+    if os.name != "nt" and not os.environ.get("DISPLAY"):
+        raise Skip("no display (run under xvfb-run)")
+    try:
+        import customtkinter as ctk
+    except ImportError:
+        raise Skip("customtkinter not installed")
+    _tk_root = ctk.CTk()
+    _tk_root.geometry("800x600")
+    _tk_root.update()
+    return _tk_root
+
+
+@bench("widgets", "list_set_items")
+def _list_set_items(ctx):
+    root = _root()
+    from widgets import VirtualList
+    lst = VirtualList(root, format_row=lambda e: (e["title"], "#61997F"), on_select=lambda *a: None)
+    lst.pack(fill="both", expand=True)
+    entries = ctx.entries
+
+    def run():
+        lst.set_items(entries)
+        root.update_idletasks()
+    return run
+
+
+@bench("widgets", "list_scroll_100")
+def _list_scroll(ctx):
+    root = _root()
+    from widgets import VirtualList
+    lst = VirtualList(root, format_row=lambda e: (e["title"], "#61997F"), on_select=lambda *a: None)
+    lst.pack(fill="both", expand=True)
+    lst.set_items(ctx.entries)
+    step = max(1, ctx.n // 100)
+
+    def run():
+        for i in range(0, ctx.n, step):
+            lst.scroll_to(i)
+            root.update_idletasks()
+    return run
+
+
+# ---------------- runner ----------------
+def measure(fn, repeat, memory, min_sample=0.01):
+    """Per-call seconds; fast calls are looped so each sample lasts at least min_sample."""
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - t0 >= min_sample or loops >= 1 << 16:
+            break
+        loops *= 2
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - t0) / loops)
+    result = {"median_s": statistics.median(times), "min_s": min(times), "loops": loops}
+    if memory:
+        tracemalloc.start()
+        fn()
+        result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results, baseline_path, threshold):
+    """Print best-time ratios against a previous run; returns the regressions.
+
+    Best (min) times are compared because they are the least noisy.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {(r["group"], r["name"], r["n"]): r for r in json.load(f)["results"] if "min_s" in r}
+    regressions = []
+    print(f"\n{'benchmark':<36} {'n':>8} {'base s':>10} {'now s':>10} {'ratio':>7}")
+    for r in results:
+        old = base.get((r["group"], r["name"], r["n"]))
+        if old is None or "min_s" not in r:
+            continue
+        ratio = r["min_s"] / old["min_s"] if old["min_s"] else 1.0
+        flag = "  <-- slower" if ratio > 1 + threshold else ""
+        print(f"{r['group'] + '.' + r['name']:<36} {r['n']:>8} {old['min_s']:>10.6f} "
+              f"{r['min_s']:>10.6f} {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diary benchmark suite.")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated entry counts")
+    parser.add_argument("--only", help="comma-separated groups or group.name")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    parser.add_argument("--compare", help="previous --json output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    only = set(args.only.split(",")) if args.only else None
+    sizes = [int(s) for s in args.sizes.split(",")]
+    results = []
+    print(f"{'benchmark':<36} {'n':>8} {'median s':>10} {'min s':>10} {'peak KB':>10}")
+    for n in sizes:
+        workdir = tempfile.mkdtemp(prefix=f"diary-bench-{n}-")
+        ctx = Context(n, workdir)
+        try:
+            for group, name, make in BENCHES:
+                if only and group not in only and f"{group}.{name}" not in only:
+                    continue
+                row = {"group": group, "name": name, "n": n}
+                try:
+                    row.update(measure(make(ctx), args.repeat, not args.no_memory))
+                except Skip as exc:
+                    row["skipped"] = str(exc)
+                    print(f"{group + '.' + name:<36} {n:>8}   skipped: {exc}")
+                else:
+                    print(f"{group + '.' + name:<36} {n:>8} {row['median_s']:>10.6f} "
+                          f"{row['min_s']:>10.6f} {row.get('peak_kb', ''):>10}")
+                results.append(row)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# sizes.py
+# At-rest size and throughput of the storage encodings, on the same synthetic diary.
+#
+#   python benchmarks/sizes.py                      # 10k entries
+#   python benchmarks/sizes.py -n 100000 --dup-ratio 0.05
+#
+# Compares the JSON snapshot that save_entries writes with the chunked file
+# (raw and with compressed, deduplicated bodies), and, when cryptography is
+# installed, legacy encrypt_text blobs with KeySession blobs (compressed,
+# single base64).
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from synth import generate  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+
+def _row(label, size, seconds, base=None):
+    ratio = f"{size / base:>7.2f}x" if base else f"{'':>8}"
+    mb = size / 1e6
+    print(f"{label:<34} {mb:>10.2f} MB {ratio} {mb / seconds if seconds else 0:>10.1f} MB/s")
+
+
+def files(entries, workdir):
+    from journal import JournalStore
+    from chunkstore import ChunkedStore, write_chunks
+
+    t0 = time.perf_counter()
+    store = JournalStore(os.path.join(workdir, "data.json"))
+    store.compact(entries)
+    store.close()
+    json_s = time.perf_counter() - t0
+    json_size = os.path.getsize(store.snapshot_path) + os.path.getsize(store.header_path)
+
+    results = [("json snapshot + idx (save_entries)", json_size, json_s)]
+    t0 = time.perf_counter()
+    for entry in JournalStore(store.snapshot_path).load(lazy=True):
+        entry.get("content")
+    results.append(("  read back every body", json_size, time.perf_counter() - t0))
+    for label, packed in (("chunked, raw bodies", False), ("chunked, compressed + dedup", True)):
+        path = os.path.join(workdir, f"data-{packed}.dat")
+        t0 = time.perf_counter()
+        with open(path, "wb") as f:
+            write_chunks(f, entries, 1, packed=packed)
+        write_s = time.perf_counter() - t0
+        results.append((label, os.path.getsize(path), write_s))
+        t0 = time.perf_counter()
+        for entry in ChunkedStore(path).load(lazy=True):
+            entry.get("content")
+        results.append(("  read back every body", os.path.getsize(path), time.perf_counter() - t0))
+
+    print(f"{'file (write unless noted)':<34} {'size':>13} {'vs json':>8} {'throughput':>15}")
+    for label, size, seconds in results:
+        _row(label, size, seconds, json_size)
+
+
+def blobs(entries, sample):
+    try:
+        from utils import encrypt_text
+        from key_session import KeySession
+    except ImportError:
+        print("\nblobs: skipped (cryptography not installed)")
+        return
+    texts = [e["content"] for e in entries if isinstance(e["content"], str)]
+    texts.sort(key=len, reverse=True)  # long pages are where encoding overhead shows
+    texts = texts[:sample]
+    plain = sum(len(t.encode()) for t in texts)
+
+    t0 = time.perf_counter()
+    legacy = [json.dumps(encrypt_text(PASSWORD, t)) for t in texts]
+    legacy_s = time.perf_counter() - t0
+    keys = KeySession(PASSWORD, b"0" * 16)
+    t0 = time.perf_counter()
+    session = [keys.encrypt(t) for t in texts]
+    session_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for blob in session:
+        keys.decrypt(blob)
+    decrypt_s = time.perf_counter() - t0
+    session_size = sum(len(json.dumps(b)) for b in session)
+
+    print(f"\n{len(texts)} longest bodies, {plain / 1e6:.2f} MB of plaintext")
+    _row("plaintext", plain, 0)
+    _row("encrypt_text blobs (legacy)", sum(map(len, legacy)), legacy_s, plain)
+    _row("KeySession blobs (compressed)", session_size, session_s, plain)
+    _row("  decrypt", session_size, decrypt_s, plain)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare at-rest encodings.")
+    parser.add_argument("-n", type=int, default=10_000, help="entries")
+    parser.add_argument("--dup-ratio", type=float, default=0.02, help="share of repeated bodies")
+    parser.add_argument("--sample", type=int, default=200, help="bodies to encrypt (legacy blobs are slow)")
+    args = parser.parse_args(argv)
+
+    entries = list(generate(args.n, dup_ratio=args.dup_ratio))
+    workdir = tempfile.mkdtemp(prefix="diary-sizes-")
+    try:
+        files(entries, workdir)
+        blobs(entries, args.sample)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# synth.py
+# Deterministic synthetic diaries for benchmarks (same seed -> same bytes).
+#
+#   from synth import generate, write_diary
+#   entries = list(generate(10_000))
+#   write_diary("data", "bench", 100_000)     # snapshot + header index on disk
+
+import base64
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = (
+    "morning coffee work meeting lunch walk park rain sun friend family call dinner "
+    "book read movie music run gym tired happy sad plan trip train city home garden "
+    "project deadline idea write note remember weekend market cook bread letter dream "
+    "beach mountain river snow summer winter spring autumn school class exam travel"
+).split()
+START = date(2015, 1, 1)
+
+
+def _sentence(rng, n):
+    words = [rng.choice(WORDS) for _ in range(n)]
+    return " ".join(words).capitalize() + "."
+
+
+def _body(rng, long_ratio):
+    # most entries are a few sentences; some are long journal pages
+    paragraphs = rng.randint(8, 40) if rng.random() < long_ratio else rng.randint(1, 3)
+    return "\n\n".join(" ".join(_sentence(rng, rng.randint(6, 18)) for _ in range(rng.randint(2, 6)))
+                       for _ in range(paragraphs))
+
+
+def _fake_blob(rng, size):
+    """Same shape and size as a KeySession blob (no real encryption: fast and crypto-free)."""
+    salt = base64.urlsafe_b64encode(rng.getrandbits(128).to_bytes(16, "big")).decode()
+    token = base64.b64encode(rng.randbytes(size + 57)).decode()
+    return {"v": 2, "salt": salt, "token": token}
+
+
+def generate(n, seed=1234, locked_ratio=0.15, long_ratio=0.1, days=3650, dup_ratio=0.0):
+    """Yield n entries, newest first (the dashboard's order).
+
+    dup_ratio: share of entries that repeat an earlier body (pasted templates, attachments).
+    """
+    rng = random.Random(seed)
+    bodies = []
+    for i in range(n):
+        day = START + timedelta(days=days - 1 - (i * days) // max(n, 1))
+        if dup_ratio and bodies and rng.random() < dup_ratio:
+            body = rng.choice(bodies)
+        else:
+            body = _body(rng, long_ratio)
+            if dup_ratio:
+                bodies.append(body)
+        locked = rng.random() < locked_ratio
+        yield {
+            "id": f"{seed:04x}{i:028x}",
+            "title": _sentence(rng, rng.randint(2, 6))[:-1],
+            "content": _fake_blob(rng, len(body)) if locked else body,
+            "date": day.isoformat(),
+            "locked": locked,
+        }
+
+
+def write_diary(data_dir, username, n, seed=1234, **kw):
+    """Write a diary of n entries as data_<user>.json (+ .idx); returns the snapshot path."""
+    from journal import JournalStore
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"data_{username}.json")
+    for stale in (path, path[:-5] + ".log", path[:-5] + ".idx"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    store = JournalStore(path)
+    store.compact(list(generate(n, seed, **kw)))
+    store.close()
+    return path
@@ -0,0 +1,144 @@
+# changes.py
+# Change events for a diary's entries, and the write coalescer that turns them into journal records.
+#
+#   feed = ChangeFeed()
+#   feed.subscribe(listener)          # listener(changes): a list of Change, in order
+#   feed.emit(Change(UPDATED, entry, old_date="2025-01-02"))
+#   with feed.batch():                # many changes, delivered as one list at the end
+#       ...
+#
+# DiaryService owns a feed and emits one Change per mutation. Its own
+# listeners run first (search/date indexes, then WriteCoalescer), so later
+# subscribers such as the dashboard see indexes that are already current.
+
+import contextlib
+
+INSERTED = "inserted"
+UPDATED = "updated"
+DELETED = "deleted"
+LOCKED = "locked"   # the lock flag changed: entry["locked"] tells which way
+RESET = "reset"     # everything may have changed (reload, bulk import); no entry
+
+
+class Change:
+    """One entry mutation.
+
+    journal is False for changes that are already on disk (another process
+    wrote them) or that a snapshot rewrite will cover (bulk operations).
+    """
+
+    __slots__ = ("kind", "entry", "old_date", "journal")
+
+    def __init__(self, kind: str, entry=None, old_date: str = None, journal: bool = True):
+        self.kind = kind
+        self.entry = entry
+        self.old_date = old_date  # date before an update (the calendar needs both days)
+        self.journal = journal
+
+    @property
+    def entry_id(self):
+        return self.entry["id"] if self.entry is not None else None
+
+    def __repr__(self):
+        return f"Change({self.kind!r}, {self.entry_id!r})"
+
+
+class ChangeFeed:
+    """Listeners for a diary's changes, called in subscription order."""
+
+    def __init__(self):
+        self._listeners = []
+        self._held = None  # changes collected inside batch()
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def emit(self, *changes):
+        if self._held is not None:
+            self._held.extend(changes)
+        else:
+            self._deliver(list(changes))
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Hold the changes made inside the block and deliver them as one list at the end."""
+        if self._held is not None:
+            yield  # nested: the outer batch delivers
+            return
+        self._held = []
+        try:
+            yield
+        finally:
+            held, self._held = self._held, None
+            if held:
+                self._deliver(held)
+
+    def _deliver(self, changes):
+        for listener in list(self._listeners):
+            listener(changes)
+
+
+class WriteCoalescer:
+    """Listener that turns changes into journal writes, one record per entry per window.
+
+    Changed entries are remembered, not copied: a flush writes each one as
+    it is then, so ten edits of an entry within the window cost one record,
+    and an entry added and deleted in between costs none. write(ops) gets
+    the (op, payload) pairs of a flush ("insert"/"update" with the entry,
+    "delete" with the id), in first-change order.
+
+    Without schedule every change is written at once. Otherwise the first
+    change after a flush calls schedule() and the owner calls flush() when
+    the window ends (and before closing).
+    """
+
+    def __init__(self, write, schedule=None):
+        self.write = write
+        self.schedule = schedule
+        self._dirty = {}    # entry id -> (op, entry)
+        self.changes = 0    # journaled changes seen
+        self.records = 0    # records handed to write()
+
+    def __len__(self):
+        return len(self._dirty)
+
+    def __call__(self, changes):
+        was_clean = not self._dirty
+        for change in changes:
+            if not change.journal or change.entry is None:
+                continue
+            self.changes += 1
+            entry_id = change.entry["id"]
+            pending = self._dirty.get(entry_id)
+            if change.kind == DELETED:
+                if pending is not None and pending[0] == "insert":
+                    del self._dirty[entry_id]  # never reached the disk
+                else:
+                    self._dirty[entry_id] = ("delete", change.entry)
+            elif pending is None or pending[0] == "delete":
+                self._dirty[entry_id] = ("insert" if change.kind == INSERTED else "update", change.entry)
+        if not self._dirty:
+            return
+        if self.schedule is None:
+            self.flush()
+        elif was_clean:
+            self.schedule()
+
+    def flush(self):
+        """Write every pending entry now; returns the number of records."""
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        ops = [(op, entry_id if op == "delete" else entry) for entry_id, (op, entry) in dirty.items()]
+        self.records += len(ops)
+        self.write(ops)
+        return len(ops)
+
+    def discard(self):
+        """Forget pending changes (a snapshot of the current entries is being written)."""
+        self._dirty.clear()
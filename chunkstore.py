@@ -0,0 +1,432 @@
+# chunkstore.py
+# Chunked binary storage for very large diaries: a fixed-width record table plus
+# a body heap, read through mmap so entries never have to be materialized.
+#
+# Layout of data/data_<user>.dat (all integers little-endian):
+#   header   magic "DIARYCH1", version, row size, entry count, seq, end of heap
+#   table    one 64-byte row per entry, in list order:
+#              date (10 ascii bytes), flags, then (offset, length) spans into
+#              the heap for id, title, content and extra (JSON of other fields)
+#   heap     the span bytes, UTF-8 (content is JSON for encrypted blobs);
+#            long bodies are zlib/lzma compressed, and identical long bodies
+#            are stored once (rows share the span, found by hash when written)
+#
+# Writes still go to an append-only journal (data_<user>.dat.log, same records
+# as journal.py) and compaction rewrites the .dat file; see ChunkedStore.
+#
+# load(lazy=True) returns EntryView objects: two slots each, fields are sliced
+# out of the mapping when read, so resident memory follows what is on screen
+# rather than the size of the diary. Select with DIARY_STORAGE=chunked; an
+# existing data_<user>.json (+ journal) is converted on first open.
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from collections.abc import MutableMapping
+from compression import compress, decompress
+from fileio import file_stamp, fsync_dir, locked
+from journal import COMPACT_EVERY, JournalStore, plain_entry
+from storage import JsonDriver, user_data_path
+
+MAGIC = b"DIARYCH1"
+VERSION = 2                               # 2: compressed bodies (1 is still read)
+HEADER = struct.Struct("<8sHHIQQ")       # magic, version, row size, count, seq, heap end
+ROW = struct.Struct("<10sB5x" + "QI" * 4)  # date, flags, 4 x (offset, length)
+ABSENT = 0xFFFFFFFF                       # span length of a missing field
+CHUNK_ROWS = 4096                         # table rows buffered per write
+DEDUP_MIN = 1024                          # bodies at least this long are deduplicated
+
+# flags
+LOCKED = 1
+HAS_LOCKED = 2      # the entry has a "locked" key (LOCKED is its value)
+HAS_DATE = 4        # the date column holds the entry's date
+CONTENT_JSON = 8    # content is a JSON value (encrypted blob), not text
+CONTENT_ZLIB = 16   # content span is compressed
+CONTENT_LZMA = 32
+_CODECS = {"zlib": CONTENT_ZLIB, "lzma": CONTENT_LZMA}
+
+_SLOTS = ("id", "title", "content")  # text fields with their own span; the 4th span is extra
+
+
+class ChunkFile:
+    """A chunk file mapped read-only; fields are sliced out of it on demand.
+
+    swap_lock is shared with the owning store, which holds it while it
+    replaces the file and moves views to the new one.
+    """
+
+    def __init__(self, path: str, swap_lock=None):
+        self.path = path
+        self.swap_lock = swap_lock or threading.RLock()
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, row_size, self.count, self.seq, heap_end = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or not 1 <= version <= VERSION or row_size != ROW.size:
+            self._mm.close()
+            raise ValueError(f"Not a diary chunk file: {path}")
+        if heap_end > len(self._mm):
+            self._mm.close()
+            raise ValueError(f"Truncated chunk file: {path}")
+
+    @property
+    def closed(self) -> bool:
+        return self._mm.closed
+
+    def close(self):
+        self._mm.close()
+
+    def _row(self, i):
+        return ROW.unpack_from(self._mm, HEADER.size + i * ROW.size)
+
+    def _span(self, row, slot):
+        offset, length = row[2 + 2 * slot], row[3 + 2 * slot]
+        return None if length == ABSENT else self._mm[offset:offset + length]
+
+    def _content(self, row):
+        raw = self._span(row, 2)
+        if raw is None:
+            return None
+        flags = row[1]
+        if flags & CONTENT_ZLIB:
+            raw = decompress("zlib", raw)
+        elif flags & CONTENT_LZMA:
+            raw = decompress("lzma", raw)
+        return json.loads(raw) if flags & CONTENT_JSON else raw.decode("utf-8")
+
+    def _extra(self, row) -> dict:
+        raw = self._span(row, 3)
+        return json.loads(raw) if raw is not None else {}
+
+    def get(self, i: int, key: str):
+        """Field `key` of entry i; KeyError if the entry has none."""
+        row = self._row(i)
+        slot = _SLOTS.index(key) if key in _SLOTS else None
+        if slot == 2:
+            if row[5] != ABSENT:
+                return self._content(row)
+        elif slot is not None:
+            raw = self._span(row, slot)
+            if raw is not None:
+                return raw.decode("utf-8")
+        elif key == "date" and row[1] & HAS_DATE:
+            return row[0].decode("ascii")
+        elif key == "locked" and row[1] & HAS_LOCKED:
+            return bool(row[1] & LOCKED)
+        return self._extra(row)[key]
+
+    def keys(self, i: int):
+        row = self._row(i)
+        keys = [key for slot, key in enumerate(_SLOTS) if row[3 + 2 * slot] != ABSENT]
+        if row[1] & HAS_DATE:
+            keys.append("date")
+        if row[1] & HAS_LOCKED:
+            keys.append("locked")
+        keys.extend(k for k in self._extra(row) if k not in keys)
+        return keys
+
+    def has(self, i: int, key: str) -> bool:
+        row = self._row(i)
+        if key in _SLOTS and row[3 + 2 * _SLOTS.index(key)] != ABSENT:
+            return True
+        if (key == "date" and row[1] & HAS_DATE) or (key == "locked" and row[1] & HAS_LOCKED):
+            return True
+        return key in self._extra(row)
+
+    def entry(self, i: int) -> dict:
+        return {key: self.get(i, key) for key in self.keys(i)}
+
+    def raw(self, i: int):
+        """(date, flags, [id, title, content, extra bytes or None]) for copying a row unchanged."""
+        row = self._row(i)
+        return row[0], row[1], [self._span(row, slot) for slot in range(4)]
+
+    def views(self):
+        return [EntryView(self, i) for i in range(self.count)]
+
+
+def read_seq(path: str) -> int:
+    """seq stored in a chunk file's header (0 if missing or not a chunk file)."""
+    try:
+        with open(path, "rb") as f:
+            magic, _, _, _, seq, _ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return 0
+    return seq if magic == MAGIC else 0
+
+
+class EntryView(MutableMapping):
+    """Entry backed by a row of a ChunkFile; assigned fields live in a small overlay.
+
+    Only the overlay is per-entry state; every other field is read from the
+    mapping when asked for. clear() detaches the view, after which it is a
+    plain overlay dict (that is how journal.apply_records replaces an entry).
+    """
+
+    __slots__ = ("_ref", "_own")
+
+    def __init__(self, chunk, row, own=None):
+        self._ref = (chunk, row) if chunk is not None else None  # swapped as a whole on compaction
+        self._own = own
+
+    def _retry(self, exc, method, *args):
+        chunk, row = self._ref
+        if not chunk.closed:
+            raise exc
+        # closed by a compaction mid-read: wait until views are rebound, then read again
+        with chunk.swap_lock:
+            chunk, row = self._ref
+        return getattr(chunk, method)(row, *args)
+
+    def __getitem__(self, key):
+        own = self._own
+        if own is not None and key in own:
+            return own[key]
+        if self._ref is None:
+            raise KeyError(key)
+        chunk, row = self._ref
+        try:
+            return chunk.get(row, key)
+        except ValueError as exc:
+            return self._retry(exc, "get", key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        if self._own is None:
+            self._own = {}
+        self._own[key] = value
+
+    def __delitem__(self, key):
+        data = self.plain()
+        del data[key]
+        self._detach(data)
+
+    def clear(self):
+        self._detach({})
+
+    def _detach(self, own):
+        ref = self._ref
+        if ref is None:
+            self._own = own
+            return
+        with ref[0].swap_lock:
+            self._ref = None
+            self._own = own
+
+    def _file(self, method, *args):
+        chunk, row = self._ref
+        try:
+            return getattr(chunk, method)(row, *args)
+        except ValueError as exc:
+            return self._retry(exc, method, *args)
+
+    def _keys(self):
+        keys = self._file("keys") if self._ref is not None else []
+        if self._own:
+            keys.extend(k for k in self._own if k not in keys)
+        return keys
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __contains__(self, key):
+        return (self._own is not None and key in self._own) or (self._ref is not None and self._file("has", key))
+
+    def copy(self):
+        view = EntryView(None, 0, dict(self._own) if self._own is not None else None)
+        view._ref = self._ref
+        return view
+
+    def plain(self) -> dict:
+        """A normal dict with every field read (for serialization)."""
+        return {key: self[key] for key in self._keys()}
+
+    def __repr__(self):
+        return f"EntryView({self.plain()!r})"
+
+
+# ---------------- writing ----------------
+def _encode(entry, packed=True):
+    """(date, flags, [id, title, content, extra bytes or None]) for one entry."""
+    if isinstance(entry, EntryView) and entry._own is None and entry._ref is not None:
+        chunk, row = entry._ref
+        return chunk.raw(row)  # unchanged: copy the bytes as they are
+    entry = plain_entry(entry)
+    flags = 0
+    spans = [None, None, None, None]
+    extra = {}
+    for key, value in entry.items():
+        slot = _SLOTS.index(key) if key in _SLOTS else None
+        if slot is not None and isinstance(value, str):
+            spans[slot] = value.encode("utf-8")
+        elif key == "content":
+            spans[2] = json.dumps(value, ensure_ascii=False).encode("utf-8")
+            flags |= CONTENT_JSON
+        elif key == "date" and isinstance(value, str) and len(value) == 10 and value.isascii():
+            flags |= HAS_DATE
+        elif key == "locked" and isinstance(value, bool):
+            flags |= HAS_LOCKED | (LOCKED if value else 0)
+        else:
+            extra[key] = value
+    if extra:
+        spans[3] = json.dumps(extra, ensure_ascii=False).encode("utf-8")
+    if packed and spans[2] is not None:
+        codec, spans[2] = compress(spans[2])
+        flags |= _CODECS.get(codec, 0)
+    date = entry["date"].encode("ascii") if flags & HAS_DATE else b""
+    return date, flags, spans
+
+
+def write_chunks(f, entries, seq: int, packed: bool = True):
+    """Write entries as a chunk file to the binary file object f; returns {id: row}.
+
+    packed=False skips body compression (unchanged rows are copied as they are).
+    """
+    count = len(entries)
+    heap = HEADER.size + count * ROW.size
+    f.write(HEADER.pack(MAGIC, VERSION, ROW.size, count, seq, 0))
+    rows = {}
+    table = bytearray()
+    table_pos = HEADER.size
+    pos = heap
+    seen = {}  # digest of a long body -> its offset in the heap
+    f.seek(heap)
+    for i, entry in enumerate(entries):
+        date, flags, fields = _encode(entry, packed)
+        spans = []
+        for slot, data in enumerate(fields):
+            if data is None:
+                spans += (0, ABSENT)
+                continue
+            if slot == 2 and len(data) >= DEDUP_MIN:
+                digest = hashlib.blake2b(data, digest_size=16).digest()
+                offset = seen.get(digest)
+                if offset is not None:
+                    spans += (offset, len(data))
+                    continue
+                seen[digest] = pos
+            f.write(data)
+            spans += (pos, len(data))
+            pos += len(data)
+        table += ROW.pack(date, flags, *spans)
+        rows[entry["id"]] = i
+        if len(table) >= CHUNK_ROWS * ROW.size or i == count - 1:
+            # the table is written a chunk at a time, so memory stays flat
+            f.seek(table_pos)
+            f.write(table)
+            table_pos += len(table)
+            table.clear()
+            f.seek(pos)
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, VERSION, ROW.size, count, seq, pos))
+    return rows
+
+
+# ---------------- store ----------------
+class ChunkedStore(JournalStore):
+    """JournalStore whose snapshot is a chunk file instead of JSON.
+
+    load(lazy=True) returns EntryViews over the mapped file. After each
+    compaction the views in self.entries are moved to the new file, so the
+    list shared with the caller stays valid.
+    """
+
+    def __init__(self, snapshot_path: str, log_path: str = None, compact_every: int = COMPACT_EVERY):
+        super().__init__(snapshot_path, log_path or snapshot_path + ".log", compact_every)
+        self.header_path = None  # the record table is the header
+        self.bodies = None
+        self.swap_lock = threading.RLock()
+
+    def _open_chunk(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        return ChunkFile(self.snapshot_path, self.swap_lock)
+
+    def _read_snapshot(self):
+        chunk = self._open_chunk()
+        if chunk is None:
+            return 0, []
+        try:
+            return chunk.seq, [chunk.entry(i) for i in range(chunk.count)]
+        finally:
+            chunk.close()
+
+    def _read_header(self):
+        """(seq, [EntryView]) from the record table; no body is read."""
+        chunk = self._open_chunk()
+        if chunk is None:
+            return 0, []
+        return chunk.seq, chunk.views()
+
+    def _reopen_snapshot(self) -> int:
+        # views keep the mapping they were created on (still valid after a rename)
+        return read_seq(self.snapshot_path)
+
+    def _write_snapshot(self, entries):
+        self.seq += 1
+        directory = os.path.dirname(self.snapshot_path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.snapshot_path) + ".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                rows = write_chunks(f, entries, self.seq)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self.swap_lock:
+            views = [(v, rows.get(v["id"])) for v in list(self.entries)
+                     if isinstance(v, EntryView) and v._ref is not None]
+            if os.name == "nt":
+                # Windows can't replace a mapped file; readers wait on swap_lock and retry
+                for chunk in {v._ref[0] for v, _ in views if v._ref[0].path == self.snapshot_path}:
+                    chunk.close()
+            os.replace(tmp, self.snapshot_path)
+            fsync_dir(directory)
+            chunk = ChunkFile(self.snapshot_path, self.swap_lock)
+            for view, row in views:
+                if row is not None:
+                    view._ref = (chunk, row)
+        self._snap_stamp = file_stamp(self.snapshot_path)
+
+
+# ---------------- driver ----------------
+def chunk_path(username: str) -> str:
+    return os.path.splitext(user_data_path(username))[0] + ".dat"
+
+
+def open_chunked(username: str) -> ChunkedStore:
+    """Chunked store for a user; converts the JSON snapshot + journal on first use."""
+    store = ChunkedStore(chunk_path(username))
+    json_path = user_data_path(username)
+    with locked(store.log_path):
+        if not os.path.exists(store.snapshot_path) and os.path.exists(json_path):
+            legacy = JournalStore(json_path)
+            entries = legacy.load()
+            legacy.close()
+            store.seq = legacy.seq
+            store.compact(entries)
+    return store
+
+
+class ChunkedDriver(JsonDriver):
+    """JSON driver with entries in chunk files (accounts stay in users.jsonl)."""
+
+    name = "chunked"
+
+    def ensure_user(self, username):
+        chunk_path(username)  # creates DATA_DIR
+
+    def open_store(self, username):
+        return open_chunked(username)
@@ -0,0 +1,38 @@
+# compression.py
+# Body compression shared by encrypted blobs (key_session.py) and chunk files (chunkstore.py).
+#
+#   codec, data = compress(body_bytes)     # "none", "zlib" or "lzma"
+#   body_bytes = decompress(codec, data)
+#
+# Short bodies are left alone (the codec header would cost more than it
+# saves); long ones use lzma, which is slower but packs large pages tighter.
+
+import lzma
+import zlib
+
+MIN_SIZE = 128          # below this, compression rarely pays
+LZMA_MIN_SIZE = 64 * 1024
+ZLIB_LEVEL = 1           # compaction speed matters more than the last few percent
+
+
+def compress(data: bytes):
+    """(codec, bytes): the smaller of the raw and compressed forms."""
+    if len(data) < MIN_SIZE:
+        return "none", data
+    if len(data) >= LZMA_MIN_SIZE:
+        codec, packed = "lzma", lzma.compress(data, format=lzma.FORMAT_XZ, preset=6)
+    else:
+        codec, packed = "zlib", zlib.compress(data, ZLIB_LEVEL)
+    if len(packed) >= len(data):
+        return "none", data
+    return codec, packed
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lzma":
+        return lzma.decompress(data)
+    if codec == "none":
+        return bytes(data)
+    raise ValueError(f"Unknown compression codec: {codec}")
@@ -1,38 +1,47 @@
 # dashboard.py
-# Main CustomTkinter dashboard. Run with: python dashboard.py <username>
-import sys
-import os
+# Main CustomTkinter dashboard frame, shown by the app shell (app.py) after login.
+# All diary logic lives in DiaryService (diary_service.py); this is its UI.
+from datetime import date
 import customtkinter as ctk
 from tkinter import messagebox, simpledialog, filedialog
 from tkcalendar import Calendar
-from fpdf import FPDF
-from storage import load_entries, save_entries, ensure_user_file
-from utils import parse_date, encrypt_text, decrypt_text
-from auth import _load_users, verify_password  # verify_password is in auth.py
-from storage import search_entries, load_entries
+from tasks import TaskScheduler
+from dates import parse_date_range
+from diary_service import DiaryService
+from changes import INSERTED, UPDATED, DELETED, RESET
+from diary_client import open_remote
+from instrument import traced
+from widgets import VirtualList, DiagnosticsPanel, StatsPanel
 
 
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("green")
 
+PERSIST_DELAY_MS = 300  # coalesce snapshot rewrites requested within this window
+WRITE_DELAY_MS = 1000   # changes within this window reach the journal as one write, one record per entry
+SEARCH_DELAY_MS = 150   # live search runs once typing pauses this long
+SEARCH_BATCH = 500      # background search results reach the list in batches of this size
+INLINE_REFINE_MAX = 5000  # refining at most this many previous hits runs without a worker
+HEAT_COLORS = ("#B9DCC9", "#8CC2A6", "#61997F", "#2F5E48")  # heatmap levels 1..4 (analytics.heat_level)
 
-def user_arg_or_exit():
-    if len(sys.argv) < 2:
-        print("Usage: python dashboard.py <username>")
-        sys.exit(1)
-    return sys.argv[1]
 
-
-class Dashboard(ctk.CTk):
-    def __init__(self, username):
-        super().__init__()
+class Dashboard(ctk.CTkFrame):
+    def __init__(self, master, username, on_logout=None):
+        super().__init__(master, fg_color="transparent")
         self.username = username
-        self.title(f"Diary — {username}")
-        self.geometry("1100x650")
-
-        ensure_user_file(self.username)
-        # load raw entries list (entries are dicts)
-        self.entries = load_entries(self.username)
+        self.on_logout = on_logout  # called after logout; the app shell shows the login again
+
+        self.tasks = TaskScheduler(self)
+        # lazy: only titles/dates/flags are read at startup; bodies load in select_entry.
+        # journal writes run in order on the "io" lane, coalesced over WRITE_DELAY_MS;
+        # compaction is scheduled by persist()
+        # with DIARY_SERVER set, login() left a server session for us (diary_client.py)
+        self.service = (open_remote(username)
+                        or DiaryService(username, lazy=True, run_io=self._run_io, schedule_persist=self.persist,
+                                        schedule_flush=self._schedule_flush))
+        # another running instance wrote to the same diary (reported from the io lane)
+        self.service.store.on_external = lambda records: self.tasks.call_soon(self._apply_external, records)
+        self._cal_events = {}  # date -> calendar event id for days that have entries
 
         # UI layout
         self.left_frame = ctk.CTkFrame(self, width=280, corner_radius=12)
@@ -45,13 +54,25 @@ class Dashboard(ctk.CTk):
         self.cal = Calendar(self.left_frame, selectmode="day", date_pattern="yyyy-mm-dd")
         self.cal.pack(pady=(10, 8))
         self.cal.bind("<<CalendarSelected>>", self.on_date_selected)
+        self.cal.bind("<<CalendarMonthChanged>>", self.mark_calendar_month)
+        self.cal.tag_config("has_entries", background="#61997F", foreground="white")
+        for level, color in enumerate(HEAT_COLORS, 1):
+            self.cal.tag_config(f"heat{level}", background=color, foreground="white" if level > 2 else "black")
+        # heatmap layer: days shaded by how much was written (analytics.py)
+        self.heatmap_switch = ctk.CTkSwitch(self.left_frame, text="Activity heatmap", command=self.mark_calendar_month)
+        self.heatmap_switch.pack(padx=10, pady=(0, 6), anchor="w")
 
 
         ctk.CTkButton(self.left_frame, text="Add Entry", command=self.open_add_popup).pack(fill="x", padx=10, pady=6)
         ctk.CTkButton(self.left_frame, text="Edit Entry", command=self.open_edit_popup).pack(fill="x", padx=10, pady=6)
         ctk.CTkButton(self.left_frame, text="Delete Entry", command=self.delete_selected).pack(fill="x", padx=10, pady=6)
         ctk.CTkButton(self.left_frame, text="Lock/Unlock", command=self.lock_toggle_selected).pack(fill="x", padx=10, pady=6)
+        ctk.CTkButton(self.left_frame, text="Lock All", command=self.lock_all).pack(fill="x", padx=10, pady=(6, 2))
+        ctk.CTkButton(self.left_frame, text="Unlock All", command=self.unlock_all).pack(fill="x", padx=10, pady=2)
+        ctk.CTkButton(self.left_frame, text="Lock Date Range", command=self.lock_range).pack(fill="x", padx=10, pady=(2, 6))
         ctk.CTkButton(self.left_frame, text="Export (PDF)", command=self.export_selected).pack(fill="x", padx=10, pady=6)
+        ctk.CTkButton(self.left_frame, text="Export List", command=self.export_list).pack(fill="x", padx=10, pady=6)
+        ctk.CTkButton(self.left_frame, text="Statistics", command=self.open_stats).pack(fill="x", padx=10, pady=6)
         ctk.CTkButton(self.left_frame, text="View All Notes", command=self.refresh_list).pack(fill="x", padx=10, pady=6)
 
         # Right top: search center + refresh + logout
@@ -60,69 +81,23 @@ class Dashboard(ctk.CTk):
 
         self.search_entry = ctk.CTkEntry(topbar, placeholder_text="Search keyword or YYYY-MM-DD", width=400)
         self.search_entry.pack(pady=6, side="left", padx=(120, 6))
+        self.search_entry.bind("<KeyRelease>", self.on_search_typed)
+        self.search_entry.bind("<Return>", lambda e: self.search())
+        self._live = {"text": None, "ids": None}  # last completed live search (for refinement)
 
         ctk.CTkButton(topbar, text="Search", command=self.search).pack(side="left", padx=6)
         # ctk.CTkButton(topbar, text="Refresh", command=self.refresh_list, fg_color="blue").pack(side="left", padx=6)
         ctk.CTkButton(topbar, text="Logout", command=self.logout).pack(side="right", padx=10)
 
-        # ---------------- Search ----------------
-        def search(self):
-            query = self.search_entry.get().strip()
-            if not query:
-                self.refresh_list()
-                return
-
-            results = []
-            if "to" in query:  # date range
-                parts = query.split("to")
-                try:
-                    s = parse_date(parts[0].strip())
-                    e = parse_date(parts[1].strip())
-                    for ent in self.entries:
-                        if s <= ent.get("date", "") <= e:
-                            results.append(ent)
-                except Exception:
-                    messagebox.showerror("Error", "Invalid date range. Use YYYY-MM-DD to YYYY-MM-DD")
-                    return
-            else:
-                # keyword search in title/content
-                for ent in self.entries:
-                    title = ent.get("title", "")
-                    content = ent.get("content", "")
-                    if isinstance(content, dict):
-                        if query.lower() in title.lower():
-                            results.append(ent)
-                    else:
-                        if query.lower() in title.lower() or query.lower() in content.lower():
-                            results.append(ent)
-
-            # clear the list_container and show results
-            for w in self.list_container.winfo_children():
-                w.destroy()
-
-            if not results:
-                lbl = ctk.CTkLabel(self.list_container, text="No entries found.")
-                lbl.pack(pady=10)
-                return
-
-            for i, ent in enumerate(results):
-                locked = ent.get("locked", False)
-                icon = "🔒 " if locked else ""
-                btn = ctk.CTkButton(
-                    self.list_container,
-                    text=f"{icon}{ent.get('title')} — {ent.get('date')}",
-                    anchor="w",
-                    command=lambda e=ent: self.show_search_entry(e)
-                )
-                btn.pack(fill="x", pady=4, padx=6)
-
-            self.clear_display()
+        # Entries list (virtualized: only the visible rows exist as widgets)
+        self.entry_list = VirtualList(self.right_frame, format_row=self._row_style,
+                                      on_select=self.on_list_select, height=300, corner_radius=8)
+        self.entry_list.pack(fill="x", padx=10, pady=6)
 
-
-
-        # Entries list (scrollable)
-        self.list_container = ctk.CTkScrollableFrame(self.right_frame, height=300, corner_radius=8)
-        self.list_container.pack(fill="x", padx=10, pady=6)
+        # progress bar for long background jobs (hidden when idle)
+        self.progress = ctk.CTkProgressBar(self.right_frame)
+        self.progress.set(0)
+        self._busy = False
 
         # selected entry display area
         self.display_title = ctk.CTkLabel(self.right_frame, text="", font=("Helvetica", 16, "bold"))
@@ -133,50 +108,213 @@ class Dashboard(ctk.CTk):
         self.display_content.pack(fill="both", expand=True, padx=10, pady=8)
 
         # internals
-        # entries are stored as dicts with keys: title, content (plain or encrypted blob), date, locked (bool)
-        self.selected_index = None
+        # entries are stored as dicts with keys: id, title, content (plain or encrypted blob), date, locked (bool)
+        # the selection is an entry id, so it survives inserts, deletes and list/search/day views
+        self.selected_id = None
+        self._diagnostics = None
+        self._stats = None
+        self.winfo_toplevel().bind("<Control-Shift-D>", self.open_diagnostics)
+        # the list, calendar and display follow the service's change events
+        self._changed = []  # changes not rendered yet
+        self.service.changes.subscribe(self._on_changes)
         self.refresh_list()
+        self.mark_calendar_month()
+
+    # ---------------- service state ----------------
+    @property
+    def entries(self):
+        return self.service.entries
+
+    @property
+    def by_id(self):
+        return self.service.by_id
+
+    @property
+    def dates(self):
+        return self.service.dates
+
+    @property
+    def selected_entry(self):
+        """The selected entry, or None (also when another instance deleted it)."""
+        return self.by_id.get(self.selected_id) if self.selected_id is not None else None
 
     # ---------------- storage helpers ----------------
+    def _run_io(self, fn, arg):
+        """Journal writes run off the Tk thread, in order."""
+        self.tasks.submit(fn, arg, lane="io", on_error=self._on_save_error)
+
+    def _schedule_flush(self):
+        """First change of a write window: journal everything changed in it when it ends."""
+        self.tasks.debounce("flush", WRITE_DELAY_MS, self.service.flush)
+
     def persist(self):
-        save_entries(self.username, self.entries)
+        """Full rewrite of the diary (folds the journal into a new snapshot).
+
+        Repeated calls within PERSIST_DELAY_MS collapse into one rewrite.
+        """
+        self.tasks.debounce("persist", PERSIST_DELAY_MS, self._persist_now)
+
+    @traced("ui.persist")
+    def _persist_now(self):
+        # snapshot on the Tk thread; queued behind earlier journal records on the io lane
+        self.service.persist()
+
+    def _apply_external(self, records):
+        """Merge changes another instance made to this diary into the view."""
+        if records is None:
+            # the other instance rewrote the snapshot: reload it in the background
+            self.tasks.submit(self.service.read_store, lane="io", on_done=self._reload_entries,
+                              on_error=lambda exc: messagebox.showerror("Error", f"Failed to reload diary: {exc}"))
+            return
+        self.service.apply_external(records)  # rendered by _on_changes
+
+    def _reload_entries(self, entries):
+        self.service.reload(entries)
+
+    def _on_changes(self, changes):
+        """Collect change events; a burst of them is rendered once, when Tk is idle."""
+        if not self._changed:
+            self.after_idle(self._render_changes)
+        self._changed.extend(changes)
+
+    @traced("ui.render_changes")
+    def _render_changes(self):
+        """Update only what the changes touch: their calendar days and their visible rows."""
+        changes, self._changed = self._changed, []
+        if not changes:
+            return
+        if any(c.kind == RESET for c in changes):
+            self.refresh_list()
+            self.mark_calendar_month()
+            self._keep_selection()
+            return
+        self._live = {"text": None, "ids": None}  # the index changed
+        changed, gone, days = set(), set(), set()
+        heat = self.heatmap_switch.get()
+        for c in changes:
+            (gone if c.kind == DELETED else changed).add(c.entry_id)
+            if c.kind in (INSERTED, DELETED) or heat:  # heat follows words, which any change can move
+                days.update((c.entry.get("date"), c.old_date))
+            elif c.kind == UPDATED and c.old_date != c.entry.get("date"):
+                days.update((c.old_date, c.entry.get("date")))  # moved: both days' counts change
+        for day in days:
+            self.refresh_calendar_day(day)
+        if self._stats is not None and self._stats.winfo_exists():
+            self._stats.refresh()
+
+        items = self.entry_list.items
+        added_here = any(c.kind == INSERTED and c.journal for c in changes)
+        if items is not self.entries:
+            # a search result or a day: drop deleted rows, keep the rest as they are
+            if gone:
+                items[:] = [e for e in items if e["id"] not in gone]
+                self.entry_list.redraw()
+            else:
+                self.entry_list.refresh_rows(lambda e: e["id"] in changed)
+        elif added_here:
+            self.entry_list.scroll_to(0)  # new entries go on top: show them
+        elif gone or any(c.kind == INSERTED for c in changes):
+            self.entry_list.redraw()  # rows moved
+        else:
+            self.entry_list.refresh_rows(lambda e: e["id"] in changed)
+
+        if self.selected_id in gone:
+            self.clear_display()
+        elif self.selected_id in changed:
+            self.select_entry(self.selected_id)
+
+    def _keep_selection(self):
+        """Redisplay the selected entry after outside changes, or clear it if it is gone."""
+        if self.selected_entry is not None:
+            self.select_entry(self.selected_id)
+        elif self.selected_id is not None:
+            self.clear_display()
+
+    def _on_save_error(self, exc):
+        messagebox.showerror("Error", f"Failed to save diary: {exc}")
+
+    def open_diagnostics(self, event=None):
+        """Hidden tracing / profiling panel (Ctrl+Shift+D)."""
+        if self._diagnostics is not None and self._diagnostics.winfo_exists():
+            self._diagnostics.lift()
+            return
+        self._diagnostics = DiagnosticsPanel(self)
+
+    def open_stats(self):
+        """Statistics window, rendered from the service's cached aggregates."""
+        if self._stats is not None and self._stats.winfo_exists():
+            self._stats.lift()
+            return
+        self._stats = StatsPanel(self, lambda: self.service.stats(full=True))
+
+    def close(self):
+        """Finish pending writes and release the diary (window close or logout)."""
+        self.winfo_toplevel().unbind("<Control-Shift-D>")
+        self.service.wipe_keys()
+        self.tasks.cancel("search")
+        self.tasks.flush("flush")
+        self.service.flush()  # the last journal records join the io lane...
+        self.tasks.shutdown(wait=True)  # ...which this drains (after a pending persist)
+        self.service.close()  # nothing left to write: saves the index, closes the store
 
     # ---------------- UI actions ----------------
+    @traced("ui.refresh_list")
     def refresh_list(self):
         """Refresh the displayed list of entries."""
-        for widget in self.list_container.winfo_children():
-            widget.destroy()
+        self.tasks.cancel("search")  # a streamed search must not extend the list shown now
+        self._live = {"text": None, "ids": None}  # entries may have changed
+        self.entry_list.set_items(self.entries, empty_text="No entries yet.")
 
-        for index, entry in enumerate(self.entries):
-            # Brighter background colors
-            if entry["locked"]:
-                bg_color = "#995867"  # Brighter pink for locked
-            else:
-                bg_color = "#61997F"  # Brighter mint for unlocked
-
-            lock_icon = "🔒 " if entry["locked"] else ""
-            button_text = f"{lock_icon}{entry['title']} — {entry['date']}"
-
-            entry_button = ctk.CTkButton(
-                self.list_container,
-                text=button_text,
-                corner_radius=4,
-                fg_color=bg_color,
-                text_color="#E6E1E1",  
-                hover_color="#536B61",  
-                anchor="w",
-                command=lambda i=index: self.select_entry(i)
-            )
-            entry_button.pack(fill="x", padx=10, pady=4)
+    def _row_style(self, entry):
+        # Brighter background colors
+        if entry.get("locked"):
+            bg_color = "#995867"  # Brighter pink for locked
+        else:
+            bg_color = "#61997F"  # Brighter mint for unlocked
+        lock_icon = "🔒 " if entry.get("locked") else ""
+        return f"{lock_icon}{entry.get('title')} — {entry.get('date')}", bg_color
+
+    def on_list_select(self, position, items):
+        # the full list, a search result or a day: rows are resolved to ids right away
+        self.select_entry(items[position]["id"])
+
+    # ---------------- Calendar markers ----------------
+    def mark_calendar_month(self, event=None):
+        """Highlight the days of the displayed month that have entries."""
+        self.cal.calevent_remove("all")
+        self._cal_events = {}
+        month, year = self.cal.get_displayed_month()
+        heat = self.service.heatmap(year, month) if self.heatmap_switch.get() else {}
+        for day, count in self.dates.month_counts(year, month).items():
+            self._mark_day(day, count, heat.get(day))
+
+    def refresh_calendar_day(self, day):
+        """Update the marker of a single day after an add/edit/delete."""
+        if not day:
+            return
+        ev = self._cal_events.pop(day, None)
+        if ev is not None:
+            self.cal.calevent_remove(ev)
+        month, year = self.cal.get_displayed_month()
+        if day.startswith(f"{year:04d}-{month:02d}-"):
+            count = len(self.dates.on_day(day))
+            if count:
+                heat = self.service.heatmap(year, month) if self.heatmap_switch.get() else {}
+                self._mark_day(day, count, heat.get(day))
+
+    def _mark_day(self, day, count, level=None):
+        text = f"{count} entr{'y' if count == 1 else 'ies'}"
+        tag = f"heat{level}" if level else "has_entries"
+        self._cal_events[day] = self.cal.calevent_create(date.fromisoformat(day), text, tag)
 
     def on_date_selected(self, event=None):
         """Triggered when a date is clicked in the calendar."""
         selected_date = self.cal.get_date()  # e.g. '2025-10-28'
         self.show_entries_for_date(selected_date)
 
-    def select_entry(self, idx):
-        self.selected_index = idx
-        entry = self.entries[idx]
+    def select_entry(self, entry_id):
+        self.selected_id = entry_id
+        entry = self.by_id[entry_id]
         locked = entry.get("locked", False)
         self.display_title.configure(text=entry.get("title", ""))
         self.display_date.configure(text=entry.get("date", ""))
@@ -195,7 +333,7 @@ class Dashboard(ctk.CTk):
         self.display_content.configure(state="disabled")
 
     def clear_display(self):
-        self.selected_index = None
+        self.selected_id = None
         self.display_title.configure(text="")
         self.display_date.configure(text="")
         self.display_content.configure(state="normal")
@@ -207,16 +345,17 @@ class Dashboard(ctk.CTk):
         self._open_editor_popup(mode="add")
 
     def open_edit_popup(self):
-        if self.selected_index is None:
+        entry = self.selected_entry
+        if entry is None:
             messagebox.showwarning("Select", "Choose an entry to edit.")
             return
         # if the selected is locked, block edit
-        if self.entries[self.selected_index].get("locked"):
+        if entry.get("locked"):
             messagebox.showwarning("Locked", "Unlock entry before editing.")
             return
-        self._open_editor_popup(mode="edit", index=self.selected_index)
+        self._open_editor_popup(mode="edit", entry_id=entry["id"])
 
-    def _open_editor_popup(self, mode="add", index=None):
+    def _open_editor_popup(self, mode="add", entry_id=None):
         popup = ctk.CTkToplevel(self)
         popup.title("Add Entry" if mode == "add" else "Edit Entry")
         popup.geometry("600x450")
@@ -230,8 +369,8 @@ class Dashboard(ctk.CTk):
         text_box = ctk.CTkTextbox(popup, width=560, height=300, corner_radius=8)
         text_box.pack(pady=6)
 
-        if mode == "edit" and index is not None:
-            entry = self.entries[index]
+        if mode == "edit" and entry_id is not None:
+            entry = self.by_id[entry_id]
             title_entry.insert(0, entry.get("title", ""))
             # if encrypted, cannot edit (should not happen because open_edit_popup blocked locked)
             text_box.insert("1.0", entry.get("content", ""))
@@ -242,15 +381,15 @@ class Dashboard(ctk.CTk):
             if not title or not content:
                 messagebox.showwarning("Missing", "Fill title and content.")
                 return
-            now = self._today()
             if mode == "add":
-                self.entries.insert(0, {"title": title, "content": content, "date": now, "locked": False})
+                entry = self.service.add(title, content)
+            elif entry_id not in self.by_id:
+                messagebox.showwarning("Deleted", "This entry was deleted in the meantime.")
+                popup.destroy()
+                return
             else:
-                self.entries[index]["title"] = title
-                self.entries[index]["content"] = content
-                self.entries[index]["date"] = now
-            self.persist()
-            self.refresh_list()
+                entry = self.service.edit(entry_id, title, content)[0]
+            self.select_entry(entry["id"])
             popup.destroy()
 
         save_text = "Save" if mode == "add" else "Save Changes"
@@ -258,156 +397,234 @@ class Dashboard(ctk.CTk):
 
     # ---------------- Delete ----------------
     def delete_selected(self):
-        if self.selected_index is None:
+        e = self.selected_entry
+        if e is None:
             messagebox.showwarning("Select", "Choose an entry to delete.")
             return
-        e = self.entries[self.selected_index]
         if e.get("locked"):
             messagebox.showwarning("Locked", "Unlock before deleting.")
             return
         if messagebox.askyesno("Confirm", f"Delete '{e.get('title')}'?"):
-            self.entries.pop(self.selected_index)
-            self.persist()
-            self.refresh_list()
+            self.service.delete(e["id"])
+            self.clear_display()
 
     # ---------------- Lock / Unlock ----------------
+    def _with_key_session(self, then, prompt="Enter your account password:"):
+        """Call then() once the login's key session exists.
+
+        The first call asks for the password and derives the master key in the
+        background (PBKDF2 is slow); later calls reuse the session.
+        """
+        if self.service.has_keys:
+            then()
+            return
+        pwd = simpledialog.askstring("Password", prompt, show="*")
+        if not pwd:
+            return
+        self.tasks.submit(self.service.open_keys, pwd, on_done=lambda keys: then(), key="key_session",
+                          on_error=lambda exc: messagebox.showerror("Error", str(exc)))
+
+    @traced("ui.lock_toggle_selected")
     def lock_toggle_selected(self):
-        if self.selected_index is None:
+        entry = self.selected_entry
+        if entry is None:
             messagebox.showwarning("Select", "Choose an entry to lock/unlock.")
             return
-        entry = self.entries[self.selected_index]
+        entry_id = entry["id"]
         if entry.get("locked"):
-            # unlock flow: ask for user's password to derive key and decrypt
-            pwd = simpledialog.askstring("Unlock", "Enter your account password:", show="*")
-            if not pwd:
-                return
-            try:
-                # attempt decrypt using provided password
-                blob = entry.get("content")
-                decrypted = decrypt_text(pwd, blob)
-                entry["content"] = decrypted
-                entry["locked"] = False
-                self.persist()
-                self.refresh_list()
-                messagebox.showinfo("Unlocked", "Entry unlocked.")
-            except Exception as exc:
-                messagebox.showerror("Error", "Failed to unlock. Wrong password or corrupted data.")
+            # unlock flow: session key (derived once per login) decrypts
+            def unlock():
+                entry = self.by_id.get(entry_id)  # the password prompt may outlive the entry
+                if entry is None:
+                    return
+                try:
+                    self.service.set_locked(entry, False)
+                    self.select_entry(entry_id)
+                    messagebox.showinfo("Unlocked", "Entry unlocked.")
+                except Exception as exc:
+                    messagebox.showerror("Error", "Failed to unlock. Wrong password or corrupted data.")
+
+            self._with_key_session(unlock)
         else:
-            # lock flow: ask for password to derive key
-            pwd = simpledialog.askstring("Lock", "Enter your account password to lock entry:", show="*")
-            if not pwd:
-                return
-            try:
-                encrypted = encrypt_text(pwd, entry.get("content", ""))
-                entry["content"] = encrypted
-                entry["locked"] = True
-                self.persist()
-                self.refresh_list()
-                self.clear_display()
-                messagebox.showinfo("Locked", "Entry locked and encrypted.")
-            except Exception as exc:
-                messagebox.showerror("Error", f"Failed to lock: {exc}")
+            # lock flow
+            def lock():
+                entry = self.by_id.get(entry_id)
+                if entry is None:
+                    return
+                try:
+                    self.service.set_locked(entry, True)
+                    self.clear_display()
+                    messagebox.showinfo("Locked", "Entry locked and encrypted.")
+                except Exception as exc:
+                    messagebox.showerror("Error", f"Failed to lock: {exc}")
+
+            self._with_key_session(lock, "Enter your account password to lock entry:")
+
+    # ---------------- Bulk lock / unlock ----------------
+    def lock_all(self):
+        self._bulk_lock(self.entries, True)
+
+    def unlock_all(self):
+        self._bulk_lock(self.entries, False)
+
+    def lock_range(self):
+        query = simpledialog.askstring("Lock range", "Dates to lock (YYYY-MM-DD to YYYY-MM-DD):")
+        if not query:
+            return
+        try:
+            rng = parse_date_range(query)
+        except ValueError:
+            rng = None
+        if not rng:
+            messagebox.showerror("Error", "Invalid date range. Use YYYY-MM-DD to YYYY-MM-DD")
+            return
+        self._bulk_lock(self.service.between(*rng), True)
+
+    def _bulk_lock(self, entries, locked):
+        if self._busy:
+            messagebox.showwarning("Busy", "Another bulk operation is still running.")
+            return
+        todo = self.service.to_change(entries, locked)
+        if not todo:
+            messagebox.showinfo("Nothing to do", "No matching entries to change.")
+            return
+        self._with_key_session(lambda: self._run_bulk(todo, locked))
+
+    def _run_bulk(self, todo, locked):
+        # keys-only entries change at once; legacy per-entry-salt blobs each need a
+        # full PBKDF2 run, so the process pool decrypts them in the background
+        job = self.service.begin_bulk_lock(todo, locked)
+        if not job.legacy:
+            self._finish_bulk(job)
+            return
+        self._busy = True
+        self.progress.set(job.done / job.total)
+        self.progress.pack(fill="x", padx=10, pady=(0, 6), after=self.entry_list)
+
+        def work(report):
+            for result in job.results:
+                report(*result)
+
+        def apply(*result):
+            job.apply(*result)
+            self.progress.set(job.done / job.total)
+
+        def finished(_=None):
+            self._busy = False
+            self.progress.pack_forget()
+            self._finish_bulk(job)
+
+        def failed_all(exc):
+            finished()
+            messagebox.showerror("Error", f"Bulk unlock stopped: {exc}")
+
+        self.tasks.submit(work, on_progress=apply, on_done=finished, on_error=failed_all)
+
+    def _finish_bulk(self, job):
+        changed, failed = job.finish()  # one snapshot rewrite instead of a journal record per entry
+        self.clear_display()
+        msg = f"{'Locked' if job.locked else 'Unlocked'} {changed} entries."
+        if failed:
+            msg += f"\n{failed} could not be processed."
+        messagebox.showinfo("Done", msg)
 
     # ---------------- Search ----------------
+    @traced("ui.search")
     def search(self):
+        self.tasks.cancel("search")
         query = self.search_entry.get().strip()
         if not query:
             self.refresh_list()
             return
-        results = []
-        # date range e.g., 2025-01-01 to 2025-01-31
-        if "to" in query:
-            parts = query.split("to")
-            try:
-                s = parse_date(parts[0].strip())
-                e = parse_date(parts[1].strip())
-                for ent in self.entries:
-                    if s <= ent.get("date", "") <= e:
-                        results.append(ent)
-            except Exception:
-                messagebox.showerror("Error", "Invalid date range. Use YYYY-MM-DD to YYYY-MM-DD")
-                return
-        else:
-            # keyword search in title or content (content may be encrypted blob; skip encrypted ones)
-            for ent in self.entries:
-                title = ent.get("title", "")
-                content = ent.get("content", "")
-                if isinstance(content, dict):
-                    # encrypted — cannot search inside unless unlocked
-                    if query.lower() in title.lower():
-                        results.append(ent)
-                else:
-                    if query.lower() in title.lower() or query.lower() in content.lower():
-                        results.append(ent)
+        # date range (2025-01-01 to 2025-01-31), single day, or keyword / prefix* / "phrase"
+        try:
+            results = self.service.search(query)
+        except ValueError:
+            messagebox.showerror("Error", "Invalid date range. Use YYYY-MM-DD to YYYY-MM-DD")
+            return
         # show results (note: results are entries dicts)
-        for w in self.list_container.winfo_children():
-            w.destroy()
-        for i, ent in enumerate(results):
-            locked = ent.get("locked", False)
-            icon = "🔒 " if locked else ""
-            btn = ctk.CTkButton(self.list_container, text=f"{icon}{ent.get('title')} — {ent.get('date')}",
-                                anchor="w", command=lambda idx=i: None)
-            btn.pack(fill="x", pady=4, padx=6)
+        self.entry_list.set_items(results, empty_text="No entries found.")
         # clear display area
         self.clear_display()
 
-    def show_entries_for_date(self, date_str):
-        """Show all entries for the selected date."""
-        # clear the right-side list first
-        for w in self.list_container.winfo_children():
-            w.destroy()
-
-        # Filter entries for this date
-        same_day_entries = [e for e in self.entries if e.get("date") == date_str]
-
-        if not same_day_entries:
-            lbl = ctk.CTkLabel(self.list_container, text=f"No entries for {date_str}.")
-            lbl.pack(pady=10)
-            self.clear_display()
+    def on_search_typed(self, event=None):
+        if event is not None and event.keysym == "Return":
             return
+        self.tasks.debounce("search", SEARCH_DELAY_MS, self.live_search)
+
+    @traced("ui.live_search")
+    def live_search(self):
+        """Search as you type: refine the previous hits when the query only got longer."""
+        text = self.search_entry.get().lstrip()
+        if not text.strip() or self.service.is_date_query(text):
+            self.search()  # empty / date forms are instant lookups
+            return
+        prev = self._live
+        if text == prev["text"]:
+            return  # e.g. an arrow key: nothing to redo
+        query = self.service.live_query(text)
+        within = set(prev["ids"]) if prev["ids"] is not None and self.service.refines(prev["text"], text) else None
+        self._live = {"text": text, "ids": None}
+        self.tasks.cancel("search")  # the previous query's batches are stale
+        self.clear_display()
 
-        # Populate results
-        for i, e in enumerate(same_day_entries):
-            locked = e.get("locked", False)
-            icon = "🔒 " if locked else ""
-            btn = ctk.CTkButton(
-                self.list_container,
-                text=f"{icon}{e.get('title')} — {e.get('date')}",
-                anchor="w",
-                command=lambda idx=i, entries=same_day_entries: self.select_entry_from_filtered(idx, entries)
-            )
-            btn.pack(fill="x", pady=4, padx=6)
+        if within is not None and len(within) <= INLINE_REFINE_MAX:
+            ids = self.service.search_ids(query, within=within)
+            self._live["ids"] = ids
+            self.entry_list.set_items(self._entries_for(ids), empty_text="No entries found.")
+            return
 
-        # Clear the display area
-        self.clear_display()
+        # big diary or fresh query: search on a worker (a newer keystroke cancels it)
+        # and stream the ranked hits into the list, best first; the index's lock
+        # keeps edits made meanwhile from changing it under the search
+        shown = []
+        self.entry_list.set_items(shown, empty_text="Searching...")
+
+        def work(report):
+            ids = self.service.search_ids(query, within=within)
+            for i in range(0, len(ids), SEARCH_BATCH):
+                report(ids[i:i + SEARCH_BATCH])
+            return ids
+
+        # the list may have been replaced meanwhile (all notes, a day): leave it alone
+        def add_batch(batch):
+            if self.entry_list.items is shown:
+                self.entry_list.extend(self._entries_for(batch))
+
+        def finished(ids):
+            if self.entry_list.items is not shown:
+                return
+            self._live["ids"] = ids
+            if not ids:
+                self.entry_list.set_items([], empty_text="No entries found.")
 
-    def select_entry_from_filtered(self, idx, filtered_entries):
-        """Show the selected entry from filtered list (e.g., date search)."""
-        entry = filtered_entries[idx]
-        self.display_title.configure(text=entry.get("title", ""))
-        self.display_date.configure(text=entry.get("date", ""))
-        self.display_content.configure(state="normal")
-        self.display_content.delete("1.0", "end")
+        def failed(exc):
+            messagebox.showerror("Error", f"Search failed: {exc}")
 
-        if entry.get("locked", False):
-            self.display_content.insert("1.0", "(Locked) Unlock to view content.")
-        else:
-            content = entry.get("content", "")
-            if isinstance(content, dict):
-                self.display_content.insert("1.0", "(Encrypted content)")
-            else:
-                self.display_content.insert("1.0", content)
+        self.tasks.submit(work, on_progress=add_batch, on_done=finished, on_error=failed, key="search")
 
-        self.display_content.configure(state="disabled")
+    def _entries_for(self, ids):
+        by_id = self.by_id
+        return [by_id[i] for i in ids if i in by_id]
 
+    @traced("ui.show_entries_for_date")
+    def show_entries_for_date(self, date_str):
+        """Show all entries for the selected date."""
+        # Filter entries for this date
+        same_day_entries = self.service.on_day(date_str)
+        self.tasks.cancel("search")
+        self.entry_list.set_items(same_day_entries, empty_text=f"No entries for {date_str}.")
 
+        # Clear the display area
+        self.clear_display()
 
     # ---------------- Export ----------------
+    @traced("ui.export_selected")
     def export_selected(self):
-        if self.selected_index is None:
+        entry = self.selected_entry
+        if entry is None:
             messagebox.showwarning("Select", "Choose an entry to export.")
             return
-        entry = self.entries[self.selected_index]
         if entry.get("locked"):
             messagebox.showwarning("Locked", "Unlock before exporting.")
             return
@@ -417,31 +634,59 @@ class Dashboard(ctk.CTk):
                                             filetypes=[("PDF files", "*.pdf")])
         if not path:
             return
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(0, 10, entry.get("title", ""), ln=True, align="C")
-        pdf.ln(4)
-        pdf.set_font("Arial", size=12)
-        pdf.multi_cell(0, 8, entry.get("content", ""))
-        pdf.output(path)
-        messagebox.showinfo("Exported", f"Saved PDF to:\n{path}")
+        self.tasks.submit(DiaryService.export_pdf, entry.copy(), path, on_done=lambda p: messagebox.showinfo("Exported", f"Saved PDF to:\n{p}"),
+                          on_error=lambda exc: messagebox.showerror("Error", f"Export failed: {exc}"))
+
+    def export_list(self):
+        """Export every entry in the current list view (all, search result or day) in one pass."""
+        from exporter import format_for  # loaded on first export
+        if self._busy:
+            messagebox.showwarning("Busy", "Another bulk operation is still running.")
+            return
+        items = self.entry_list.items
+        if not len(items):
+            messagebox.showwarning("Empty", "There are no entries in the list to export.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".pdf", initialfile="diary_export.pdf",
+                                            filetypes=[("PDF files", "*.pdf"), ("Markdown", "*.md"),
+                                                       ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+        try:
+            fmt = format_for(path)
+        except ValueError as exc:
+            messagebox.showerror("Error", str(exc))
+            return
+        # copy on the Tk thread so edits made during the export don't race the writer
+        snapshot = [e.copy() for e in items]
+        total = len(snapshot)
+
+        self._busy = True
+        self.progress.set(0)
+        self.progress.pack(fill="x", padx=10, pady=(0, 6), after=self.entry_list)
+
+        def work(report):
+            return self.service.export(snapshot, path, fmt, progress=lambda done, _: report(done))
+
+        def finished(count):
+            self._busy = False
+            self.progress.pack_forget()
+            messagebox.showinfo("Exported", f"Saved {count} entries to:\n{path}")
+
+        def failed(exc):
+            self._busy = False
+            self.progress.pack_forget()
+            messagebox.showerror("Error", f"Export failed: {exc}")
+
+        self.tasks.submit(work, on_progress=lambda done: self.progress.set(done / total),
+                          on_done=finished, on_error=failed)
 
     # ---------------- Logout ----------------
     def logout(self):
-        if messagebox.askyesno("Logout", "Bye bye! Logout now?"):
-            # restart login.py as new process
-            python = sys.executable
-            self.destroy()
-            os.execv(python, [python, "login.py"])
-
-    # ---------------- Utils ----------------
-    def _today(self):
-        from datetime import date
-        return date.today().strftime("%Y-%m-%d")
+        if messagebox.askyesno("Logout", "Bye bye! Logout now?") and self.on_logout:
+            self.on_logout()
 
 
 if __name__ == "__main__":
-    username = user_arg_or_exit()
-    app = Dashboard(username)
-    app.mainloop()
+    from app import main
+    main()
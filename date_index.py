@@ -0,0 +1,77 @@
+# date_index.py
+# Sorted secondary index on entry dates (YYYY-MM-DD strings sort chronologically).
+
+import bisect
+
+
+class DateIndex:
+    """Keeps entry ids ordered by date so day/range/month lookups cost O(log N + k)."""
+
+    def __init__(self, entries=()):
+        self._dates = []   # sorted dates
+        self._ids = []     # entry id for each slot in _dates
+        self._date_of = {}
+        self.rebuild(entries)
+
+    def rebuild(self, entries):
+        pairs = sorted((e.get("date", ""), e["id"]) for e in entries)
+        self._dates = [d for d, _ in pairs]
+        self._ids = [i for _, i in pairs]
+        self._date_of = dict((i, d) for d, i in pairs)
+
+    def __len__(self):
+        return len(self._ids)
+
+    # ---------------- updates ----------------
+    def add(self, entry: dict):
+        entry_id = entry["id"]
+        date = entry.get("date", "")
+        if entry_id in self._date_of:
+            if self._date_of[entry_id] == date:
+                return
+            self.remove(entry_id)
+        pos = bisect.bisect_right(self._dates, date)
+        self._dates.insert(pos, date)
+        self._ids.insert(pos, entry_id)
+        self._date_of[entry_id] = date
+
+    update = add
+
+    def remove(self, entry_id: str):
+        date = self._date_of.pop(entry_id, None)
+        if date is None:
+            return
+        lo = bisect.bisect_left(self._dates, date)
+        hi = bisect.bisect_right(self._dates, date, lo)
+        pos = self._ids.index(entry_id, lo, hi)
+        del self._dates[pos]
+        del self._ids[pos]
+
+    # ---------------- queries ----------------
+    def date_of(self, entry_id: str):
+        return self._date_of.get(entry_id)
+
+    def between(self, start: str, end: str):
+        """Ids of entries dated start..end inclusive, oldest first."""
+        lo = bisect.bisect_left(self._dates, start)
+        hi = bisect.bisect_right(self._dates, end, lo)
+        return self._ids[lo:hi]
+
+    def span(self):
+        """(oldest date, newest date), or (None, None) when empty."""
+        if not self._dates:
+            return None, None
+        return self._dates[0], self._dates[-1]
+
+    def on_day(self, date: str):
+        return self.between(date, date)
+
+    def month_counts(self, year: int, month: int):
+        """{date: number of entries} for the days of a month that have entries."""
+        prefix = f"{year:04d}-{month:02d}-"
+        lo = bisect.bisect_left(self._dates, prefix + "00")
+        hi = bisect.bisect_right(self._dates, prefix + "99", lo)
+        counts = {}
+        for date in self._dates[lo:hi]:
+            counts[date] = counts.get(date, 0) + 1
+        return counts
@@ -0,0 +1,40 @@
+# dates.py
+# Date parsing for entries and queries (standard library only, so the
+# service, server and importer work without the cryptography package).
+#
+#   parse_date("2025-01-02")                  -> "2025-01-02" (ValueError if invalid)
+#   parse_date_range("2025-01-01 to 2025-01-31") -> ("2025-01-01", "2025-01-31")
+
+import re
+from datetime import datetime
+from typing import Optional
+
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+RANGE_RE = re.compile(r"^\s*(\S+)\s+to\s+(\S+)\s*$", re.IGNORECASE)
+
+
+def parse_date(date_str: Optional[str]):
+    """Validate YYYY-MM-DD or return None."""
+    if not date_str:
+        return None
+    date_str = date_str.strip()
+    if DATE_RE.match(date_str):
+        # will raise ValueError if invalid date
+        datetime.strptime(date_str, "%Y-%m-%d")
+        return date_str
+    raise ValueError("Date must be YYYY-MM-DD")
+
+
+def parse_date_range(query: str):
+    """Parse 'YYYY-MM-DD to YYYY-MM-DD' into (start, end), or None if not a range.
+
+    Only a standalone 'to' separates the two dates, so keywords such as
+    'tomorrow' are not mistaken for ranges. Raises ValueError on bad dates.
+    """
+    m = RANGE_RE.match(query or "")
+    if not m:
+        return None
+    start, end = parse_date(m.group(1)), parse_date(m.group(2))
+    if start > end:
+        start, end = end, start
+    return start, end
@@ -0,0 +1,112 @@
+# diary.py
+# Command-line front end for DiaryService (no display needed).
+#
+#   python diary.py stats <user> [--full]
+#   python diary.py search <user> "trip*"            (or a day / "A to B" range)
+#   python diary.py export <user> out.pdf|out.md|out.jsonl [--from D] [--to D] [--query Q]
+#   python diary.py import <user> entries.jsonl|entries.json|notes.md|folder/ [--no-index]
+#   python diary.py lock-range <user> 2025-01-01 2025-01-31
+#
+# Passwords are read from the DIARY_PASSWORD env var or prompted for.
+
+import argparse
+import getpass
+import json
+import os
+import sys
+import time
+from diary_service import DiaryService
+
+
+def _password(username):
+    return os.environ.get("DIARY_PASSWORD") or getpass.getpass(f"Password for {username}: ")
+
+
+def cmd_stats(svc, args):
+    if args.report:
+        from analytics import format_summary
+        print(format_summary(svc.stats(full=True)))
+    else:
+        print(json.dumps(svc.stats(full=args.full), indent=2))
+
+
+def cmd_search(svc, args):
+    for entry in svc.search(args.query, args.limit):
+        lock = "[locked] " if entry.get("locked") else ""
+        print(f"{entry.get('date', '')}  {lock}{entry.get('title', '')}  ({entry['id']})")
+
+
+def cmd_export(svc, args):
+    from exporter import select_entries
+    from dates import parse_date
+    selected = list(select_entries(svc.entries, parse_date(args.start), parse_date(args.end),
+                                   args.query, svc.index))
+    t0 = time.perf_counter()
+    n = svc.export(selected, args.output, args.format,
+                   progress=lambda done, total: print(f"\r{done}/{total} entries", end="", file=sys.stderr))
+    print(f"\nExported {n} entries to {args.output} in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+
+def cmd_import(svc, args):
+    from importer import print_report
+    report = svc.import_file(args.path, index=not args.no_index,
+                             progress=lambda r: print(f"\r{r.added} entries", end="", file=sys.stderr))
+    print(file=sys.stderr)
+    print_report(report)
+
+
+def cmd_lock_range(svc, args):
+    svc.open_keys(_password(svc.username))
+    changed, failed = svc.lock_range(args.start, args.end)
+    print(f"Locked {changed} entries." + (f" {failed} failed." if failed else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="diary", description="Diary batch operations.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stats", help="entry counts and date span")
+    p.add_argument("username")
+    p.add_argument("--full", action="store_true", help="add streaks, activity, word counts and top terms")
+    p.add_argument("--report", action="store_true", help="the full statistics as text instead of JSON")
+    p.set_defaults(run=cmd_stats)
+
+    p = sub.add_parser("search", help="keyword, prefix*, \"phrase\", day or date range")
+    p.add_argument("username")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int)
+    p.set_defaults(run=cmd_search)
+
+    p = sub.add_parser("export", help="export to .pdf, .md or .jsonl")
+    p.add_argument("username")
+    p.add_argument("output")
+    p.add_argument("--format", choices=["pdf", "md", "jsonl"])
+    p.add_argument("--from", dest="start")
+    p.add_argument("--to", dest="end")
+    p.add_argument("--query")
+    p.set_defaults(run=cmd_export)
+
+    p = sub.add_parser("import", help="add entries from .jsonl, a JSON list, .md files or a folder")
+    p.add_argument("username")
+    p.add_argument("path")
+    p.add_argument("--no-index", action="store_true", help="skip search indexing (rebuilt on next open)")
+    p.set_defaults(run=cmd_import)
+
+    p = sub.add_parser("lock-range", help="encrypt every entry dated START..END")
+    p.add_argument("username")
+    p.add_argument("start")
+    p.add_argument("end")
+    p.set_defaults(run=cmd_lock_range)
+
+    args = parser.parse_args(argv)
+    svc = DiaryService(args.username)
+    try:
+        args.run(svc, args)
+    except ValueError as exc:
+        parser.exit(1, f"diary: {exc}\n")
+    finally:
+        svc.close()
+
+
+if __name__ == "__main__":
+    main()
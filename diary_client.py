@@ -0,0 +1,281 @@
+# diary_client.py
+# Client side of server.py: with DIARY_SERVER set, the login frame and the
+# dashboard talk to a diary server instead of reading the files directly.
+#
+#   DIARY_SERVER=http://127.0.0.1:8765 python app.py
+#
+# RemoteService offers the DiaryService methods the dashboard uses. Entry
+# headers are fetched once at login; bodies are fetched when an entry is
+# opened (LazyEntry + RemoteBodies) and every change is a request, emitted
+# on self.changes once the server has stored it.
+
+import http.client
+import json
+import os
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from urllib.parse import quote, urlencode, urlsplit
+from changes import ChangeFeed, Change, INSERTED, UPDATED, DELETED, LOCKED
+from date_index import DateIndex
+from diary_service import DiaryService
+from journal import BODY_CACHE_SIZE, LazyEntry
+
+SERVER_ENV = "DIARY_SERVER"
+TIMEOUT = 30
+
+
+def server_url() -> str:
+    return os.environ.get(SERVER_ENV, "").rstrip("/")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Client:
+    """One keep-alive connection to the server, shared by the Tk and worker threads."""
+
+    def __init__(self, url: str, token: str = None):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.token = token
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def request(self, method: str, path: str, body=None, query=None):
+        if query:
+            path += "?" + urlencode({k: v for k, v in query.items() if v is not None})
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        with self._lock:
+            for attempt in (0, 1):
+                reused = self._conn is not None
+                conn = self._conn or http.client.HTTPConnection(self.host, self.port, timeout=TIMEOUT)
+                try:
+                    conn.request(method, path, body=data, headers=headers)
+                    resp = conn.getresponse()
+                    payload = resp.read()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    conn.close()
+                    self._conn = None
+                    if attempt or not reused:
+                        raise
+                    continue  # the server closed an idle keep-alive connection: reconnect once
+                except Exception:
+                    conn.close()
+                    self._conn = None
+                    raise
+                self._conn = None if resp.will_close else conn
+                break
+        if resp.status >= 400:
+            try:
+                message = json.loads(payload)["error"]
+            except (ValueError, KeyError, TypeError):
+                message = resp.reason
+            raise ApiError(resp.status, message)
+        if not payload or not resp.getheader("Content-Type", "").startswith("application/json"):
+            return payload
+        return json.loads(payload)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ---------------- login ----------------
+_clients = {}  # username -> logged-in Client
+
+
+def remote_signup(username: str, password: str):
+    """auth.signup against the server: (ok, message)."""
+    try:
+        Client(server_url()).request("POST", "/api/signup", {"username": username, "password": password})
+    except ApiError as exc:
+        return False, str(exc)
+    return True, "Account created successfully!"
+
+
+def remote_login(username: str, password: str):
+    """auth.login against the server: (ok, message); keeps the session for open_remote()."""
+    client = Client(server_url())
+    try:
+        reply = client.request("POST", "/api/login", {"username": username, "password": password})
+    except ApiError as exc:
+        return False, str(exc)
+    client.token = reply["token"]
+    _clients[username] = client
+    return True, "Login successful!"
+
+
+def open_remote(username: str):
+    """RemoteService for a user logged in with remote_login(), else None."""
+    client = _clients.pop(username, None)
+    return RemoteService(client, username) if client is not None else None
+
+
+# ---------------- service ----------------
+class RemoteBodies:
+    """Body reader for LazyEntry that fetches entries from the server, with an LRU cache."""
+
+    def __init__(self, client, cache_size=BODY_CACHE_SIZE):
+        self.client = client
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self._cache = OrderedDict()
+
+    def read(self, entry_id, cache=True):
+        with self.lock:
+            if entry_id in self._cache:
+                self._cache.move_to_end(entry_id)
+                return self._cache[entry_id]
+        content = self.client.request("GET", f"/api/entries/{quote(entry_id, safe='')}").get("content", "")
+        if cache:
+            with self.lock:
+                self._cache[entry_id] = content
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return content
+
+    def forget(self, entry_id):
+        with self.lock:
+            self._cache.pop(entry_id, None)
+
+
+class RemoteService:
+    """DiaryService stand-in whose storage is a diary server."""
+
+    # pure helpers shared with the local service
+    is_date_query = staticmethod(DiaryService.is_date_query)
+    live_query = staticmethod(DiaryService.live_query)
+    refines = staticmethod(DiaryService.refines)
+    to_change = DiaryService.to_change
+    begin_bulk_lock = DiaryService.begin_bulk_lock
+    bulk_lock = DiaryService.bulk_lock
+    between = DiaryService.between
+    on_day = DiaryService.on_day
+    get = DiaryService.get
+    export = DiaryService.export
+    export_pdf = staticmethod(DiaryService.export_pdf)
+
+    def __init__(self, client: Client, username: str):
+        self.client = client
+        self.username = username
+        self.bodies = RemoteBodies(client)
+        reply = client.request("GET", "/api/entries")
+        self.entries = [LazyEntry(fields, self.bodies) for fields in reply["entries"]]
+        self.by_id = {e["id"]: e for e in self.entries}
+        self.dates = DateIndex(self.entries)
+        self.changes = ChangeFeed()
+        self.changes.subscribe(self._update_dates)
+        self.has_keys = False
+        # the dashboard hooks on_external; the server has no change feed yet, so
+        # other clients' edits show up at the next login
+        self.store = SimpleNamespace(on_external=None)
+
+    def _path(self, entry_id, action=""):
+        return f"/api/entries/{quote(entry_id, safe='')}{action}"
+
+    def _refresh(self, entry, fields):
+        """Take the server's version of an entry (content is re-read on demand)."""
+        self.bodies.forget(entry["id"])
+        old_id = entry["id"]
+        dict.clear(entry)
+        dict.update(entry, fields)
+        if old_id != entry["id"]:
+            self.by_id.pop(old_id, None)
+            self.by_id[entry["id"]] = entry
+
+    def _update_dates(self, changes):
+        for change in changes:
+            if change.kind == DELETED:
+                self.dates.remove(change.entry_id)
+            else:
+                self.dates.update(change.entry)
+
+    # ---------------- entries ----------------
+    def add(self, title: str, content: str, day: str = None):
+        fields = self.client.request("POST", "/api/entries", {"title": title, "content": content, "date": day})
+        entry = LazyEntry(fields, self.bodies)
+        self.entries.insert(0, entry)
+        self.by_id[entry["id"]] = entry
+        self.changes.emit(Change(INSERTED, entry, journal=False))
+        return entry
+
+    def edit(self, entry_id: str, title: str, content: str, day: str = None):
+        entry = self.by_id[entry_id]
+        old_date = entry.get("date")
+        fields = self.client.request("PUT", self._path(entry_id), {"title": title, "content": content, "date": day})
+        self._refresh(entry, fields)
+        self.changes.emit(Change(UPDATED, entry, old_date, journal=False))
+        return entry, old_date
+
+    def delete(self, entry_id: str):
+        self.client.request("DELETE", self._path(entry_id))
+        entry = self.by_id.pop(entry_id)
+        self.entries.remove(entry)
+        self.bodies.forget(entry_id)
+        self.changes.emit(Change(DELETED, entry, journal=False))
+        return entry
+
+    # ---------------- locking ----------------
+    def open_keys(self, password: str):
+        """The server derives and keeps the keys for this session."""
+        try:
+            self.client.request("POST", "/api/keys", {"password": password})
+        except ApiError as exc:
+            raise ValueError(str(exc))
+        self.has_keys = True
+
+    def wipe_keys(self):
+        if self.has_keys:
+            self.has_keys = False
+            self.client.request("DELETE", "/api/keys")
+
+    def set_locked(self, entry, locked: bool, record: bool = True):
+        fields = self.client.request("POST", self._path(entry["id"], "/lock" if locked else "/unlock"))
+        self._refresh(entry, fields)
+        self.changes.emit(Change(LOCKED, entry, journal=False))
+
+    def split_legacy(self, todo, locked: bool):
+        return todo, []  # the server decrypts legacy blobs itself
+
+    def persist(self):
+        pass  # the server compacts its own journals
+
+    def flush(self):
+        pass  # every change was a request
+
+    # ---------------- queries ----------------
+    def search_ids(self, query: str, limit: int = None, within=None):
+        ids = self.client.request("GET", "/api/search", query={"q": query, "limit": limit})["ids"]
+        return [i for i in ids if i in within] if within is not None else ids
+
+    def search(self, query: str, limit: int = None):
+        try:
+            ids = self.search_ids(query, limit)
+        except ApiError as exc:
+            if exc.status == 400:
+                raise ValueError(str(exc))
+            raise
+        return [self.by_id[i] for i in ids if i in self.by_id]
+
+    def stats(self, full: bool = False) -> dict:
+        return self.client.request("GET", "/api/stats", query={"full": "1" if full else None})
+
+    def heatmap(self, year: int, month: int) -> dict:
+        """Word counts stay on the server: days are shaded by their number of entries."""
+        return {day: min(count, 4) for day, count in self.dates.month_counts(year, month).items()}
+
+    def close(self):
+        try:
+            self.client.request("POST", "/api/logout")
+        except (ApiError, OSError):
+            pass  # server gone: the session expires on its own
+        self.client.close()
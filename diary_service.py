@@ -0,0 +1,418 @@
+# diary_service.py
+# Headless diary core: every entry operation for one user, no UI imports.
+#
+# The dashboard is a thin client of DiaryService; diary.py exposes the same
+# operations on the command line (import, export, search, lock-range, stats).
+#
+#   svc = DiaryService("alice")
+#   svc.add("Title", "Body")
+#   svc.search("trip*")
+#   svc.open_keys(password); svc.lock_range("2025-01-01", "2025-01-31")
+#   svc.changes.subscribe(listener)   # inserted/updated/deleted/locked events (changes.py)
+#   svc.stats(full=True)              # streaks, activity, word counts, top terms (analytics.py)
+#   svc.close()
+
+import re
+from datetime import date
+from storage import ensure_user, open_store, open_search_index
+from journal import new_entry_id
+from changes import ChangeFeed, Change, WriteCoalescer, INSERTED, UPDATED, DELETED, LOCKED, RESET
+from date_index import DateIndex
+from dates import parse_date, parse_date_range
+from instrument import traced
+
+DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+DATE_RANGE_RE = re.compile(r"^\s*\d\S*\s+to\s+\d\S*\s*$", re.IGNORECASE)
+
+
+class EntryLockedError(Exception):
+    """The operation needs the entry unlocked first."""
+
+
+def today() -> str:
+    return date.today().strftime("%Y-%m-%d")
+
+
+def _valid_day(day: str = None) -> str:
+    """`day` checked to be a real YYYY-MM-DD date (ValueError otherwise), or today."""
+    return parse_date(day) or today()
+
+
+class BulkLock:
+    """One bulk lock/unlock, in steps (DiaryService.begin_bulk_lock).
+
+    Creating it changes every entry the session keys handle directly.
+    Legacy per-entry-salt blobs need a full PBKDF2 run each: iterate
+    `results` (worker processes; safe on a worker thread) and pass each
+    result to apply() on the thread that owns the service. finish() writes
+    one snapshot and returns (changed, failed).
+    """
+
+    def __init__(self, service, entries, locked: bool):
+        self.service = service
+        self.locked = locked
+        todo = service.to_change(entries, locked)
+        fast, self.legacy = service.split_legacy(todo, locked)
+        self.total = len(todo)
+        self.failed = 0
+        with service.changes.batch():
+            for entry in fast:
+                try:
+                    service.set_locked(entry, locked, record=False)
+                except Exception:
+                    self.failed += 1
+        self.done = len(fast)
+        self.results = service.decrypt_legacy(self.legacy) if self.legacy else ()
+
+    def apply(self, i, ok, value):
+        self.done += 1
+        if ok:
+            self.service.unlocked(self.legacy[i], value)
+        else:
+            self.failed += 1
+
+    def finish(self):
+        if self.total:
+            self.service.persist()
+        failed = self.failed + self.total - self.done  # a stopped run leaves some undone
+        return self.total - failed, failed
+
+
+class DiaryService:
+    """A user's entries plus their indexes, kept in step with the store.
+
+    Every mutation emits a Change on self.changes; the indexes and the
+    journal are its first listeners. Journal writes go through
+    run_io(fn, arg) (inline by default; the dashboard passes its io lane).
+    With schedule_flush, writes are coalesced: the first change of a window
+    calls schedule_flush() and the caller runs flush() when the window ends.
+    When the journal needs compacting, schedule_persist() is called
+    (persist() by default).
+    """
+
+    def __init__(self, username: str, lazy: bool = False, run_io=None, schedule_persist=None,
+                 schedule_flush=None):
+        self.username = username
+        ensure_user(username)
+        self.store = open_store(username)
+        self.lazy = lazy
+        self.entries = self.store.load(lazy=lazy)
+        self.by_id = {e["id"]: e for e in self.entries}
+        self.index = open_search_index(username, self.entries, self.store.seq)
+        self.dates = DateIndex(self.entries)
+        self.keys = None  # KeySession, see open_keys()
+        self._analytics = None
+        self.run_io = run_io or (lambda fn, arg: fn(arg))
+        self.schedule_persist = schedule_persist or self.persist
+        if run_io is not None:
+            # the caller's io thread owns the store: compaction waits for persist()
+            self.store.auto_compact = False
+        self.changes = ChangeFeed()
+        self.changes.subscribe(self._update_indexes)
+        self.writes = self.changes.subscribe(WriteCoalescer(self._write, schedule_flush))
+
+    # ---------------- storage ----------------
+    def _write(self, ops):
+        """WriteCoalescer's output: one write_many (one fsync) per flush."""
+        ops = [(op, payload if op == "delete" else self._copy(payload)) for op, payload in ops]
+        self.run_io(self.store.write_many, ops)
+        if self.store.needs_compaction:
+            self.schedule_persist()
+
+    @staticmethod
+    def _copy(entry):
+        if isinstance(entry, dict):
+            return entry.copy()
+        return entry.plain()  # entry view: read it now, a compaction may move its file
+
+    def flush(self):
+        """Journal the changes coalesced so far."""
+        self.writes.flush()
+
+    def persist(self):
+        """Full rewrite: fold the journal into a new snapshot of the current entries."""
+        self.writes.discard()  # the snapshot has them
+        self.run_io(self.store.compact, [e.copy() for e in self.entries])
+
+    def save_index(self):
+        if self.index.dirty:
+            self.index.save(self.store.seq)
+
+    def close(self):
+        self.flush()
+        self.wipe_keys()
+        self.save_index()
+        self.store.close()
+
+    def apply_external(self, records):
+        """Merge journal records written by another process; returns the affected days.
+
+        Works through by_id, so the cost follows the records, not the diary
+        size. The changes are emitted as one batch, marked as already journaled.
+        """
+        days = set()
+        with self.changes.batch():
+            for rec in records:
+                if rec["op"] == "delete":
+                    entry = self.by_id.pop(rec["id"], None)
+                    if entry is not None:
+                        self.entries.remove(entry)
+                        days.add(entry.get("date"))
+                        self.changes.emit(Change(DELETED, entry, journal=False))
+                    continue
+                new = rec["entry"]
+                entry = self.by_id.get(new["id"])
+                if entry is not None:
+                    old_date = entry.get("date")
+                    entry.clear()
+                    entry.update(new)
+                    change = Change(UPDATED, entry, old_date, journal=False)
+                elif rec["op"] == "insert":
+                    entry = self.by_id[new["id"]] = new
+                    if rec.get("at") == 0:
+                        self.entries.insert(0, entry)
+                    else:
+                        self.entries.append(entry)
+                    change = Change(INSERTED, entry, journal=False)
+                else:
+                    continue  # update of an entry deleted in the meantime
+                days.update((change.old_date, entry.get("date")))
+                self.changes.emit(change)
+        days.discard(None)
+        return days
+
+    def read_store(self):
+        """The store's current entries, read as at open (may run on the io thread); for reload()."""
+        return self.store.load(lazy=self.lazy)
+
+    def reload(self, entries):
+        """Replace the entries (e.g. after another process rewrote the snapshot)."""
+        self.writes.discard()  # the other process's snapshot wins
+        self.entries[:] = entries
+        self.by_id = {e["id"]: e for e in self.entries}
+        self.index.rebuild(self.entries)
+        self.dates = DateIndex(self.entries)
+        self.changes.emit(Change(RESET))
+
+    def _update_indexes(self, changes):
+        """First listener: the search and date indexes follow every change."""
+        for change in changes:
+            if change.kind == DELETED:
+                self.index.remove(change.entry_id)
+                self.dates.remove(change.entry_id)
+            elif change.kind != RESET:  # whoever emits RESET has rebuilt the indexes
+                self.index.update(change.entry)
+                self.dates.update(change.entry)
+
+    # ---------------- entries ----------------
+    def get(self, entry_id: str):
+        return self.by_id.get(entry_id)
+
+    def add(self, title: str, content: str, day: str = None) -> dict:
+        """New entry dated `day` (default today); ValueError for a bad date."""
+        entry = {"id": new_entry_id(), "title": title, "content": content,
+                 "date": _valid_day(day), "locked": False}
+        self.entries.insert(0, entry)
+        self.by_id[entry["id"]] = entry
+        self.changes.emit(Change(INSERTED, entry))
+        return entry
+
+    def edit(self, entry_id: str, title: str, content: str, day: str = None):
+        """Change an unlocked entry (its date becomes `day`, default today). Returns (entry, old date).
+
+        ValueError for a bad date, before anything is changed.
+        """
+        entry = self.by_id[entry_id]
+        if entry.get("locked"):
+            raise EntryLockedError("Unlock entry before editing.")
+        day = _valid_day(day)
+        old_date = entry.get("date")
+        entry["title"] = title
+        entry["content"] = content
+        entry["date"] = day
+        self.changes.emit(Change(UPDATED, entry, old_date))
+        return entry, old_date
+
+    def delete(self, entry_id: str) -> dict:
+        entry = self.by_id[entry_id]
+        if entry.get("locked"):
+            raise EntryLockedError("Unlock before deleting.")
+        self.entries.remove(entry)
+        del self.by_id[entry_id]
+        self.changes.emit(Change(DELETED, entry))
+        return entry
+
+    # ---------------- locking ----------------
+    def open_keys(self, password: str):
+        """Verify the password and derive the session keys (slow: run off the UI thread)."""
+        from key_session import open_session
+        self.keys = open_session(self.username, password)
+        return self.keys
+
+    def wipe_keys(self):
+        if self.keys is not None:
+            self.keys.wipe()
+            self.keys = None
+
+    @property
+    def has_keys(self) -> bool:
+        return self.keys is not None and self.keys.active
+
+    def set_locked(self, entry, locked: bool, record: bool = True):
+        """Encrypt/decrypt one entry with the session keys (record=False: a persist() follows)."""
+        if locked:
+            entry["content"] = self.keys.encrypt(entry.get("content", ""))
+        else:
+            entry["content"] = self.keys.decrypt(entry.get("content"))
+        entry["locked"] = locked
+        self.changes.emit(Change(LOCKED, entry, journal=record))
+
+    def to_change(self, entries, locked: bool):
+        return [e for e in entries if bool(e.get("locked")) != locked]
+
+    def split_legacy(self, todo, locked: bool):
+        """(session, legacy): legacy per-entry-salt blobs need a full PBKDF2 run each."""
+        from key_session import KeySession
+        if locked:
+            return todo, []
+        legacy = [e for e in todo if KeySession.is_legacy(e.get("content"))]
+        legacy_ids = {id(e) for e in legacy}
+        return [e for e in todo if id(e) not in legacy_ids], legacy
+
+    def decrypt_legacy(self, entries):
+        """Iterator of (i, ok, plaintext or error) for legacy blobs, using worker processes.
+
+        Iterating is safe on a worker thread; apply results with unlocked().
+        """
+        from batch_crypto import decrypt_many
+        return decrypt_many(self.keys.password, [e["content"] for e in entries])
+
+    def unlocked(self, entry, plaintext: str):
+        entry["content"] = plaintext
+        entry["locked"] = False
+        self.changes.emit(Change(LOCKED, entry, journal=False))
+
+    def begin_bulk_lock(self, entries, locked: bool) -> BulkLock:
+        """bulk_lock() for callers that wait for the legacy blobs on a worker thread."""
+        return BulkLock(self, entries, locked)
+
+    @traced("crypto.bulk_lock")
+    def bulk_lock(self, entries, locked: bool, progress=None):
+        """Lock or unlock many entries; one snapshot rewrite at the end. Returns (changed, failed).
+
+        progress(done, total) is called as the legacy blobs are decrypted.
+        """
+        job = self.begin_bulk_lock(entries, locked)
+        for result in job.results:
+            job.apply(*result)
+            if progress:
+                progress(job.done, job.total)
+        return job.finish()
+
+    def lock_range(self, start: str, end: str):
+        return self.bulk_lock(self.between(start, end), True)
+
+    # ---------------- queries ----------------
+    def between(self, start: str, end: str):
+        return [self.by_id[i] for i in self.dates.between(start, end)]
+
+    def on_day(self, day: str):
+        return [self.by_id[i] for i in self.dates.on_day(day)]
+
+    @traced("search.query")
+    def search(self, query: str, limit: int = None):
+        """Date range ("A to B"), single day or index query; ValueError for a bad range."""
+        query = query.strip()
+        if not query:
+            return list(self.entries)
+        # "trip to paris" is a keyword query, not a bad range
+        rng = parse_date_range(query) if DATE_RANGE_RE.match(query) else None
+        if rng:
+            return self.between(*rng)
+        if DAY_RE.match(query):
+            return self.on_day(query)
+        # keyword / prefix* / "phrase" (locked entries only have their title indexed)
+        return [self.by_id[i] for i in self.index.search(query, limit)]
+
+    def search_ids(self, query: str, limit: int = None, within=None):
+        """Index query only (no date forms); within restricts it to candidate ids."""
+        return self.index.search(query, limit, within)
+
+    @staticmethod
+    def is_date_query(query: str) -> bool:
+        """A single day or a range of things that look like dates."""
+        query = query.strip()
+        return bool(DAY_RE.match(query) or DATE_RANGE_RE.match(query))
+
+    @staticmethod
+    def live_query(text: str) -> str:
+        """Index query for text still being typed: the last word matches as a prefix."""
+        if text.count('"') % 2:
+            return text.strip() + '"'  # phrase still open
+        if not text or text[-1].isspace() or text.rstrip().endswith(('"', "*")):
+            return text.strip()
+        return text.strip() + "*"
+
+    @staticmethod
+    def refines(old_text: str, new_text: str) -> bool:
+        """True if new_text's live results are a subset of old_text's.
+
+        Clauses are ANDed and the last word is a prefix, so typing more
+        characters or more words only narrows the result (phrases aside).
+        """
+        return (old_text is not None and new_text.startswith(old_text)
+                and '"' not in new_text and "*" not in old_text)
+
+    def stats(self, full: bool = False) -> dict:
+        """Counts and date span; full=True adds the analytics summary."""
+        if full:
+            summary = self.analytics.summary()
+            summary["unlocked"] = summary["entries"] - summary["locked"]
+            summary["terms"] = len(self.index.postings)
+            return summary
+        locked = sum(1 for e in self.entries if e.get("locked"))
+        first, last = self.dates.span()
+        return {"entries": len(self.entries), "locked": locked, "unlocked": len(self.entries) - locked,
+                "first_date": first, "last_date": last, "terms": len(self.index.postings)}
+
+    @property
+    def analytics(self):
+        """DiaryStats (analytics.py): built on first use, then kept current by change events."""
+        if self._analytics is None:
+            from analytics import DiaryStats
+            self._analytics = self.changes.subscribe(DiaryStats(self.entries, self.index))
+        return self._analytics
+
+    def heatmap(self, year: int, month: int) -> dict:
+        """{day: heat level 1..4} for the calendar, by words written that day."""
+        return self.analytics.heatmap(year, month)
+
+    # ---------------- import / export ----------------
+    def export(self, entries, path: str, fmt: str = None, progress=None):
+        """Stream entries to .pdf/.md/.jsonl (safe on a worker thread: copies first)."""
+        from exporter import export_entries
+        snapshot = [e.copy() for e in entries]
+        return export_entries(snapshot, path, fmt, progress=progress, total=len(snapshot))
+
+    @staticmethod
+    @traced("export.pdf_single")
+    def export_pdf(entry, path: str):
+        """Single-entry PDF (title centered, fpdf layout)."""
+        from fpdf import FPDF
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", "B", 16)
+        pdf.cell(0, 10, entry.get("title", ""), ln=True, align="C")
+        pdf.ln(4)
+        pdf.set_font("Arial", size=12)
+        pdf.multi_cell(0, 8, entry.get("content", ""))
+        pdf.output(path)
+        return path
+
+    def import_file(self, path: str, index: bool = True, progress=None):
+        """Bulk import from .jsonl, a .json list, a .md file or a folder of them (importer.py).
+
+        One snapshot rewrite at the end; returns an ImportReport (added, skipped, rate).
+        """
+        from importer import import_entries
+        return import_entries(self, path, index=index, progress=progress)
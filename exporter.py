@@ -0,0 +1,255 @@
+# exporter.py
+# Streaming export of many entries to PDF, Markdown or JSONL.
+#
+# Entries are written one at a time, so memory stays bounded by a single
+# entry (plus one PDF page) however large the selection is.
+#
+# CLI:
+#   python exporter.py <username> <out.pdf|out.md|out.jsonl> [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--query Q]
+
+import argparse
+import json
+import os
+import sys
+import time
+from journal import plain_entry
+from instrument import traced
+
+LOCKED_PLACEHOLDER = "(Locked entry - unlock it to export the content.)"
+
+
+def entry_text(entry) -> str:
+    content = entry.get("content", "")
+    if entry.get("locked") or not isinstance(content, str):
+        return LOCKED_PLACEHOLDER
+    return content
+
+
+# ---------------- writers ----------------
+class JsonlWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, entry):
+        self.f.write(json.dumps(plain_entry(entry), ensure_ascii=False))
+        self.f.write("\n")
+
+    def close(self):
+        self.f.close()
+
+
+class MarkdownWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, entry):
+        lock = "🔒 " if entry.get("locked") else ""
+        self.f.write(f"## {lock}{entry.get('title', '')}\n\n*{entry.get('date', '')}*\n\n")
+        self.f.write(entry_text(entry))
+        self.f.write("\n\n---\n\n")
+
+    def close(self):
+        self.f.close()
+
+
+# Helvetica glyph widths (1/1000 em) for ASCII 32..126, WinAnsiEncoding
+_HELVETICA = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_BOLD_FACTOR = 1.08  # Helvetica-Bold is slightly wider; good enough for line breaking
+_WIDTHS = {chr(32 + i): w for i, w in enumerate(_HELVETICA)}
+
+
+class PdfWriter:
+    """Minimal streaming PDF writer (A4, Helvetica, WinAnsi text).
+
+    Each page's content stream and page object are written to disk as soon
+    as the page is full; only the page object numbers are kept until close().
+    """
+
+    WIDTH, HEIGHT = 595, 842
+    MARGIN = 50
+
+    def __init__(self, path):
+        self.f = open(path, "wb")
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 5  # 1 catalog, 2 pages, 3 regular font, 4 bold font
+        self.ops = []
+        self.y = None
+        self._out(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self._obj(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    # -- low level --
+    def _out(self, data):
+        self.f.write(data)
+
+    def _obj(self, num, body):
+        self.offsets[num] = self.f.tell()
+        self._out(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def _new_id(self):
+        num = self.next_id
+        self.next_id += 1
+        return num
+
+    def _wrap(self, text, size, bold=False):
+        """Greedy line breaking in glyph units (1/1000 em); each word is measured once."""
+        limit = (self.WIDTH - 2 * self.MARGIN) * 1000 / size / (_BOLD_FACTOR if bold else 1.0)
+        get = _WIDTHS.get
+        space = _WIDTHS[" "]
+        for para in text.split("\n"):
+            words, width = [], 0
+            for word in para.split(" "):
+                w = sum(get(c, 556) for c in word)
+                if words and width + space + w <= limit:
+                    words.append(word)
+                    width += space + w
+                    continue
+                if words:
+                    yield " ".join(words)
+                # hard-break words longer than a line
+                while w > limit:
+                    cut = max(1, int(len(word) * limit / w))
+                    yield word[:cut]
+                    word = word[cut:]
+                    w = sum(get(c, 556) for c in word)
+                words, width = [word], w
+            yield " ".join(words)
+
+    # -- pages --
+    def _flush_page(self):
+        if self.y is None:
+            return
+        stream = "\n".join(self.ops).encode("cp1252", "replace")  # WinAnsiEncoding, as the fonts declare
+        content_id, page_id = self._new_id(), self._new_id()
+        self._obj(content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        self._obj(page_id, (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            "/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+            % (self.WIDTH, self.HEIGHT, content_id)).encode())
+        self.page_ids.append(page_id)
+        self.ops = []
+        self.y = None
+
+    def _line(self, text, size, bold=False, leading=None):
+        leading = leading or size * 1.35
+        if self.y is None or self.y - leading < self.MARGIN:
+            self._flush_page()
+            self.y = self.HEIGHT - self.MARGIN
+        self.y -= leading
+        safe = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        font = "F2" if bold else "F1"
+        self.ops.append(f"BT /{font} {size} Tf {self.MARGIN} {self.y:.1f} Td ({safe}) Tj ET")
+
+    def write(self, entry):
+        for line in self._wrap(entry.get("title", ""), 16, bold=True):
+            self._line(line, 16, bold=True)
+        self._line(entry.get("date", ""), 9)
+        self._line("", 6)
+        for line in self._wrap(entry_text(entry), 11):
+            self._line(line, 11)
+        self._line("", 18)
+
+    def close(self):
+        if self.y is None and not self.page_ids:
+            self.y = self.HEIGHT - self.MARGIN  # empty export still gets one page
+        self._flush_page()
+        kids = " ".join(f"{p} 0 R" for p in self.page_ids)
+        self._obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        self._obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_at = self.f.tell()
+        count = self.next_id
+        self._out(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for num in range(1, count):
+            self._out(b"%010d 00000 n \n" % self.offsets[num])
+        self._out(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref_at))
+        self.f.close()
+
+
+WRITERS = {"pdf": PdfWriter, "md": MarkdownWriter, "jsonl": JsonlWriter}
+
+
+def format_for(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    fmt = {"markdown": "md", "json": "jsonl"}.get(ext, ext)
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: .{ext} (use .pdf, .md or .jsonl)")
+    return fmt
+
+
+@traced("export.entries")
+def export_entries(entries, path: str, fmt: str = None, progress=None, total: int = None, every: int = 200):
+    """Stream `entries` (any iterable) to `path`. Returns the number written.
+
+    progress(done, total) is called every `every` entries and once at the end.
+    """
+    writer = WRITERS[fmt or format_for(path)](path)
+    done = 0
+    try:
+        for entry in entries:
+            writer.write(entry)
+            done += 1
+            if progress and done % every == 0:
+                progress(done, total)
+    finally:
+        writer.close()
+    if progress:
+        progress(done, total)
+    return done
+
+
+# ---------------- selection + CLI ----------------
+def select_entries(entries, start=None, end=None, query=None, index=None):
+    """Filter entries by date range and/or index query (keeps diary order)."""
+    if query:
+        if index is None:
+            from search_index import SearchIndex
+            index = SearchIndex()
+            index.rebuild(entries)
+        hits = set(index.search(query))
+        entries = (e for e in entries if e["id"] in hits)
+    if start or end:
+        lo, hi = start or "0000-00-00", end or "9999-99-99"
+        entries = (e for e in entries if lo <= e.get("date", "") <= hi)
+    return entries
+
+
+def main(argv=None):
+    from storage import open_store, open_search_index
+    from dates import parse_date
+
+    parser = argparse.ArgumentParser(description="Export diary entries to PDF, Markdown or JSONL.")
+    parser.add_argument("username")
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=sorted(WRITERS))
+    parser.add_argument("--from", dest="start")
+    parser.add_argument("--to", dest="end")
+    parser.add_argument("--query")
+    args = parser.parse_args(argv)
+
+    start, end = parse_date(args.start), parse_date(args.end)
+    store = open_store(args.username)
+    entries = store.load()
+    index = open_search_index(args.username, entries, store.seq) if args.query else None
+    selected = select_entries(entries, start, end, args.query, index)
+
+    t0 = time.perf_counter()
+
+    def report(done, total):
+        print(f"\r{done} entries", end="", file=sys.stderr)
+
+    n = export_entries(selected, args.output, args.format, progress=report)
+    dt = time.perf_counter() - t0
+    print(f"\nExported {n} entries to {args.output} in {dt:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
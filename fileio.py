@@ -0,0 +1,113 @@
+# fileio.py
+# Crash-safe and multi-process-safe file writes.
+#
+#   atomic_write(path, data)   temp file in the same directory + fsync + rename
+#   locked(path)               exclusive advisory lock on <path>.lock, across processes
+#   file_stamp(path)           cheap identity of a file's contents, to notice changes
+
+import contextlib
+import os
+import tempfile
+import threading
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+def fsync_dir(directory: str):
+    """Make a rename durable (no-op where directories can't be opened, e.g. Windows)."""
+    if os.name == "nt":
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data, encoding: str = "utf-8"):
+    """Replace `path` with `data` so readers see either the old or the new file, never a torn one."""
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+    fsync_dir(directory)
+
+
+# path -> [RLock, depth, lock file]; makes locked() re-entrant within a process
+_held = {}
+_held_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def locked(path: str):
+    """Hold an exclusive advisory lock for `path` (via <path>.lock) for the block.
+
+    Re-entrant for the thread that holds it; other threads and processes wait.
+    """
+    key = os.path.abspath(path)
+    with _held_guard:
+        state = _held.setdefault(key, [threading.RLock(), 0, None])
+    state[0].acquire()
+    try:
+        if state[1] == 0:
+            f = open(key + ".lock", "a+b")
+            try:
+                _lock_file(f)
+            except BaseException:
+                f.close()
+                raise
+            state[2] = f
+        state[1] += 1
+        try:
+            yield
+        finally:
+            state[1] -= 1
+            if state[1] == 0:
+                f, state[2] = state[2], None
+                _unlock_file(f)
+                f.close()
+    finally:
+        state[0].release()
+
+
+def _lock_file(f):
+    if os.name == "nt":
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCK gives up after ~10s; keep waiting
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    if os.name == "nt":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def file_stamp(path: str):
+    """Cheap identity of a file's current contents (None if missing)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
@@ -0,0 +1,312 @@
+# importer.py
+# Streaming bulk import of external journals into a diary.
+#
+# Sources are parsed incrementally, one entry at a time:
+#   .jsonl             one entry object per line (exporter.py's JSONL)
+#   .json              a list of entries (the legacy entries.json) or {"entries": [...]}
+#   .md / a folder     exporter.py's Markdown, or one note per .md file
+#
+# All entries land in one batch: a single snapshot rewrite at the end, with
+# the search index filled in the same pass (or left for the next open).
+#
+# CLI:
+#   python importer.py <username> <path> [--no-index]
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import date
+from instrument import traced
+from changes import Change, RESET
+from journal import new_entry_id
+
+CHUNK = 1 << 16
+MAX_ERRORS = 20          # rejected records listed in the report (all are counted)
+MD_SUFFIXES = (".md", ".markdown")
+LOCK_MARK = "🔒 "
+FILE_DATE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})")
+MD_DATE_RE = re.compile(r"^\*(\d{4}-\d{2}-\d{2})\*$")
+
+
+class ImportReport:
+    def __init__(self):
+        self.added = 0
+        self.skipped = 0
+        self.errors = []    # "where: why" for the first MAX_ERRORS rejected records
+        self.seconds = 0.0
+
+    def reject(self, where, why):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"{where}: {why}")
+
+    @property
+    def rate(self) -> float:
+        """Entries per second."""
+        return self.added / self.seconds if self.seconds else 0.0
+
+
+# ---------------- readers ----------------
+# Each yields (where, item): a location for error messages and a raw entry dict.
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield f"{path}:{n}", json.loads(line)
+            except ValueError as exc:
+                yield f"{path}:{n}", exc
+
+
+def read_json(path):
+    """Items of a top-level JSON list, decoded one at a time from a buffered read."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(CHUNK)
+        pos = _skip(buf, 0)
+        if buf[pos:pos + 1] == "{":
+            data = json.loads(buf + f.read())  # {"entries": [...]}: no streaming form
+            for n, item in enumerate(data.get("entries", []), 1):
+                yield f"{path}#{n}", item
+            return
+        if buf[pos:pos + 1] != "[":
+            raise ValueError(f"{path}: expected a JSON list of entries")
+        pos, n, eof = pos + 1, 0, False
+        while True:
+            pos = _skip(buf, pos, ",")
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                complete = end < len(buf) or eof  # a number could continue in the next chunk
+            except ValueError:
+                complete = False
+            if not complete:
+                if eof:
+                    raise ValueError(f"{path}: malformed JSON after item {n}")
+                more = f.read(CHUNK)
+                buf, pos, eof = buf[pos:] + more, 0, not more
+                continue
+            n += 1
+            yield f"{path}#{n}", item
+            pos = end
+
+
+def _skip(buf, pos, extra=""):
+    while pos < len(buf) and (buf[pos].isspace() or buf[pos] in extra):
+        pos += 1
+    return pos
+
+
+def read_markdown(path):
+    """A .md file or every .md file under a folder (sorted, recursively)."""
+    if os.path.isdir(path):
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files += [os.path.join(root, n) for n in sorted(names) if n.lower().endswith(MD_SUFFIXES)]
+    else:
+        files = [path]
+    for name in files:
+        yield from _markdown_file(name)
+
+
+def _markdown_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.rstrip("\n") for line in f)
+        first = next(lines, None)
+        while first is not None and not first.strip():
+            first = next(lines, None)
+        if first is None:
+            return
+        if first.startswith("## "):
+            yield from _exported_sections(path, first, lines)
+        else:
+            yield path, _note(path, first, lines)
+
+
+def _exported_sections(path, first, lines):
+    """exporter.py's layout: "## title", "*date*", body, "---" between entries."""
+    heading, body, n = first, [], 1
+    for line in lines:
+        if line.startswith("## ") and _last_line(body) == "---":
+            yield f"{path}#{n}", _section(heading, body)
+            heading, body, n = line, [], n + 1
+        else:
+            body.append(line)
+    yield f"{path}#{n}", _section(heading, body)
+
+
+def _last_line(body):
+    for line in reversed(body):
+        if line.strip():
+            return line
+    return None
+
+
+def _section(heading, body):
+    title = heading[3:]
+    locked = title.startswith(LOCK_MARK)
+    if locked:
+        title = title[len(LOCK_MARK):]
+    text = "\n".join(body).strip("\n")
+    if text.endswith("---"):
+        text = text[:-3].rstrip("\n")
+    day = None
+    m = MD_DATE_RE.match(text.split("\n", 1)[0])
+    if m:
+        day = m.group(1)
+        text = text[m.end():].lstrip("\n")
+    item = {"title": title, "content": text, "date": day}
+    if locked:
+        item["locked_export"] = True  # the export has a placeholder, not the content
+    return item
+
+
+def _note(path, first, lines):
+    """A standalone note: optional front matter, "# title" or the file name, then the body."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    meta, body = {}, []
+    if first == "---":
+        for line in lines:
+            if line == "---":
+                break
+            key, _, value = line.partition(":")
+            meta[key.strip().lower()] = value.strip().strip("'\"")
+        first = next(lines, "")
+        while first is not None and not first.strip():
+            first = next(lines, None)
+        first = first or ""
+    title = meta.get("title")
+    if first.startswith("# ") and title is None:
+        title = first[2:].strip()
+    else:
+        body.append(first)
+    body.extend(lines)
+    m = FILE_DATE_RE.match(stem)
+    day = meta.get("date") or (m.group(1) if m else
+                               date.fromtimestamp(os.path.getmtime(path)).isoformat())
+    if title is None:
+        title = stem[m.end():].strip(" _-") if m else stem
+    return {"title": title or stem, "content": "\n".join(body).strip("\n"), "date": day}
+
+
+def read_source(path):
+    if os.path.isdir(path) or path.lower().endswith(MD_SUFFIXES):
+        return read_markdown(path)
+    if path.lower().endswith(".jsonl"):
+        return read_jsonl(path)
+    if path.lower().endswith(".json"):
+        return read_json(path)
+    raise ValueError(f"Unsupported import source: {path} (use .jsonl, .json, .md or a folder)")
+
+
+# ---------------- pipeline ----------------
+def to_entry(item, today: str, parse_date):
+    """A clean entry dict from a raw record; ValueError if it can't be imported."""
+    if isinstance(item, Exception):
+        raise ValueError(f"not valid JSON ({item})")
+    if not isinstance(item, dict):
+        raise ValueError("not an entry object")
+    if item.get("locked_export"):
+        raise ValueError("locked entry (exports don't contain its content)")
+    title, content, day = item.get("title") or "", item.get("content", ""), item.get("date")
+    if not isinstance(title, str) or not isinstance(content, str):
+        raise ValueError("title and content must be text")
+    if day is not None and not isinstance(day, str):
+        raise ValueError("date must be a YYYY-MM-DD string")
+    entry_id = item.get("id")
+    return {"id": entry_id if isinstance(entry_id, str) and entry_id else None, "title": title,
+            "content": content, "date": parse_date(day) or today, "locked": bool(item.get("locked"))}
+
+
+@traced("storage.import")
+def import_entries(svc, path: str, index: bool = True, progress=None, every: int = 1000) -> ImportReport:
+    """Stream entries from `path` into a DiaryService, then commit them with one rewrite.
+
+    Records that fail validation are skipped and reported; a source that
+    can't be parsed further undoes the whole import. index=False skips search
+    indexing (faster; the index is rebuilt the next time the diary is opened,
+    so use it when the diary is closed right after). progress(report) is
+    called every `every` entries.
+    """
+    from dates import parse_date
+    report = ImportReport()
+    today = date.today().isoformat()
+    start = len(svc.entries)
+    t0 = time.perf_counter()
+
+    def accepted():
+        for where, item in read_source(path):
+            try:
+                entry = to_entry(item, today, parse_date)
+            except ValueError as exc:
+                report.reject(where, exc)
+                continue
+            if entry["id"] is None or entry["id"] in svc.by_id:
+                entry["id"] = new_entry_id()
+            svc.entries.append(entry)
+            svc.by_id[entry["id"]] = entry
+            report.added += 1
+            if progress and report.added % every == 0:
+                report.seconds = time.perf_counter() - t0
+                progress(report)
+            yield entry
+
+    try:
+        if index:
+            svc.index.extend(accepted())  # indexed in the same pass
+        else:
+            for _ in accepted():
+                pass
+    except Exception:
+        for entry in svc.entries[start:]:
+            del svc.by_id[entry["id"]]
+            svc.index.remove(entry["id"])
+        del svc.entries[start:]
+        raise
+    if report.added:
+        svc.dates.rebuild(svc.entries)  # one sort instead of an insert per entry
+        if not index:
+            svc.index.invalidate()
+        svc.persist()
+        svc.changes.emit(Change(RESET))  # listeners resync; the indexes are already done
+    report.seconds = time.perf_counter() - t0
+    return report
+
+
+def print_report(report, out=sys.stderr):
+    print(f"Imported {report.added} entries in {report.seconds:.2f}s ({report.rate:,.0f} entries/s).", file=out)
+    if report.skipped:
+        print(f"Skipped {report.skipped}:", file=out)
+        for line in report.errors:
+            print(f"  {line}", file=out)
+        if report.skipped > len(report.errors):
+            print(f"  ... and {report.skipped - len(report.errors)} more", file=out)
+
+
+def main(argv=None):
+    from diary_service import DiaryService
+
+    parser = argparse.ArgumentParser(description="Import entries from JSONL, JSON or Markdown.")
+    parser.add_argument("username")
+    parser.add_argument("path")
+    parser.add_argument("--no-index", action="store_true", help="skip search indexing (rebuilt on next open)")
+    args = parser.parse_args(argv)
+
+    svc = DiaryService(args.username)
+    try:
+        report = import_entries(svc, args.path, index=not args.no_index,
+                                progress=lambda r: print(f"\r{r.added} entries", end="", file=sys.stderr))
+    finally:
+        svc.close()
+    print(file=sys.stderr)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# instrument.py
+# Lightweight tracing for hot paths: timers, counters, optional profilers.
+#
+#   @traced("storage.compact")          # time every call (when enabled)
+#   with span("crypto.bulk"): ...       # time a block
+#   count("search.hits", len(ids))      # bump a counter
+#
+# Disabled (the default) a traced call costs one global check. Enable with
+# DIARY_TRACE=1 or set_enabled(True) (the dashboard's diagnostics panel,
+# Ctrl+Shift+D). Names are "<area>.<what>" so stalls can be attributed to
+# storage, search, crypto, export or ui.
+
+import cProfile
+import functools
+import io
+import json
+import os
+import platform
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+SAMPLES = 1000  # latest durations kept per name for percentiles
+
+_enabled = os.environ.get("DIARY_TRACE") == "1"
+_lock = threading.Lock()
+_timings = {}    # name -> [calls, total seconds, deque of recent durations]
+_counters = {}   # name -> int
+_profiler = None
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(on: bool):
+    global _enabled
+    _enabled = bool(on)
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+# ---------------- recording ----------------
+def record(name: str, seconds: float):
+    with _lock:
+        stat = _timings.get(name)
+        if stat is None:
+            stat = _timings[name] = [0, 0.0, deque(maxlen=SAMPLES)]
+        stat[0] += 1
+        stat[1] += seconds
+        stat[2].append(seconds)
+
+
+def count(name: str, n: int = 1):
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def traced(name: str):
+    """Decorator: record the duration of each call under `name`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - t0)
+        return inner
+    return wrap
+
+
+class span:
+    """Context manager timing a block under `name`."""
+
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.t0 = None
+
+    def __enter__(self):
+        if _enabled:
+            self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.t0 is not None:
+            record(self.name, time.perf_counter() - self.t0)
+
+
+# ---------------- reporting ----------------
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summary():
+    """[{name, calls, total_ms, p50_ms, p90_ms, p99_ms, max_ms}], slowest total first."""
+    with _lock:
+        items = [(name, stat[0], stat[1], sorted(stat[2])) for name, stat in _timings.items()]
+    rows = []
+    for name, calls, total, samples in items:
+        rows.append({
+            "name": name, "calls": calls, "total_ms": total * 1000,
+            "p50_ms": _percentile(samples, 0.5) * 1000, "p90_ms": _percentile(samples, 0.9) * 1000,
+            "p99_ms": _percentile(samples, 0.99) * 1000, "max_ms": (samples[-1] if samples else 0) * 1000,
+        })
+    rows.sort(key=lambda r: r["total_ms"], reverse=True)
+    return rows
+
+
+def by_area():
+    """Total traced milliseconds per area (the part of the name before the first dot)."""
+    areas = {}
+    for row in summary():
+        area = row["name"].split(".", 1)[0]
+        areas[area] = areas.get(area, 0.0) + row["total_ms"]
+    return areas
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def format_table() -> str:
+    lines = [f"{'name':<32} {'calls':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'total ms':>10}"]
+    for r in summary():
+        lines.append(f"{r['name']:<32} {r['calls']:>7} {r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} "
+                     f"{r['p99_ms']:>8.2f} {r['max_ms']:>8.2f} {r['total_ms']:>10.1f}")
+    areas = by_area()
+    if areas:
+        lines.append("")
+        lines.append("by area: " + ", ".join(f"{a} {ms:.0f} ms" for a, ms in sorted(areas.items(), key=lambda x: -x[1])))
+    c = counters()
+    if c:
+        lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in sorted(c.items())))
+    return "\n".join(lines)
+
+
+def export(path: str):
+    """Write timings, counters and environment info to a JSON file."""
+    data = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "timings": summary(), "areas": by_area(), "counters": counters(),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+# ---------------- profilers ----------------
+def profiling() -> bool:
+    return _profiler is not None
+
+
+def start_profile():
+    """cProfile the calling thread (the Tk thread when started from the UI)."""
+    global _profiler
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def stop_profile(path: str = None, top: int = 40) -> str:
+    """Stop profiling; dump raw stats to `path` (.prof) if given. Returns a text report."""
+    global _profiler
+    if _profiler is None:
+        return ""
+    prof, _profiler = _profiler, None
+    prof.disable()
+    if path:
+        prof.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def start_memory():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+
+
+def stop_memory(top: int = 25) -> str:
+    """Stop tracemalloc; returns peak usage and the largest allocation sites."""
+    if not tracemalloc.is_tracing():
+        return ""
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lines = [f"current {current / 1024:.0f} KB, peak {peak / 1024:.0f} KB", ""]
+    for stat in snapshot.statistics("lineno")[:top]:
+        lines.append(str(stat))
+    return "\n".join(lines)
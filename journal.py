@@ -0,0 +1,476 @@
+# journal.py
+# Append-only journal storage: a JSON snapshot plus a log of insert/update/delete records.
+#
+# Layout per user (next to each other in DATA_DIR):
+#   data_<user>.json  -> {"seq": <last folded record>, "entries": [...]}   (snapshot, one entry per line)
+#   data_<user>.log   -> one JSON record per line, appended and fsynced per write
+#   data_<user>.idx   -> header index: seq + [offset, length, fields-without-content] per entry
+#
+# load(lazy=True) reads only the header index; entry bodies are then read
+# from the snapshot on demand (see LazyEntry / BodyReader).
+#
+# A write costs one appended line regardless of how many entries the diary holds.
+# Once the log grows past `compact_every` records it is folded into a new snapshot.
+
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from fileio import atomic_write, file_stamp, fsync_dir, locked
+from instrument import traced
+
+COMPACT_EVERY = 500
+BODY_CACHE_SIZE = 256
+_SNAPSHOT_HEAD = re.compile(rb'^\{"seq": (\d+), "entries": \[$')
+
+
+def new_entry_id() -> str:
+    return uuid.uuid4().hex
+
+
+class LazyEntry(dict):
+    """Entry dict whose "content" is fetched from a body reader until it is set.
+
+    entry["content"] / entry.get("content") load the body (through the
+    reader's LRU cache) without storing it, so memory stays proportional to
+    what has been viewed. Assigning "content" makes it a normal field.
+    """
+
+    __slots__ = ("_reader",)
+
+    def __init__(self, fields, reader):
+        super().__init__(fields)
+        self._reader = reader
+
+    def _has_body(self):
+        return dict.__contains__(self, "content")
+
+    def __getitem__(self, key):
+        if key == "content" and not self._has_body():
+            return self._reader.read(dict.__getitem__(self, "id"))
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == "content" and not self._has_body():
+            return self._reader.read(dict.__getitem__(self, "id"))
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        return key == "content" or dict.__contains__(self, key)
+
+    def copy(self):
+        return LazyEntry(self, self._reader)
+
+    def plain(self) -> dict:
+        """A normal dict with the body included (for serialization)."""
+        data = dict(self)
+        if not self._has_body():
+            data["content"] = self._reader.read(data["id"], cache=False)
+        return data
+
+
+def plain_entry(entry) -> dict:
+    """A plain dict for an entry dict or any lazy entry (LazyEntry, chunkstore.EntryView)."""
+    plain = getattr(entry, "plain", None)
+    return plain() if plain is not None else entry
+
+
+class BodyReader:
+    """Reads entry bodies out of the snapshot by byte offset, with an LRU cache.
+
+    If another process rewrote the snapshot, the offsets are refreshed from
+    the header index (each body line carries its id, so a move is detected).
+    """
+
+    def __init__(self, path, header_path=None, offsets=None, cache_size=BODY_CACHE_SIZE):
+        self.path = path
+        self.header_path = header_path
+        self.offsets = offsets or {}   # entry id -> (offset, length)
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._fh = None
+
+    def read(self, entry_id, cache=True):
+        with self.lock:
+            if entry_id in self._cache:
+                self._cache.move_to_end(entry_id)
+                return self._cache[entry_id]
+            data = self._read_line(entry_id)
+            if data is None and self.refresh_offsets():
+                data = self._read_line(entry_id)
+            if data is None:
+                raise KeyError(f"Entry body not found: {entry_id}")
+            content = data.get("content", "")
+            if cache:
+                self._cache[entry_id] = content
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return content
+
+    def _read_line(self, entry_id):
+        pos = self.offsets.get(entry_id)
+        if pos is None:
+            return None
+        offset, length = pos
+        if self._fh is not None:
+            self._fh.seek(offset)
+            raw = self._fh.read(length)
+        else:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                raw = f.read(length)
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return None
+        return data if data.get("id") == entry_id else None
+
+    def refresh_offsets(self) -> bool:
+        """Reload offsets from the header index; False if it doesn't match the snapshot."""
+        header = read_header(self.path, self.header_path) if self.header_path else None
+        if header is None:
+            return False
+        self.offsets = {fields["id"]: (offset, length) for offset, length, fields in header["rows"]}
+        return True
+
+    def open_batch(self):
+        """Keep the snapshot open for many reads (compaction); close_batch() after."""
+        with self.lock:
+            if self._fh is None and self.offsets:
+                self._fh = open(self.path, "rb")
+
+    def close_batch(self):
+        with self.lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def read_header(snapshot_path, header_path):
+    """The header index dict if it describes the current snapshot, else None."""
+    try:
+        with open(snapshot_path, "rb") as f:
+            m = _SNAPSHOT_HEAD.match(f.readline().rstrip(b"\n"))
+        with open(header_path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not m or header.get("seq") != int(m.group(1)):
+        return None
+    return header
+
+
+def apply_records(entries, records):
+    """Apply insert/update/delete log records to a list of entries.
+
+    Idempotent by id (an insert of a known id replaces it), so records that
+    are already reflected in `entries` can safely be applied again.
+    """
+    if not records:
+        return list(entries)
+    by_id = {e["id"]: e for e in entries}
+    front, back = [], []
+    for rec in records:
+        op = rec.get("op")
+        if op in ("insert", "update"):
+            entry = rec["entry"]
+            target = by_id.get(entry["id"])
+            if target is not None:
+                target.clear()
+                target.update(entry)
+            elif op == "insert":
+                by_id[entry["id"]] = entry
+                (front if rec.get("at") == 0 else back).append(entry)
+        elif op == "delete":
+            by_id.pop(rec.get("id"), None)
+    front.reverse()
+    return [e for e in front + entries + back if by_id.get(e["id"]) is e]
+
+
+class JournalStore:
+    """Entry store for one user backed by a snapshot + append-only log.
+
+    The list returned by load() is shared with the caller: mutate it first,
+    then record the change with insert()/update()/delete() so the log matches.
+    A caller that writes from another thread should pass record copies, set
+    auto_compact = False and compact() with its own snapshot of the list.
+
+    Several processes may share the files. Every write holds an advisory
+    lock and first reads records other processes appended; they are passed
+    to on_external(records), or on_external(None) when another process
+    rewrote the snapshot and the owner should reload.
+    """
+
+    def __init__(self, snapshot_path: str, log_path: str = None, compact_every: int = COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or os.path.splitext(snapshot_path)[0] + ".log"
+        self.header_path = os.path.splitext(snapshot_path)[0] + ".idx"
+        self.bodies = BodyReader(snapshot_path, self.header_path)
+        self.compact_every = compact_every
+        # when False the owner decides when to compact (see needs_compaction)
+        self.auto_compact = True
+        self.on_external = None
+        self.entries = []
+        self.seq = 0
+        self._log_records = 0
+        self._log = None
+        self._log_pos = 0          # bytes of the log already read or written by us
+        self._snap_stamp = None    # file_stamp of the snapshot we know about
+        self._foreign = []         # other processes' records since our last compaction
+        self._foreign_rewrite = False
+
+    # ---------------- loading ----------------
+    @traced("storage.load")
+    def load(self, lazy: bool = False):
+        """Read the snapshot and replay the log on top of it.
+
+        lazy=True reads the header index instead of the snapshot when it is
+        current, returning LazyEntry objects whose bodies load on demand.
+        """
+        with locked(self.log_path):
+            header = self._read_header() if lazy else None
+            if header is not None:
+                snapshot_seq, entries = header
+            else:
+                snapshot_seq, entries = self._read_snapshot()
+            self._snap_stamp = file_stamp(self.snapshot_path)
+            migrated = False
+            for entry in entries:
+                if "id" not in entry:
+                    # legacy data_<user>.json files have no ids; assign them once
+                    entry["id"] = new_entry_id()
+                    migrated = True
+
+            self.seq = snapshot_seq
+            self._log_pos = 0
+            self._log_records = 0
+            self._foreign = []
+            self._foreign_rewrite = False
+            records = self._read_log(snapshot_seq)
+            self._log_records = len(records)
+            self.entries = apply_records(entries, records)
+            if migrated:
+                self.compact()
+        return self.entries
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return 0, []
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            # bare list of entries (old sample format)
+            return 0, data
+        return data.get("seq", 0), data.get("entries", [])
+
+    def _read_header(self):
+        """(seq, [LazyEntry]) from the header index, or None if missing/stale."""
+        header = read_header(self.snapshot_path, self.header_path)
+        if header is None:
+            return None
+        offsets = {}
+        entries = []
+        for offset, length, fields in header["rows"]:
+            offsets[fields["id"]] = (offset, length)
+            entries.append(LazyEntry(fields, self.bodies))
+        self.bodies.offsets = offsets
+        return header["seq"], entries
+
+    def _read_log(self, snapshot_seq):
+        """Records after self._log_pos with seq > snapshot_seq; drops a torn tail."""
+        if not os.path.exists(self.log_path):
+            return []
+        records = []
+        good_until = self._log_pos
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write at the tail
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                good_until += len(line)
+                if rec.get("seq", 0) <= snapshot_seq:
+                    continue  # already folded into the snapshot
+                self.seq = max(self.seq, rec["seq"])
+                records.append(rec)
+
+        if good_until < os.path.getsize(self.log_path):
+            # drop the partial record so later appends start on a clean line
+            with open(self.log_path, "r+b") as f:
+                f.truncate(good_until)
+        self._log_pos = good_until
+        return records
+
+    def _sync(self):
+        """Pick up what other processes wrote since we last looked (lock held)."""
+        if file_stamp(self.snapshot_path) != self._snap_stamp:
+            # someone else compacted: their snapshot already contains our logged records
+            self._foreign_rewrite = True
+            self._snap_stamp = file_stamp(self.snapshot_path)
+            snapshot_seq = self._reopen_snapshot()
+            self.seq = max(self.seq, snapshot_seq)
+            self._log_pos = 0
+            records = self._read_log(snapshot_seq)
+            self._log_records = len(records)
+            self._notify(None)
+            return
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self._log_pos:
+            records = self._read_log(0)
+            if records:
+                self._log_records += len(records)
+                self._foreign.extend(records)
+                self._notify(records)
+
+    def refresh(self):
+        """Pick up other processes' writes now instead of at our next write."""
+        with locked(self.log_path):
+            self._sync()
+
+    def _reopen_snapshot(self) -> int:
+        """Follow a snapshot another process wrote; returns the seq it folded in."""
+        self.bodies.refresh_offsets()
+        with open(self.snapshot_path, "rb") as f:
+            m = _SNAPSHOT_HEAD.match(f.readline().rstrip(b"\n"))
+        return int(m.group(1)) if m else 0
+
+    def _notify(self, records):
+        if self.on_external is not None:
+            self.on_external(records)
+
+    # ---------------- writes ----------------
+    def insert(self, entry: dict, at: int = 0):
+        """Record a new entry placed at the front (at=0) or the end (at=None)."""
+        self._append(self._record("insert", entry, at))
+
+    def update(self, entry: dict):
+        self._append(self._record("update", entry))
+
+    def delete(self, entry_id: str):
+        self._append(self._record("delete", entry_id))
+
+    def write_many(self, ops):
+        """Journal (op, payload) pairs - "insert"/"update"/"delete" - with a single fsync."""
+        self._append(*[self._record(op, payload) for op, payload in ops])
+
+    @staticmethod
+    def _record(op, payload, at=0):
+        if op == "delete":
+            return {"op": "delete", "id": payload}
+        if op == "insert":
+            payload.setdefault("id", new_entry_id())
+            return {"op": "insert", "at": at, "entry": plain_entry(payload)}
+        return {"op": op, "entry": plain_entry(payload)}
+
+    @traced("storage.append")
+    def _append(self, *records):
+        with locked(self.log_path):
+            self._sync()
+            lines = []
+            for record in records:
+                self.seq += 1
+                record["seq"] = self.seq
+                lines.append(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            data = b"".join(lines)
+            if self._log is None:
+                self._log = open(self.log_path, "ab")
+            self._log.write(data)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._log_pos += len(data)
+            self._log_records += len(records)
+            if self.auto_compact and self.needs_compaction:
+                self.compact()
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._log_records >= self.compact_every
+
+    # ---------------- compaction ----------------
+    @traced("storage.compact")
+    def compact(self, entries=None):
+        """Fold the log into a fresh snapshot, then empty the log.
+
+        The snapshot stores the last folded seq, so a crash between the rename
+        and the truncate only leaves records that replay will skip. Every
+        compaction also bumps seq, so caches tagged with it (the search index)
+        notice a full rewrite.
+
+        Concurrent writers are merged: records other processes appended are
+        applied on top of `entries`; if another process rewrote the snapshot,
+        entry membership follows the disk (their inserts and deletes) while
+        entries present on both sides keep our version.
+        """
+        with locked(self.log_path):
+            self._sync()
+            if entries is None:
+                entries = self.entries
+            if self._foreign_rewrite:
+                entries = self._merge_with_disk(entries)
+            elif self._foreign:
+                entries = apply_records([plain_entry(e) for e in entries], self._foreign)
+            self._write_snapshot(entries)
+            self.close()
+            with open(self.log_path, "wb"):
+                pass
+            self._log_pos = 0
+            self._log_records = 0
+            self._foreign = []
+            self._foreign_rewrite = False
+
+    def _merge_with_disk(self, entries):
+        snapshot_seq, disk = self._read_snapshot()
+        saved_pos, self._log_pos = self._log_pos, 0
+        disk = apply_records(disk, self._read_log(snapshot_seq))
+        self._log_pos = saved_pos
+        ours = {e["id"]: e for e in entries}
+        on_disk = {e["id"] for e in disk}
+        added = [e for e in disk if e["id"] not in ours]
+        return added + [e for e in entries if e["id"] in on_disk]
+
+    def _write_snapshot(self, entries):
+        self.seq += 1
+        rows = []
+        offsets = {}
+        # one entry per line so the header index can point at each body
+        directory = os.path.dirname(self.snapshot_path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.snapshot_path) + ".", suffix=".tmp", dir=directory)
+        self.bodies.open_batch()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                head = b'{"seq": %d, "entries": [\n' % self.seq
+                f.write(head)
+                pos = len(head)
+                last = len(entries) - 1
+                for i, entry in enumerate(entries):
+                    entry = plain_entry(entry)
+                    line = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+                    f.write(line + (b",\n" if i < last else b"\n"))
+                    offsets[entry["id"]] = (pos, len(line))
+                    rows.append([pos, len(line), {k: v for k, v in entry.items() if k != "content"}])
+                    pos += len(line) + (2 if i < last else 1)
+                f.write(b"]}\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        finally:
+            self.bodies.close_batch()
+        with self.bodies.lock:
+            os.replace(tmp, self.snapshot_path)
+            fsync_dir(directory)
+            self.bodies.offsets = offsets
+        self._snap_stamp = file_stamp(self.snapshot_path)
+        atomic_write(self.header_path, json.dumps({"seq": self.seq, "rows": rows}, ensure_ascii=False))
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
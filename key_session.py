@@ -0,0 +1,94 @@
+# key_session.py
+# Session-scoped encryption keys: one PBKDF2 derivation per login, HKDF per entry.
+#
+# Blob formats handled by KeySession.decrypt:
+#   {"v": 3, "salt": ..., "z": codec, "token": fernet}  -> key = HKDF(master, salt)  (new)
+#       the body is compressed (compression.py) before encryption and the
+#       Fernet token is stored as is, without a second base64 layer
+#   {"v": 2, "salt": ..., "token": b64(fernet)}         -> key = HKDF(master, salt)
+#   {"salt": ..., "token": ...}                         -> key = PBKDF2(password, salt)  (legacy encrypt_text)
+
+import base64
+import os
+from cryptography.fernet import Fernet
+from auth import login, get_key_salt
+from compression import compress, decompress
+from instrument import traced
+from utils import derive_key_from_password, derive_entry_key, decrypt_text
+
+BLOB_VERSION = 3
+SESSION_VERSIONS = (2, 3)  # blobs keyed off the session's master key
+
+
+class KeySession:
+    """Holds the user's master key and a cache of per-entry Fernet keys until wipe()."""
+
+    def __init__(self, password: str, key_salt: bytes):
+        master = derive_key_from_password(password, key_salt)
+        self._master = bytearray(base64.urlsafe_b64decode(master))
+        # kept only so legacy per-entry-salt blobs can still be opened
+        self._password = bytearray(password.encode())
+        self._cache = {}  # salt -> Fernet
+
+    @property
+    def active(self) -> bool:
+        return bool(self._master)
+
+    @property
+    def password(self) -> str:
+        """Account password, for handing legacy blobs to batch_crypto workers."""
+        return self._password.decode()
+
+    @staticmethod
+    def is_legacy(blob) -> bool:
+        return isinstance(blob, dict) and blob.get("v") not in SESSION_VERSIONS
+
+    @traced("crypto.encrypt")
+    def encrypt(self, plaintext: str) -> dict:
+        salt = os.urandom(16)
+        codec, data = compress(plaintext.encode())
+        token = self._fernet(salt).encrypt(data)
+        return {
+            "v": BLOB_VERSION,
+            "salt": base64.urlsafe_b64encode(salt).decode(),
+            "z": codec,
+            "token": token.decode(),
+        }
+
+    @traced("crypto.decrypt")
+    def decrypt(self, blob: dict) -> str:
+        if self.is_legacy(blob):
+            return decrypt_text(self.password, blob)
+        salt_b64 = blob.get("salt")
+        token_b64 = blob.get("token")
+        if not salt_b64 or not token_b64:
+            raise ValueError("Invalid encrypted blob.")
+        salt = base64.urlsafe_b64decode(salt_b64)
+        if blob.get("v") == 2:
+            return self._fernet(salt).decrypt(base64.b64decode(token_b64)).decode()
+        return decompress(blob.get("z", "none"), self._fernet(salt).decrypt(token_b64.encode())).decode()
+
+    def _fernet(self, salt: bytes) -> Fernet:
+        if not self.active:
+            raise RuntimeError("Key session has been wiped.")
+        f = self._cache.get(salt)
+        if f is None:
+            f = self._cache[salt] = Fernet(derive_entry_key(bytes(self._master), salt))
+        return f
+
+    def wipe(self):
+        """Zero the key material and drop cached keys (call on logout)."""
+        for buf in (self._master, self._password):
+            for i in range(len(buf)):
+                buf[i] = 0
+            del buf[:]
+        self._cache.clear()
+
+
+@traced("crypto.open_session")
+def open_session(username: str, password: str) -> KeySession:
+    """Verify the account password and derive the session's master key."""
+    ok, msg = login(username, password)
+    if not ok:
+        raise ValueError(msg)
+    return KeySession(password, get_key_salt(username))
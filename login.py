@@ -1,23 +1,27 @@
 # login.py
-# Login / Signup UI. On successful login it launches dashboard.py <username>
-import os
-import subprocess
-import sys
+# Login / Signup frame. On successful login it hands the username to the app
+# shell (app.py), which swaps in the dashboard in the same window.
 import customtkinter as ctk
 from tkinter import messagebox
 from auth import signup, login
-from storage import ensure_user_file
+from storage import ensure_user
+from diary_client import server_url, remote_signup, remote_login
+from tasks import TaskScheduler
 
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("green")  # friendly teal-ish
 
 
-class LoginWindow(ctk.CTk):
-    def __init__(self):
-        super().__init__()
-        self.title("Diary — Login / Sign Up")
-        self.geometry("480x420")
-        self.resizable(False, False)
+class LoginFrame(ctk.CTkFrame):
+    def __init__(self, master, on_login, on_login_started=None):
+        super().__init__(master, fg_color="transparent")
+        self.on_login = on_login                   # on_login(username) after a successful login
+        self.on_login_started = on_login_started   # e.g. preload the dashboard while hashing
+        # password hashing (PBKDF2) runs here so the window keeps repainting
+        self.tasks = TaskScheduler(self, workers=1)
+        # DIARY_SERVER set: accounts live on a diary server (server.py), not in this folder
+        self.remote = bool(server_url())
+        self.signup, self.login = (remote_signup, remote_login) if self.remote else (signup, login)
 
         container = ctk.CTkFrame(self, corner_radius=12)
         container.pack(padx=20, pady=20, fill="both", expand=True)
@@ -35,7 +39,8 @@ class LoginWindow(ctk.CTk):
         self.login_user.pack(pady=8)
         self.login_pass = ctk.CTkEntry(self.login_tab, placeholder_text="Password", show="*")
         self.login_pass.pack(pady=8)
-        ctk.CTkButton(self.login_tab, text="Login", command=self.handle_login).pack(pady=12)
+        self.login_btn = ctk.CTkButton(self.login_tab, text="Login", command=self.handle_login)
+        self.login_btn.pack(pady=12)
 
         # Signup tab
         self.su_user = ctk.CTkEntry(self.signup_tab, placeholder_text="Choose a username")
@@ -44,7 +49,8 @@ class LoginWindow(ctk.CTk):
         self.su_pass.pack(pady=8)
         self.su_pass2 = ctk.CTkEntry(self.signup_tab, placeholder_text="Confirm password", show="*")
         self.su_pass2.pack(pady=8)
-        ctk.CTkButton(self.signup_tab, text="Sign Up", command=self.handle_signup).pack(pady=12)
+        self.signup_btn = ctk.CTkButton(self.signup_tab, text="Sign Up", command=self.handle_signup)
+        self.signup_btn.pack(pady=12)
 
         # Mode switch
         # self.mode_switch = ctk.CTkSwitch(container, text="Dark Mode", command=self.toggle_mode)
@@ -64,35 +70,52 @@ class LoginWindow(ctk.CTk):
         if password != confirm_password:
             messagebox.showerror("Mismatch", "Passwords do not match.")
             return
-        ok, msg = signup(user, password)
+        self.signup_btn.configure(state="disabled")
+        self.tasks.submit(self.signup, user, password, on_done=lambda res: self._signup_done(user, *res),
+                          on_error=self._auth_error)
+
+    def _signup_done(self, user, ok, msg):
+        self.signup_btn.configure(state="normal")
         if ok:
-            ensure_user_file(user)
+            if not self.remote:
+                ensure_user(user)
             # messagebox.showinfo("Success", msg)
             # Optionally switch to login tab
             self.tabview.set("Login")
         else:
             messagebox.showerror("Error", msg)
 
+    def _auth_error(self, exc):
+        self.login_btn.configure(state="normal")
+        self.signup_btn.configure(state="normal")
+        messagebox.showerror("Error", str(exc))
+
     def handle_login(self):
         user = self.login_user.get().strip()
         password = self.login_pass.get().strip()
         if not user or not password:
             messagebox.showwarning("Missing", "Fill all fields.")
             return
-        ok, msg = login(user, password)
+        self.login_btn.configure(state="disabled")
+        self.tasks.submit(self.login, user, password, on_done=lambda res: self._login_done(user, *res),
+                          on_error=self._auth_error)
+        if self.on_login_started:
+            # the hash runs with the GIL released; use the wait to import the dashboard
+            self.after_idle(self.on_login_started)
+
+    def _login_done(self, user, ok, msg):
+        self.login_btn.configure(state="normal")
         if ok:
-            ensure_user_file(user)
-            # messagebox.showinfo("Welcome", msg)
-            # Launch dashboard as new process, pass username
-            python = sys.executable
-            # close window first
-            self.destroy()
-            # Launch dashboard script (dashboard.py) with username arg
-            subprocess.Popen([python, "dashboard.py", user])
+            if not self.remote:
+                ensure_user(user)
+            self.on_login(user)
         else:
             messagebox.showerror("Error", msg)
 
+    def close(self):
+        self.tasks.shutdown(wait=False)
+
 
 if __name__ == "__main__":
-    app = LoginWindow()
-    app.mainloop()
+    from app import main
+    main()
@@ -0,0 +1,158 @@
+# passwords.py
+# Versioned password hashes with tunable cost.
+#
+#   $pbkdf2-sha256$i=600000$<salt>$<key>
+#   $scrypt$n=32768,r=8,p=1$<salt>$<key>
+# (salt/key are unpadded base64). Old hashes are bare base64(salt + key) of
+# PBKDF2-SHA256 with 100k iterations; they still verify and get rehashed.
+#
+# The parameters for new hashes come from hash_params.json, written by:
+#   python passwords.py calibrate --target-ms 250 [--algorithm scrypt] [--save]
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+PARAMS_FILE = "hash_params.json"
+DEFAULT_PARAMS = {"algorithm": "pbkdf2-sha256", "i": 600_000}
+LEGACY_ITERATIONS = 100_000
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+_params = None
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def current_params() -> dict:
+    """Parameters for new hashes (hash_params.json, else DEFAULT_PARAMS)."""
+    global _params
+    if _params is None:
+        try:
+            with open(PARAMS_FILE, "r", encoding="utf-8") as f:
+                _params = json.load(f)
+        except (OSError, ValueError):
+            _params = dict(DEFAULT_PARAMS)
+    return _params
+
+
+def save_params(params: dict):
+    global _params
+    from fileio import atomic_write
+    atomic_write(PARAMS_FILE, json.dumps(params, indent=4))
+    _params = dict(params)
+
+
+# ---------------- hashing ----------------
+def _derive(password: str, salt: bytes, params: dict) -> bytes:
+    algorithm = params["algorithm"]
+    if algorithm == "pbkdf2-sha256":
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, int(params["i"]))
+    if algorithm == "scrypt":
+        n, r, p = int(params["n"]), int(params["r"]), int(params["p"])
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + (1 << 20), dklen=KEY_BYTES)
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+
+def _format_params(params: dict) -> str:
+    return ",".join(f"{k}={v}" for k, v in params.items() if k != "algorithm")
+
+
+def parse_hash(stored_hash: str):
+    """(params, salt, key) for a stored hash in either format."""
+    if not stored_hash.startswith("$"):
+        data = base64.b64decode(stored_hash.encode())
+        return ({"algorithm": "pbkdf2-sha256", "i": LEGACY_ITERATIONS},
+                data[:SALT_BYTES], data[SALT_BYTES:])
+    _, algorithm, settings, salt, key = stored_hash.split("$")
+    params = {"algorithm": algorithm}
+    for item in settings.split(","):
+        name, value = item.split("=")
+        params[name] = int(value)
+    return params, _unb64(salt), _unb64(key)
+
+
+def hash_password(password: str, params: dict = None) -> str:
+    params = params or current_params()
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _derive(password, salt, params)
+    return f"${params['algorithm']}${_format_params(params)}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(stored_hash: str, password: str) -> bool:
+    """Check a password in constant time (with respect to the key bytes)."""
+    try:
+        params, salt, key = parse_hash(stored_hash)
+        derived = _derive(password, salt, params)
+    except (ValueError, KeyError):
+        return False  # damaged hash or unknown algorithm: no password matches it
+    return hmac.compare_digest(derived, key)
+
+
+def needs_rehash(stored_hash: str, params: dict = None) -> bool:
+    """True if the hash isn't in the current format with the current parameters."""
+    params = params or current_params()
+    try:
+        stored, _, _ = parse_hash(stored_hash)
+    except ValueError:
+        return True
+    return not stored_hash.startswith("$") or stored != params
+
+
+# ---------------- calibration ----------------
+def _time_ms(params: dict, rounds: int = 3) -> float:
+    salt = secrets.token_bytes(SALT_BYTES)
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        _derive("calibration password", salt, params)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def calibrate(target_ms: float, algorithm: str = "pbkdf2-sha256") -> dict:
+    """Cheapest parameters that take at least target_ms on this machine."""
+    if algorithm == "pbkdf2-sha256":
+        probe = {"algorithm": algorithm, "i": 50_000}
+        per_iter = _time_ms(probe) / probe["i"]
+        iterations = max(LEGACY_ITERATIONS, int(target_ms / per_iter / 10_000 + 1) * 10_000)
+        return {"algorithm": algorithm, "i": iterations}
+    if algorithm == "scrypt":
+        # memory-hard: raise n (memory = 128 * n * r bytes) until it is slow enough
+        params = {"algorithm": algorithm, "n": 1 << 14, "r": 8, "p": 1}
+        while _time_ms(params, rounds=1) < target_ms and params["n"] < 1 << 20:
+            params["n"] <<= 1
+        return params
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune password hashing cost.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cal = sub.add_parser("calibrate", help="pick parameters for a target login time")
+    cal.add_argument("--target-ms", type=float, default=250)
+    cal.add_argument("--algorithm", choices=["pbkdf2-sha256", "scrypt"], default="pbkdf2-sha256")
+    cal.add_argument("--save", action="store_true", help=f"write them to {PARAMS_FILE}")
+    args = parser.parse_args(argv)
+
+    params = calibrate(args.target_ms, args.algorithm)
+    print(f"{json.dumps(params)}  ~{_time_ms(params, rounds=1):.0f} ms per hash")
+    if args.save:
+        save_params(params)
+        print(f"Saved to {os.path.abspath(PARAMS_FILE)}; existing hashes upgrade on next login.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# search_index.py
+# Tokenized inverted index over entry titles/contents, keyed by entry id.
+#
+# Queries:
+#   hello world      -> entries containing both terms
+#   hel*             -> prefix match
+#   "hello world"    -> exact phrase
+# Results are entry ids ranked by tf-idf, with title hits weighted higher.
+
+import bisect
+import json
+import math
+import os
+import re
+import threading
+from fileio import atomic_write
+from instrument import traced
+
+TOKEN_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+TITLE_WEIGHT = 2.0
+
+
+def tokenize(text: str):
+    return [t.lower() for t in TOKEN_RE.findall(text or "")]
+
+
+class SearchIndex:
+    """Inverted index: term -> {entry_id: [positions]}.
+
+    Title tokens take positions [0, title_len); content follows after a gap of
+    one position so phrases never straddle the title/content boundary.
+    Locked entries only have their title indexed (the content is ciphertext).
+    words[entry_id] is the number of content tokens (what analytics.py counts).
+    Updates and queries hold `lock`, so a search may run on a worker thread
+    while the UI thread keeps indexing edits (they wait for each other).
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.generation = None
+        self.dirty = False
+        self.stale = False  # see invalidate()
+        self.postings = {}
+        self.title_len = {}
+        self.words = {}
+        self._doc_terms = {}
+        self._terms = []  # sorted vocabulary for prefix lookups
+        self.lock = threading.RLock()
+
+    # ---------------- building ----------------
+    @classmethod
+    def load_or_build(cls, path, entries, generation=None):
+        """Load the saved index if it matches `generation`, else rebuild it from entries."""
+        index = cls(path)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if generation is None or data.get("generation") == generation:
+                    index._restore(data)
+                    return index
+            except (ValueError, KeyError):
+                pass
+        index.rebuild(entries)
+        index.generation = generation
+        return index
+
+    def _restore(self, data):
+        self.generation = data.get("generation")
+        self.postings = data["postings"]
+        self.title_len = data["title_len"]
+        self.words = data.get("words")
+        counts = {} if self.words is None else None  # saved before word counts: derive them
+        for term, docs in self.postings.items():
+            for entry_id, positions in docs.items():
+                self._doc_terms.setdefault(entry_id, set()).add(term)
+                if counts is not None:
+                    counts[entry_id] = counts.get(entry_id, 0) + len(positions)
+        if counts is not None:
+            self.words = {i: counts.get(i, 0) - n for i, n in self.title_len.items()}
+        self._terms = sorted(self.postings)
+
+    def rebuild(self, entries):
+        with self.lock:
+            self.postings, self.title_len, self.words, self._doc_terms = {}, {}, {}, {}
+            for entry in entries:
+                self._index_entry(entry)
+            self._terms = sorted(self.postings)
+            self.dirty = True
+
+    def extend(self, entries):
+        """Index entries that aren't indexed yet (a bulk import); sorts the vocabulary once."""
+        with self.lock:
+            self.dirty = True
+            for entry in entries:
+                self._index_entry(entry)
+            self._terms = sorted(self.postings)
+
+    def invalidate(self):
+        """Entries were added without indexing: drop the saved index so the next open rebuilds it."""
+        self.stale = True
+        self.dirty = False
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def save(self, generation=None):
+        if generation is not None:
+            self.generation = generation
+        if not self.path or self.stale:
+            return
+        with self.lock:
+            data = json.dumps({"generation": self.generation, "postings": self.postings,
+                               "title_len": self.title_len, "words": self.words}, ensure_ascii=False)
+            self.dirty = False
+        atomic_write(self.path, data)
+
+    # ---------------- incremental updates ----------------
+    def add(self, entry: dict):
+        with self.lock:
+            self.remove(entry["id"])
+            self.dirty = True
+            for term in self._index_entry(entry):
+                if len(self.postings[term]) == 1:
+                    bisect.insort(self._terms, term)
+
+    def remove(self, entry_id: str):
+        with self.lock:
+            self.dirty = True
+            for term in self._doc_terms.pop(entry_id, ()):
+                docs = self.postings[term]
+                docs.pop(entry_id, None)
+                if not docs:
+                    del self.postings[term]
+                    i = bisect.bisect_left(self._terms, term)
+                    if i < len(self._terms) and self._terms[i] == term:
+                        self._terms.pop(i)
+            self.title_len.pop(entry_id, None)
+            self.words.pop(entry_id, None)
+
+    # update == re-index
+    update = add
+
+    def _index_entry(self, entry):
+        entry_id = entry["id"]
+        title_tokens = tokenize(entry.get("title", ""))
+        content = entry.get("content", "")
+        content_tokens = tokenize(content) if isinstance(content, str) and not entry.get("locked") else []
+
+        positions = {}
+        for pos, term in enumerate(title_tokens):
+            positions.setdefault(term, []).append(pos)
+        start = len(title_tokens) + 1
+        for pos, term in enumerate(content_tokens, start):
+            positions.setdefault(term, []).append(pos)
+
+        for term, pos_list in positions.items():
+            self.postings.setdefault(term, {})[entry_id] = pos_list
+        self.title_len[entry_id] = len(title_tokens)
+        self.words[entry_id] = len(content_tokens)
+        self._doc_terms[entry_id] = set(positions)
+        return positions
+
+    # ---------------- queries ----------------
+    @traced("search.index")
+    def search(self, query: str, limit: int = None, within=None):
+        """Return entry ids matching every clause of `query`, best first.
+
+        within: optional set of candidate ids (e.g. the hits of a shorter
+        query being refined); only those are examined.
+        """
+        with self.lock:
+            return self._search(query, limit, within)
+
+    def _search(self, query, limit, within):
+        clauses = []
+        for phrase, word in QUERY_RE.findall(query):
+            if phrase:
+                terms = tokenize(phrase)
+                if terms:
+                    clauses.append(("phrase", terms))
+            else:
+                terms = tokenize(word)
+                if word.endswith("*") and terms:
+                    # e-mail* -> the term "e" and the prefix "mail"
+                    clauses.extend(("term", t) for t in terms[:-1])
+                    clauses.append(("prefix", terms[-1]))
+                else:
+                    clauses.extend(("term", t) for t in terms)
+        if not clauses:
+            return []
+
+        scores = None
+        # cheapest clause first so intersections stay small
+        for kind, arg in sorted(clauses, key=self._clause_cost):
+            hits = self._match(kind, arg, within if scores is None else scores)
+            if scores is None:
+                scores = hits
+            else:
+                scores = {i: scores[i] + s for i, s in hits.items() if i in scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def _clause_cost(self, clause):
+        kind, arg = clause
+        if kind == "prefix":
+            return len(self._terms)
+        terms = arg if kind == "phrase" else [arg]
+        return min(len(self.postings.get(t, ())) for t in terms)
+
+    def _prefix_terms(self, prefix):
+        i = bisect.bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            yield self._terms[i]
+            i += 1
+
+    def _match(self, kind, arg, within=None):
+        if kind == "term":
+            return self._score_term(arg, within)
+        if kind == "prefix":
+            terms = list(self._prefix_terms(arg))
+            hits = {}
+            if within is not None and len(within) < len(terms):
+                # few candidates, many expansions: check each candidate's own terms
+                for entry_id in within:
+                    for term in self._doc_terms.get(entry_id, ()):
+                        if term.startswith(arg):
+                            s = self._score_term(term, (entry_id,)).get(entry_id, 0.0)
+                            hits[entry_id] = max(hits.get(entry_id, 0.0), s)
+                return hits
+            for term in terms:
+                for entry_id, s in self._score_term(term, within).items():
+                    hits[entry_id] = max(hits.get(entry_id, 0.0), s)
+            return hits
+        return self._match_phrase(arg, within)
+
+    def _score_term(self, term, within=None):
+        docs = self.postings.get(term)
+        if not docs:
+            return {}
+        idf = math.log(1 + len(self.title_len) / len(docs))
+        if within is not None and len(within) < len(docs):
+            pairs = ((i, docs[i]) for i in within if i in docs)
+        else:
+            pairs = docs.items()
+            if within is not None:
+                pairs = ((i, p) for i, p in pairs if i in within)
+        hits = {}
+        for entry_id, positions in pairs:
+            tlen = self.title_len.get(entry_id, 0)
+            tf = sum(TITLE_WEIGHT if p < tlen else 1.0 for p in positions)
+            hits[entry_id] = tf * idf
+        return hits
+
+    def _match_phrase(self, terms, within=None):
+        first = self._score_term(terms[0], within)
+        if len(terms) == 1:
+            return first
+        hits = {}
+        for entry_id in first:
+            starts = set(self.postings[terms[0]][entry_id])
+            for offset, term in enumerate(terms[1:], 1):
+                positions = self.postings.get(term, {}).get(entry_id)
+                if not positions:
+                    starts = set()
+                    break
+                starts &= {p - offset for p in positions}
+                if not starts:
+                    break
+            if starts:
+                hits[entry_id] = first[entry_id] * len(terms) * len(starts)
+        return hits
@@ -0,0 +1,666 @@
+# server.py
+# Optional multi-user HTTP API: many diaries served by one process (stdlib asyncio only).
+#
+#   python server.py --host 127.0.0.1 --port 8765
+#   DIARY_SERVER=http://127.0.0.1:8765 python app.py     # the dashboard as a client
+#
+# JSON in and out; after login send "Authorization: Bearer <token>".
+#   POST   /api/signup                {username, password}
+#   POST   /api/login                 {username, password} -> {token}
+#   POST   /api/logout
+#   POST   /api/keys                  {password}  derive the session's encryption keys
+#   DELETE /api/keys
+#   GET    /api/entries               entry headers (no content) [?offset=&limit=]
+#   POST   /api/entries               {title, content, date?}
+#   GET    /api/entries/<id>          full entry
+#   PUT    /api/entries/<id>          {title, content, date?}
+#   DELETE /api/entries/<id>
+#   POST   /api/entries/<id>/lock     (and /unlock) with the session's keys
+#   GET    /api/search?q=&limit=      matching ids, best first
+#   GET    /api/stats[?full=1]        counts; full adds streaks, activity, word counts, top terms
+#   GET    /api/export?format=md|jsonl|pdf[&from=&to=&q=]
+#
+# Open diaries are pooled (DiaryPool) and shared by every session of a user.
+# Operations on one diary run one at a time and only touch memory; journal
+# writes and other disk work run on executor threads, and concurrent writes
+# to a diary share one fsync.
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+import auth
+import instrument
+from diary_service import DAY_RE, DiaryService, EntryLockedError
+from journal import plain_entry
+
+MAX_BODY = 16 * 1024 * 1024
+SESSION_TTL = 12 * 3600   # seconds of inactivity before a token expires
+REFRESH_S = 1.0           # how often a pooled diary looks for other processes' writes
+MAX_OPEN = 128            # diaries kept open; least recently used ones are closed
+INLINE_SEARCH_MAX = 5000  # diaries up to this size are searched on the event loop (no thread hop)
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+           403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 501: "Not Implemented"}
+USERNAME_RE = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]{0,63}$")  # names become file names
+CONTENT_TYPES = {"pdf": "application/pdf", "md": "text/markdown; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------------- sessions ----------------
+class Session:
+    __slots__ = ("username", "keys", "expires")
+
+    def __init__(self, username):
+        self.username = username
+        self.keys = None  # KeySession after POST /api/keys
+        self.expires = time.monotonic() + SESSION_TTL
+
+    def wipe_keys(self):
+        if self.keys is not None:
+            self.keys.wipe()
+            self.keys = None
+
+
+class Sessions:
+    """Bearer tokens -> Session, with sliding expiry."""
+
+    def __init__(self):
+        self._by_token = {}
+
+    def create(self, username: str) -> str:
+        token = secrets.token_urlsafe(32)
+        self._by_token[token] = Session(username)
+        return token
+
+    def get(self, token: str):
+        session = self._by_token.get(token)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if session.expires < now:
+            self.drop(token)
+            return None
+        session.expires = now + SESSION_TTL
+        return session
+
+    def drop(self, token: str):
+        session = self._by_token.pop(token, None)
+        if session is not None:
+            session.wipe_keys()
+
+    def clear(self):
+        for token in list(self._by_token):
+            self.drop(token)
+
+
+# ---------------- storage pool ----------------
+JOURNAL_OPS = ("insert", "update", "delete")
+
+
+class _Slot:
+    __slots__ = ("service", "lock", "users", "checked", "stale", "inbox", "pending",
+                 "queued", "batch", "writer", "compact", "compacting")
+
+    def __init__(self):
+        self.service = None
+        self.lock = asyncio.Lock()
+        self.users = 0          # requests holding or waiting for the slot
+        self.checked = 0.0      # monotonic time of the last refresh
+        self.stale = False      # another process rewrote the snapshot: reopen
+        self.inbox = deque()    # other processes' journal records, applied under the lock
+        self.pending = []       # (store method, payload) not yet written
+        self.queued = 0         # records ever queued (tells a request whether it wrote)
+        self.batch = None       # future resolved once `pending` is on disk
+        self.writer = None      # task draining `pending`
+        self.compact = False    # the journal asked for a rewrite
+        self.compacting = False  # a rewrite is queued
+
+
+class DiaryPool:
+    """Open DiaryServices shared by all sessions; at most max_open stay open.
+
+    use(username) hands out a user's service under that user's lock, so a
+    diary sees one operation at a time while other users' requests proceed.
+    Operations change memory only; their journal records are written behind
+    the lock, like the dashboard's io lane: requests that arrive while a
+    diary's writer is busy share its next fsync (group commit), and a write
+    is acknowledged only once it is on disk.
+
+    Handlers change a diary on the event loop thread and do not await
+    between the change and the end of the `use` block, so the writer never
+    picks up half of a request's records.
+    """
+
+    def __init__(self, run, max_open: int = MAX_OPEN):
+        self.run = run  # run(fn, *args) -> awaitable result on the executor
+        self.max_open = max_open
+        self._slots = OrderedDict()  # username -> _Slot, least recently used first
+        self._closing = set()
+
+    @contextlib.asynccontextmanager
+    async def use(self, username: str):
+        slot = self._slots.get(username)
+        if slot is None:
+            slot = self._slots[username] = _Slot()
+        self._slots.move_to_end(username)
+        slot.users += 1
+        batch = None
+        try:
+            async with slot.lock:
+                if slot.service is not None and slot.stale:
+                    await self._drain(slot)
+                    await self.run(slot.service.close)
+                    slot.service, slot.stale = None, False
+                    slot.inbox.clear()
+                if slot.service is None:
+                    slot.service = await self.run(self._open, username, slot)
+                    slot.checked = time.monotonic()
+                elif time.monotonic() - slot.checked > REFRESH_S:
+                    await self.run(self._refresh, slot.service)
+                    slot.checked = time.monotonic()
+                if slot.inbox:
+                    records = []
+                    while slot.inbox:
+                        records.append(slot.inbox.popleft())
+                    slot.service.apply_external(records)
+                queued = slot.queued
+                try:
+                    yield slot.service
+                finally:
+                    if slot.compact and not slot.compacting:
+                        slot.compact, slot.compacting = False, True
+                        slot.service.persist()  # queues the rewrite behind the records
+                    if slot.queued > queued:
+                        batch = self._write_behind(slot)
+        finally:
+            slot.users -= 1
+            self._evict()
+        if batch is not None:
+            await batch
+
+    def _open(self, username, slot):
+        def external(records):
+            # reported by store calls on any thread: applied at the next use()
+            if records is None:
+                slot.stale = True
+            else:
+                slot.inbox.extend(records)
+
+        def queue(fn, arg):
+            slot.pending.append((fn, arg))
+            slot.queued += 1
+
+        def schedule_persist():
+            slot.compact = True
+
+        # no schedule_flush: a request is acknowledged once its own changes are on disk,
+        # so writes are grouped across requests by the writer, not delayed
+        service = DiaryService(username, lazy=True, run_io=queue, schedule_persist=schedule_persist)
+        service.store.on_external = external
+        return service
+
+    @staticmethod
+    def _refresh(service):
+        refresh = getattr(service.store, "refresh", None)  # SQLite stores are always current
+        if refresh is not None:
+            refresh()
+
+    # ---------------- write-behind ----------------
+    def _write_behind(self, slot):
+        """Future for the batch now pending; starts the slot's writer if idle."""
+        if slot.batch is None:
+            slot.batch = asyncio.get_running_loop().create_future()
+        if slot.writer is None:
+            slot.writer = asyncio.ensure_future(self._writer(slot))
+        return slot.batch
+
+    async def _writer(self, slot):
+        try:
+            while slot.pending:
+                pending, batch = slot.pending, slot.batch or asyncio.get_running_loop().create_future()
+                slot.pending, slot.batch = [], None
+                try:
+                    await self.run(self._write, slot.service.store, pending)
+                except Exception as exc:
+                    batch.set_exception(exc)
+                else:
+                    batch.set_result(None)
+                if any(fn.__name__ == "compact" for fn, _ in pending):
+                    slot.compacting = False
+        finally:
+            slot.writer = None
+
+    @staticmethod
+    def _write(store, pending):
+        """Write (store method, payload) pairs in order, journal records with one fsync each run."""
+        write_many = getattr(store, "write_many", None)
+        ops = []
+        for fn, arg in pending:
+            if write_many is not None and fn.__name__ == "write_many":
+                ops.extend(arg)  # a request's coalesced changes
+                continue
+            if write_many is not None and fn.__name__ in JOURNAL_OPS:
+                ops.append((fn.__name__, arg))
+                continue
+            if ops:
+                write_many(ops)
+                ops = []
+            fn(arg)
+        if ops:
+            write_many(ops)
+
+    async def _drain(self, slot):
+        if slot.writer is not None:
+            await asyncio.shield(slot.writer)
+
+    # ---------------- eviction ----------------
+    def _evict(self):
+        extra = len(self._slots) - self.max_open
+        for username, slot in list(self._slots.items()):
+            if extra <= 0:
+                break
+            if slot.users == 0 and slot.writer is None:
+                del self._slots[username]
+                extra -= 1
+                if slot.service is not None:
+                    task = asyncio.ensure_future(self.run(slot.service.close))
+                    self._closing.add(task)
+                    task.add_done_callback(self._closing.discard)
+
+    async def close(self):
+        for slot in self._slots.values():
+            async with slot.lock:
+                await self._drain(slot)
+                if slot.service is not None:
+                    await self.run(slot.service.close)
+                    slot.service = None
+        self._slots.clear()
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+# ---------------- request helpers ----------------
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body", "session", "token")
+
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+        self.session = None
+        self.token = None
+
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON.")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object.")
+        return data
+
+    def field(self, data, name, required=True):
+        value = data.get(name)
+        if value is None and not required:
+            return None
+        if not isinstance(value, str) or (required and not value.strip()):
+            raise HTTPError(400, f"'{name}' is required.")
+        return value
+
+    def int_param(self, name, default=None):
+        value = self.query.get(name)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise HTTPError(400, f"'{name}' must be an integer.")
+
+
+def header(entry) -> dict:
+    """An entry without its body (content is not read for lazy entries)."""
+    return {key: entry[key] for key in entry if key != "content"}
+
+
+def entry_of(svc, entry_id) -> dict:
+    """The entry with this id; 404 if there is none."""
+    entry = svc.by_id.get(entry_id)
+    if entry is None:
+        raise HTTPError(404, "No such entry.")
+    return entry
+
+
+def username_of(req, data) -> str:
+    name = req.field(data, "username").strip()
+    if not USERNAME_RE.match(name):
+        raise HTTPError(400, "Usernames use letters, digits, '_', '.' and '-' (at most 64).")
+    return name
+
+
+ROUTES = []  # (method, compiled path regex, handler name, needs a session)
+
+
+def route(method, pattern, auth_required=True):
+    compiled = re.compile(f"^{pattern}$")
+
+    def register(fn):
+        ROUTES.append((method, compiled, fn.__name__, auth_required))
+        return fn
+    return register
+
+
+# ---------------- server ----------------
+class DiaryServer:
+    """HTTP/1.1 keep-alive server for the diary API."""
+
+    def __init__(self, workers: int = None, max_open: int = MAX_OPEN):
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4),
+                                           thread_name_prefix="diary-api")
+        self.sessions = Sessions()
+        self.pool = DiaryPool(self.run, max_open)
+        self._server = None
+
+    def run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self._server = await asyncio.start_server(self._connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.pool.close()
+        self.sessions.clear()
+        self.executor.shutdown(wait=True)
+
+    # ---------------- HTTP ----------------
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 431, {"error": "Headers too large."}, False)
+                    break
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    await self._send(writer, 400, {"error": "Bad request line."}, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if line:
+                        name, _, value = line.partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._send(writer, 400, {"error": "Bad Content-Length."}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._send(writer, 413, {"error": "Body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                status, payload = await self.dispatch(Request(method, target, headers, body))
+                await self._send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, payload, keep_alive):
+        if isinstance(payload, tuple):  # (content type, bytes, extra headers)
+            ctype, data, extra = payload
+        else:
+            ctype, extra = "application/json", ""
+            data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(data)}\r\n{extra}"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def dispatch(self, req: Request):
+        instrument.count("server.requests")
+        allowed = False
+        for method, pattern, name, auth_required in ROUTES:
+            m = pattern.match(req.path)
+            if m is None:
+                continue
+            allowed = True
+            if method != req.method:
+                continue
+            try:
+                if auth_required:
+                    self._authenticate(req)
+                with instrument.span("server." + name):
+                    return await getattr(self, name)(req, *map(unquote, m.groups()))
+            except HTTPError as exc:
+                return exc.status, {"error": str(exc)}
+            except EntryLockedError as exc:
+                return 409, {"error": str(exc)}
+            except ValueError as exc:
+                return 400, {"error": str(exc)}
+            except Exception:
+                traceback.print_exc()  # the details stay in the server's log
+                return 500, {"error": "Internal server error."}
+        if allowed:
+            return 405, {"error": "Method not allowed."}
+        return 404, {"error": "Not found."}
+
+    def _authenticate(self, req):
+        scheme, _, token = req.headers.get("authorization", "").partition(" ")
+        session = self.sessions.get(token) if scheme.lower() == "bearer" else None
+        if session is None:
+            raise HTTPError(401, "Log in first.")
+        req.session, req.token = session, token
+
+    # ---------------- accounts ----------------
+    @route("POST", "/api/signup", auth_required=False)
+    async def signup(self, req):
+        data = req.json()
+        username = username_of(req, data)
+        ok, msg = await self.run(auth.signup, username, req.field(data, "password"))
+        if not ok:
+            raise HTTPError(409, msg)
+        return 201, {"message": msg}
+
+    @route("POST", "/api/login", auth_required=False)
+    async def login(self, req):
+        data = req.json()
+        username = username_of(req, data)
+        ok, msg = await self.run(auth.login, username, req.field(data, "password"))
+        if not ok:
+            raise HTTPError(401, msg)
+        return 200, {"token": self.sessions.create(username), "username": username}
+
+    @route("POST", "/api/logout")
+    async def logout(self, req):
+        self.sessions.drop(req.token)
+        return 204, None
+
+    @route("POST", "/api/keys")
+    async def open_keys(self, req):
+        password = req.field(req.json(), "password")
+        try:
+            from key_session import open_session
+        except ImportError:
+            raise HTTPError(501, "Encryption needs the cryptography package on the server.")
+        req.session.wipe_keys()
+        req.session.keys = await self.run(open_session, req.session.username, password)
+        return 204, None
+
+    @route("DELETE", "/api/keys")
+    async def wipe_keys(self, req):
+        req.session.wipe_keys()
+        return 204, None
+
+    # ---------------- entries ----------------
+    @route("GET", "/api/entries")
+    async def list_entries(self, req):
+        offset = req.int_param("offset", 0)
+        limit = req.int_param("limit")
+        async with self.pool.use(req.session.username) as svc:
+            def page():
+                entries = svc.entries[offset:offset + limit if limit is not None else None]
+                return {"total": len(svc.entries), "entries": [header(e) for e in entries]}
+            if limit is not None and limit <= 1000:
+                return 200, page()
+            return 200, await self.run(page)
+
+    @route("POST", "/api/entries")
+    async def add_entry(self, req):
+        data = req.json()
+        title, content = req.field(data, "title"), req.field(data, "content")
+        day = req.field(data, "date", required=False)
+        async with self.pool.use(req.session.username) as svc:
+            entry = svc.add(title, content, day)
+        return 201, dict(entry)
+
+    @route("GET", "/api/entries/([^/]+)")
+    async def get_entry(self, req, entry_id):
+        async with self.pool.use(req.session.username) as svc:
+            return 200, plain_entry(entry_of(svc, entry_id))
+
+    @route("PUT", "/api/entries/([^/]+)")
+    async def edit_entry(self, req, entry_id):
+        data = req.json()
+        title, content = req.field(data, "title"), req.field(data, "content")
+        day = req.field(data, "date", required=False)
+        async with self.pool.use(req.session.username) as svc:
+            entry_of(svc, entry_id)
+            entry, _ = svc.edit(entry_id, title, content, day)
+            entry = plain_entry(entry)  # the body was just set: no read
+        return 200, entry
+
+    @route("DELETE", "/api/entries/([^/]+)")
+    async def delete_entry(self, req, entry_id):
+        async with self.pool.use(req.session.username) as svc:
+            entry_of(svc, entry_id)
+            svc.delete(entry_id)
+        return 204, None
+
+    @route("POST", "/api/entries/([^/]+)/(lock|unlock)")
+    async def lock_entry(self, req, entry_id, action):
+        keys = req.session.keys
+        if keys is None or not keys.active:
+            raise HTTPError(403, "Send the password to POST /api/keys first.")
+        locked = action == "lock"
+        async with self.pool.use(req.session.username) as svc:
+            entry = entry_of(svc, entry_id)
+            if bool(entry.get("locked")) != locked:
+                svc.keys = keys  # the session's keys, for this call only
+                try:
+                    svc.set_locked(entry, locked)
+                finally:
+                    svc.keys = None
+            fields = header(entry)
+        return 200, fields
+
+    # ---------------- queries ----------------
+    @route("GET", "/api/search")
+    async def search(self, req):
+        query = req.query.get("q", "")
+        limit = req.int_param("limit")
+        async with self.pool.use(req.session.username) as svc:
+            def ids():
+                if DAY_RE.match(query.strip()):
+                    return [e["id"] for e in svc.on_day(query.strip())]
+                if svc.is_date_query(query):
+                    return [e["id"] for e in svc.search(query, limit)]
+                return svc.search_ids(query, limit)
+            if len(svc.entries) <= INLINE_SEARCH_MAX:
+                return 200, {"ids": ids()}
+            return 200, {"ids": await self.run(ids)}
+
+    @route("GET", "/api/stats")
+    async def stats(self, req):
+        full = req.query.get("full") in ("1", "true")
+        async with self.pool.use(req.session.username) as svc:
+            return 200, await self.run(svc.stats, full)
+
+    @route("GET", "/api/export")
+    async def export(self, req):
+        from exporter import select_entries
+        fmt = req.query.get("format", "md")
+        if fmt not in CONTENT_TYPES:
+            raise HTTPError(400, f"format must be one of {', '.join(CONTENT_TYPES)}.")
+        start, end, query = req.query.get("from"), req.query.get("to"), req.query.get("q")
+        for day in (start, end):
+            if day is not None and not DAY_RE.match(day):
+                raise HTTPError(400, "Dates must be YYYY-MM-DD.")
+        async with self.pool.use(req.session.username) as svc:
+            selected = await self.run(lambda: list(select_entries(svc.entries, start, end, query, svc.index)))
+            fd, path = tempfile.mkstemp(suffix="." + fmt)
+            os.close(fd)
+            try:
+                await self.run(svc.export, selected, path, fmt)
+                with open(path, "rb") as f:
+                    data = f.read()
+            finally:
+                os.unlink(path)
+        disposition = f'Content-Disposition: attachment; filename="diary.{fmt}"\r\n'
+        return 200, (CONTENT_TYPES[fmt], data, disposition)
+
+
+# ---------------- entry point ----------------
+async def serve(host: str, port: int, workers: int = None):
+    server = DiaryServer(workers)
+    host, port = await server.start(host, port)
+    print(f"Diary API on http://{host}:{port}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve every diary over a local HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="executor threads for storage work")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
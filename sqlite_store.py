@@ -0,0 +1,365 @@
+# sqlite_store.py
+# SQLite storage driver: one database for all users, WAL mode, indexed date/locked
+# columns and an FTS5 table for content search.
+#
+# Select it with DIARY_STORAGE=sqlite (see storage.get_driver).
+# Migrate existing JSON data:  python sqlite_store.py migrate [--db data/diary.db]
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from instrument import traced
+from journal import LazyEntry, new_entry_id, plain_entry, BODY_CACHE_SIZE
+from search_index import QUERY_RE, tokenize
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    record   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    rowid    INTEGER PRIMARY KEY,
+    id       TEXT NOT NULL UNIQUE,
+    username TEXT NOT NULL,
+    ord      INTEGER NOT NULL,
+    title    TEXT NOT NULL DEFAULT '',
+    content  TEXT NOT NULL DEFAULT '',
+    date     TEXT NOT NULL DEFAULT '',
+    locked   INTEGER NOT NULL DEFAULT 0,
+    extra    TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_user_ord ON entries (username, ord);
+CREATE INDEX IF NOT EXISTS entries_user_date ON entries (username, date);
+CREATE INDEX IF NOT EXISTS entries_user_locked ON entries (username, locked);
+CREATE TABLE IF NOT EXISTS generations (
+    username TEXT PRIMARY KEY,
+    seq      INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    title, body, content='entries', content_rowid='rowid'
+);
+-- locked rows hold ciphertext: only their title is searchable
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, title, body)
+    VALUES (new.rowid, new.title, CASE WHEN new.locked THEN '' ELSE new.content END);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, body)
+    VALUES ('delete', old.rowid, old.title, CASE WHEN old.locked THEN '' ELSE old.content END);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, body)
+    VALUES ('delete', old.rowid, old.title, CASE WHEN old.locked THEN '' ELSE old.content END);
+    INSERT INTO entries_fts (rowid, title, body)
+    VALUES (new.rowid, new.title, CASE WHEN new.locked THEN '' ELSE new.content END);
+END;
+"""
+
+_CORE = ("id", "title", "content", "date", "locked")
+_COLUMNS = "id, title, content, date, locked, extra"
+
+
+def _to_row(entry):
+    content = entry.get("content", "")
+    if not isinstance(content, str):
+        content = json.dumps(content)  # encrypted blob dict
+    extra = {k: v for k, v in entry.items() if k not in _CORE}
+    return (entry["id"], entry.get("title", ""), content, entry.get("date", ""),
+            1 if entry.get("locked") else 0, json.dumps(extra) if extra else None)
+
+
+def _from_row(row):
+    entry_id, title, content, date, locked, extra = row
+    if locked:
+        content = json.loads(content)
+    entry = {"id": entry_id, "title": title, "content": content, "date": date, "locked": bool(locked)}
+    if extra:
+        entry.update(json.loads(extra))
+    return entry
+
+
+def fts_query(query: str) -> str:
+    """Translate the diary query syntax (terms, prefix*, "phrases") to an FTS5 expression."""
+    parts = []
+    for phrase, word in QUERY_RE.findall(query):
+        if phrase:
+            terms = tokenize(phrase)
+            if terms:
+                parts.append('"%s"' % " ".join(terms))
+        else:
+            terms = tokenize(word)
+            parts.extend('"%s"' % t for t in terms)
+            if word.endswith("*") and terms:
+                parts[-1] += "*"  # the last token is the prefix, as in SearchIndex
+    return " AND ".join(parts)
+
+
+class SqliteDriver:
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # writes may come from the dashboard's io lane; the lock serializes access
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+
+    # ---------------- users ----------------
+    def load_users(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT username, record FROM users").fetchall()
+        return {u: json.loads(r) for u, r in rows}
+
+    def save_users(self, users):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM users")
+            self.conn.executemany("INSERT INTO users (username, record) VALUES (?, ?)",
+                                  ((u, json.dumps(r)) for u, r in users.items()))
+
+    def get_user(self, username):
+        with self.lock:
+            row = self.conn.execute("SELECT record FROM users WHERE username = ?", (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_user(self, username, record) -> bool:
+        with self.lock, self.conn:
+            cur = self.conn.execute("INSERT OR IGNORE INTO users (username, record) VALUES (?, ?)",
+                                    (username, json.dumps(record)))
+        return cur.rowcount == 1
+
+    def put_user(self, username, record):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO users (username, record) VALUES (?, ?)",
+                              (username, json.dumps(record)))
+
+    def update_user(self, username, change):
+        """Atomic read-modify-write of one account (see UserDirectory.update)."""
+        with self.lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            row = self.conn.execute("SELECT record FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                raise KeyError(username)
+            old = json.loads(row[0])
+            record = json.loads(row[0])
+            change(record)
+            if record != old:
+                self.conn.execute("UPDATE users SET record = ? WHERE username = ?", (json.dumps(record), username))
+        return record
+
+    # ---------------- entries ----------------
+    def ensure_user(self, username):
+        pass
+
+    def open_store(self, username):
+        return SqliteEntryStore(self, username)
+
+    @traced("search.sqlite")
+    def search(self, username, keyword="", date=""):
+        keyword, date = keyword.strip(), date.strip()
+        sql = f"SELECT {_COLUMNS} FROM entries WHERE username = ?"
+        args = [username]
+        if keyword:
+            expr = fts_query(keyword)
+            if not expr:
+                return []
+            sql = (f"SELECT {', '.join('e.' + c.strip() for c in _COLUMNS.split(','))} "
+                   "FROM entries_fts JOIN entries e ON e.rowid = entries_fts.rowid "
+                   "WHERE entries_fts MATCH ? AND e.username = ?")
+            args = [expr, username]
+        if date:
+            sql += " AND date = ?" if not keyword else " AND e.date = ?"
+            args.append(date)
+        sql += " ORDER BY bm25(entries_fts)" if keyword else " ORDER BY ord"
+        with self.lock:
+            return [_from_row(r) for r in self.conn.execute(sql, args)]
+
+    def entries_between(self, username, start, end):
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM entries WHERE username = ? AND date BETWEEN ? AND ? ORDER BY date, ord",
+                (username, start, end)).fetchall()
+        return [_from_row(r) for r in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SqliteBodyReader:
+    """Fetches entry bodies by id for LazyEntry, with an LRU cache."""
+
+    def __init__(self, driver, cache_size=BODY_CACHE_SIZE):
+        self.driver = driver
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def read(self, entry_id, cache=True):
+        with self.driver.lock:
+            if entry_id in self._cache:
+                self._cache.move_to_end(entry_id)
+                return self._cache[entry_id]
+            row = self.driver.conn.execute("SELECT content, locked FROM entries WHERE id = ?",
+                                           (entry_id,)).fetchone()
+            content = "" if row is None else (json.loads(row[0]) if row[1] else row[0])
+            if cache:
+                self._cache[entry_id] = content
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return content
+
+    def forget(self, entry_id):
+        with self.driver.lock:
+            self._cache.pop(entry_id, None)
+
+
+class SqliteEntryStore:
+    """Same interface as journal.JournalStore, backed by the entries table."""
+
+    needs_compaction = False
+
+    def __init__(self, driver: SqliteDriver, username: str):
+        self.driver = driver
+        self.conn = driver.conn
+        self.username = username
+        self.auto_compact = True
+        self.bodies = SqliteBodyReader(driver)
+        self.seq = self._read_seq()
+
+    def _read_seq(self):
+        with self.driver.lock:
+            row = self.conn.execute("SELECT seq FROM generations WHERE username = ?", (self.username,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self):
+        self.seq += 1
+        self.conn.execute("INSERT OR REPLACE INTO generations (username, seq) VALUES (?, ?)",
+                          (self.username, self.seq))
+
+    @traced("storage.load")
+    def load(self, lazy: bool = False):
+        """All of the user's entries; lazy=True leaves bodies in the database until read."""
+        if not lazy:
+            with self.driver.lock:
+                rows = self.conn.execute(f"SELECT {_COLUMNS} FROM entries WHERE username = ? ORDER BY ord",
+                                         (self.username,)).fetchall()
+            return [_from_row(r) for r in rows]
+        with self.driver.lock:
+            rows = self.conn.execute("SELECT id, title, date, locked, extra FROM entries "
+                                     "WHERE username = ? ORDER BY ord", (self.username,)).fetchall()
+        entries = []
+        for entry_id, title, date, locked, extra in rows:
+            fields = {"id": entry_id, "title": title, "date": date, "locked": bool(locked)}
+            if extra:
+                fields.update(json.loads(extra))
+            entries.append(LazyEntry(fields, self.bodies))
+        return entries
+
+    def insert(self, entry: dict, at: int = 0):
+        with self.driver.lock, self.conn:
+            self._insert(entry, at)
+            self._bump()
+
+    def update(self, entry: dict):
+        with self.driver.lock, self.conn:
+            self._update(entry)
+            self._bump()
+        self.bodies.forget(entry["id"])
+
+    def delete(self, entry_id: str):
+        with self.driver.lock, self.conn:
+            self._delete(entry_id)
+            self._bump()
+        self.bodies.forget(entry_id)
+
+    def write_many(self, ops):
+        """Apply (op, payload) pairs - "insert"/"update"/"delete" - in one transaction."""
+        with self.driver.lock, self.conn:
+            for op, payload in ops:
+                getattr(self, "_" + op)(payload)
+            self._bump()
+        for op, payload in ops:
+            if op != "insert":
+                self.bodies.forget(payload if op == "delete" else payload["id"])
+
+    def _insert(self, entry, at=0):
+        entry.setdefault("id", new_entry_id())
+        agg = "MIN(ord) - 1" if at == 0 else "MAX(ord) + 1"
+        row = self.conn.execute(f"SELECT COALESCE({agg}, 0) FROM entries WHERE username = ?",
+                                (self.username,)).fetchone()
+        self.conn.execute(f"INSERT INTO entries (id, title, content, date, locked, extra, username, ord) "
+                          f"VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _to_row(entry) + (self.username, row[0]))
+
+    def _update(self, entry):
+        entry_id, title, content, date, locked, extra = _to_row(entry)
+        self.conn.execute("UPDATE entries SET title = ?, content = ?, date = ?, locked = ?, extra = ? "
+                          "WHERE id = ? AND username = ?",
+                          (title, content, date, locked, extra, entry_id, self.username))
+
+    def _delete(self, entry_id):
+        self.conn.execute("DELETE FROM entries WHERE id = ? AND username = ?", (entry_id, self.username))
+
+    @traced("storage.compact")
+    def compact(self, entries=None):
+        """Replace the user's rows with `entries` (a full rewrite, in one transaction)."""
+        if entries is None:
+            return
+        with self.driver.lock:
+            # read lazy bodies before their rows go away
+            rows = [_to_row(plain_entry(e)) + (self.username, i) for i, e in enumerate(entries)]
+            with self.conn:
+                self.conn.execute("DELETE FROM entries WHERE username = ?", (self.username,))
+                self.conn.executemany(
+                    "INSERT INTO entries (id, title, content, date, locked, extra, username, ord) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._bump()
+
+    def close(self):
+        pass
+
+
+# ---------------- migration ----------------
+def migrate(db_path: str):
+    """Copy the accounts and every data/data_<user>.json (+ journal) into the database."""
+    import storage
+
+    driver = SqliteDriver(db_path)
+    json_driver = storage.JsonDriver()
+    users = json_driver.load_users()
+    driver.save_users(users)
+
+    names = set(users)
+    if os.path.isdir(storage.DATA_DIR):
+        for fname in os.listdir(storage.DATA_DIR):
+            if fname.startswith("data_") and fname.endswith(".json"):
+                names.add(fname[len("data_"):-len(".json")])
+
+    for username in sorted(names):
+        entries = json_driver.open_store(username).load()
+        driver.open_store(username).compact(entries)
+        print(f"{username}: {len(entries)} entries")
+    print(f"Migrated {len(users)} users into {db_path}")
+    driver.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite storage driver tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mig = sub.add_parser("migrate", help="import the accounts and data/data_<user>.json")
+    mig.add_argument("--db", default=None)
+    args = parser.parse_args(argv)
+    if args.command == "migrate":
+        import storage
+        migrate(args.db or storage.sqlite_path())
+
+
+if __name__ == "__main__":
+    main()
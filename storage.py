@@ -1,11 +1,23 @@
 # storage.py
-# Simple JSON per-user storage helpers
+# Simple JSON per-user storage helpers, plus the pluggable storage driver.
+#
+# Drivers (DIARY_STORAGE env var):
+#   json   (default) data/data_<user>.json + journal, users.jsonl
+#   chunked          data/data_<user>.dat, mmap-ed record table + body heap (see chunkstore.py)
+#   sqlite           data/diary.db (see sqlite_store.py)
 
 import os
 import json
 from typing import Dict, Any
+from fileio import atomic_write, locked
+from instrument import traced
+from journal import JournalStore
+from search_index import SearchIndex
+from user_directory import UserDirectory
 
 DATA_DIR = "data"
+USERS_FILE = "users.json"       # legacy whole-file format, imported on first use
+USERS_LOG = "users.jsonl"
 
 
 def user_data_path(username: str) -> str:
@@ -14,38 +26,160 @@ def user_data_path(username: str) -> str:
     return os.path.join(DATA_DIR, f"data_{username}.json")
 
 
+def user_index_path(username: str) -> str:
+    user_data_path(username)
+    return os.path.join(DATA_DIR, f"index_{username}.json")
+
+
+def ensure_user(username: str):
+    """Create whatever per-user storage the active driver needs."""
+    get_driver().ensure_user(username)
+
+
 def ensure_user_file(username: str):
     path = user_data_path(username)
-    if not os.path.exists(path):
-        # initialize with empty entries list
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump({"entries": []}, f, indent=2)
+    with locked(os.path.splitext(path)[0] + ".log"):  # same lock as the journal
+        if not os.path.exists(path):
+            # initialize with empty entries list
+            atomic_write(path, json.dumps({"entries": []}, indent=2))
 
 
-def load_entries(username: str):
-    path = user_data_path(username)
+def sqlite_path() -> str:
+    return os.path.join(DATA_DIR, "diary.db")
+
+
+def open_journal(username: str) -> JournalStore:
+    """Journal-backed store for a user; writes append to data_<user>.log."""
     ensure_user_file(username)
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data.get("entries", [])
+    return JournalStore(user_data_path(username))
+
+
+def open_store(username: str):
+    """Entry store for a user from the active driver (JournalStore interface)."""
+    return get_driver().open_store(username)
+
+
+@traced("storage.load_entries")
+def load_entries(username: str):
+    return open_store(username).load()
 
 
 def save_entries(username: str, entries):
-    path = user_data_path(username)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump({"entries": entries}, f, indent=2)
+    # full rewrite (JSON driver: folds the log into a new snapshot)
+    store = open_store(username)
+    store.load()
+    store.compact(entries)
+
+
+def open_search_index(username: str, entries, generation=None) -> SearchIndex:
+    """Saved inverted index for a user, rebuilt when it is older than the journal."""
+    return SearchIndex.load_or_build(user_index_path(username), entries, generation)
+
+
+# username -> (journal file stamp, entries, by_id, index); reused while the files are unchanged
+_search_cache: Dict[str, Any] = {}
+
+
+def _journal_stamp(store: JournalStore):
+    stamp = []
+    for path in (store.snapshot_path, store.log_path):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
 
 
 def search_entries(username: str, keyword: str = "", date: str = ""):
     """Search user's diary entries by keyword and/or date."""
-    entries = load_entries(username)
-    keyword = keyword.lower().strip()
-    date = date.strip()
-
-    results = []
-    for entry in entries:
-        entry_text = entry.get("text", "").lower()
-        entry_date = entry.get("date", "")
-        if (not keyword or keyword in entry_text) and (not date or entry_date == date):
-            results.append(entry)
-    return results
+    return get_driver().search(username, keyword, date)
+
+
+def _cached_view(username: str, store):
+    stamp = _journal_stamp(store)
+    cached = _search_cache.get(username)
+    if cached is None or cached[0] != stamp:
+        entries = store.load()
+        index = open_search_index(username, entries, store.seq)
+        if index.dirty:
+            index.save()
+        cached = (stamp, entries, {e["id"]: e for e in entries}, index)
+        _search_cache[username] = cached
+    return cached[1:]
+
+
+# ---------------- drivers ----------------
+class JsonDriver:
+    """One JSON snapshot + journal per user under DATA_DIR, accounts in USERS_LOG."""
+
+    name = "json"
+
+    def __init__(self):
+        # cached in memory; shared safely by every running instance
+        self.users = UserDirectory(USERS_LOG, legacy_path=USERS_FILE)
+
+    def load_users(self):
+        return self.users.all()
+
+    def save_users(self, users):
+        self.users.replace_all(users)
+
+    def get_user(self, username):
+        return self.users.get(username)
+
+    def add_user(self, username, record) -> bool:
+        return self.users.add(username, record)
+
+    def put_user(self, username, record):
+        self.users.put(username, record)
+
+    def update_user(self, username, change):
+        return self.users.update(username, change)
+
+    def ensure_user(self, username):
+        ensure_user_file(username)
+
+    def open_store(self, username):
+        return open_journal(username)
+
+    def search(self, username, keyword="", date=""):
+        entries, by_id, index = _cached_view(username, self.open_store(username))
+        keyword = keyword.strip()
+        date = date.strip()
+        candidates = [by_id[i] for i in index.search(keyword)] if keyword else entries
+        return [e for e in candidates if not date or e.get("date", "") == date]
+
+    def entries_between(self, username, start, end):
+        entries, _, _ = _cached_view(username, self.open_store(username))
+        return sorted((e for e in entries if start <= e.get("date", "") <= end), key=lambda e: e.get("date", ""))
+
+    def close(self):
+        pass
+
+
+_driver = None
+
+
+def get_driver():
+    """Active storage driver, chosen by the DIARY_STORAGE env var on first use."""
+    global _driver
+    if _driver is None:
+        kind = os.environ.get("DIARY_STORAGE", "json").lower()
+        if kind == "sqlite":
+            from sqlite_store import SqliteDriver
+            _driver = SqliteDriver(sqlite_path())
+        elif kind == "json":
+            _driver = JsonDriver()
+        elif kind == "chunked":
+            from chunkstore import ChunkedDriver
+            _driver = ChunkedDriver()
+        else:
+            raise ValueError(f"Unknown DIARY_STORAGE driver: {kind}")
+    return _driver
+
+
+def set_driver(driver):
+    """Install a driver explicitly (tools, tests, the migration script)."""
+    global _driver
+    _driver = driver
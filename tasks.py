@@ -0,0 +1,196 @@
+# tasks.py
+# Background task scheduler bridged to the Tk main loop.
+#
+# Work runs on worker threads; completion/progress callbacks are queued and
+# delivered on the Tk thread by an after() poll, so callbacks may touch widgets.
+#
+#   tasks = TaskScheduler(root)
+#   tasks.submit(slow_fn, arg, on_done=show, on_error=report)
+#   tasks.submit(write_fn, rec, lane="io")          # lanes other than default run in order
+#   tasks.debounce("persist", 250, save_callback)   # coalesce repeated saves
+
+import queue
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+POLL_MS = 30
+
+
+class Task:
+    """Handle for a submitted job. cancel() stops it if not started and drops its callbacks."""
+
+    def __init__(self, scheduler, key=None):
+        self._scheduler = scheduler
+        self.key = key
+        self.future = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def report(self, *args):
+        """Called from the worker; delivers on_progress(*args) on the Tk thread."""
+        if not self.cancelled:
+            self._scheduler._events.put((self, "progress", args))
+
+
+class TaskScheduler:
+    """Thread-pool scheduler whose callbacks run on the Tk thread. Call its methods from the Tk thread."""
+
+    def __init__(self, root, workers: int = 4):
+        self.root = root
+        self._workers = workers
+        self._lanes = {}          # lane name -> executor (non-default lanes are single-threaded)
+        self._events = queue.Queue()
+        self._callbacks = {}      # task -> (on_done, on_error, on_progress)
+        self._keyed = {}          # key -> latest task
+        self._timers = {}         # debounce key -> (after id, callback)
+        self._polling = False
+        self._lock = threading.Lock()
+
+    # ---------------- submitting ----------------
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, lane=None, key=None):
+        """Run fn(*args) in the background.
+
+        lane: name of a serial lane (e.g. "io") for work that must keep its order.
+        key: a newer task with the same key cancels the older one.
+        on_progress: if given, fn is called with report=task.report.
+        """
+        task = Task(self, key)
+        if key is not None:
+            old = self._keyed.get(key)
+            if old is not None:
+                old.cancel()
+            self._keyed[key] = task
+        self._callbacks[task] = (on_done, on_error, on_progress)
+        kwargs = {"report": task.report} if on_progress else {}
+
+        task.future = self._executor(lane).submit(fn, *args, **kwargs)
+        task.future.add_done_callback(lambda fut: self._events.put((task, "done", fut)))
+        self._ensure_polling()
+        return task
+
+    def debounce(self, key, delay_ms, callback, *args):
+        """Run callback(*args) on the Tk thread once calls stop arriving for delay_ms."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            self.root.after_cancel(timer[0])
+
+        def fire():
+            self._timers.pop(key, None)
+            callback(*args)
+
+        self._timers[key] = (self.root.after(delay_ms, fire), fire)
+
+    def cancel(self, key):
+        """Drop a pending debounced call and cancel the latest task submitted with this key."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            self.root.after_cancel(timer[0])
+        task = self._keyed.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def flush(self, key):
+        """Run a pending debounced callback now (e.g. before closing)."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            self.root.after_cancel(timer[0])
+            timer[1]()
+
+    def call_soon(self, fn, *args):
+        """Thread-safe: run fn(*args) on the Tk thread at the next poll.
+
+        Meant for worker code (e.g. a store callback fired inside a task);
+        the poll is running while any task is outstanding.
+        """
+        self._events.put((None, "call", (fn, args)))
+
+    def pending(self):
+        return any(not t.done for t in self._callbacks)
+
+    def shutdown(self, wait=True):
+        for key in list(self._timers):
+            self.flush(key)
+        with self._lock:
+            lanes = list(self._lanes.values())
+            self._lanes.clear()
+        for ex in lanes:
+            ex.shutdown(wait=wait)
+
+    # ---------------- internals ----------------
+    def _executor(self, lane):
+        name = lane or "default"
+        with self._lock:
+            ex = self._lanes.get(name)
+            if ex is None:
+                workers = self._workers if lane is None else 1
+                ex = self._lanes[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"tasks-{name}")
+            return ex
+
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    task, kind, payload = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    self._deliver(task, kind, payload)
+                except Exception:
+                    self._report(*sys.exc_info())  # one failing callback must not stop the rest
+        finally:
+            if self._callbacks:
+                self.root.after(POLL_MS, self._poll)
+            else:
+                self._polling = False
+
+    def _report(self, exc_type, exc, tb):
+        """Errors of tasks without on_error (and of failing callbacks), like any Tk callback error."""
+        report = getattr(self.root, "report_callback_exception", None)
+        if report is not None:
+            report(exc_type, exc, tb)
+        else:
+            traceback.print_exception(exc_type, exc, tb)
+
+    def _deliver(self, task, kind, payload):
+        if kind == "call":
+            fn, args = payload
+            fn(*args)
+            return
+        if kind == "progress":
+            callbacks = self._callbacks.get(task)
+            if callbacks and callbacks[2] and not task.cancelled:
+                callbacks[2](*payload)
+            return
+
+        on_done, on_error, _ = self._callbacks.pop(task, (None, None, None))
+        if task.key is not None and self._keyed.get(task.key) is task:
+            del self._keyed[task.key]
+        if task.cancelled:
+            return
+        try:
+            result = payload.result()
+        except CancelledError:
+            return
+        except Exception as exc:
+            if on_error:
+                on_error(exc)
+            else:
+                raise
+            return
+        if on_done:
+            on_done(result)
@@ -0,0 +1,123 @@
+# test_analytics.py
+# DiaryStats (analytics.py): incremental updates must match a full rebuild.
+#
+#   python -m pytest tests
+
+import os
+import random
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import DiaryStats, heat_level  # noqa: E402
+from changes import DELETED, INSERTED, LOCKED, RESET, UPDATED, Change, ChangeFeed  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+TODAY = date(2025, 3, 10)
+WORDS = "garden walk coffee rain train letter market river book music".split()
+
+try:
+    import numpy  # noqa: F401
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+
+class DiaryStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(3)
+        self.entries = [self.entry(i) for i in range(200)]
+        self.index = SearchIndex()
+        self.index.rebuild(self.entries)
+        self.feed = ChangeFeed()
+        self.feed.subscribe(self.update_index)  # first, as in DiaryService
+        self.stats = self.feed.subscribe(DiaryStats(self.entries, self.index, vectorized=False))
+        self.next_id = len(self.entries)
+
+    def entry(self, i):
+        day = date(2025, 1 + self.rng.randrange(3), 1 + self.rng.randrange(28)).isoformat()
+        body = " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randrange(0, 1200)))
+        return {"id": f"e{i}", "title": self.rng.choice(WORDS), "content": body, "date": day,
+                "locked": self.rng.random() < 0.1}
+
+    def update_index(self, changes):
+        for change in changes:
+            if change.kind == DELETED:
+                self.index.remove(change.entry_id)
+            elif change.kind != RESET:
+                self.index.update(change.entry)
+
+    def mutate(self):
+        kind = self.rng.choice((INSERTED, UPDATED, UPDATED, DELETED, LOCKED))
+        if kind == INSERTED or not self.entries:
+            e = self.entry(self.next_id)
+            self.next_id += 1
+            self.entries.insert(0, e)
+            self.feed.emit(Change(INSERTED, e))
+            return
+        e = self.rng.choice(self.entries)
+        if kind == DELETED:
+            self.entries.remove(e)
+            self.feed.emit(Change(DELETED, e))
+        elif kind == LOCKED:
+            e["locked"] = not e["locked"]
+            self.feed.emit(Change(LOCKED, e))
+        else:
+            old_date = e["date"]
+            fresh = self.entry(0)
+            e.update(content=fresh["content"], date=fresh["date"])
+            self.feed.emit(Change(UPDATED, e, old_date))
+
+    def rebuilt(self, vectorized=False):
+        return DiaryStats(self.entries, self.index, vectorized=vectorized)
+
+    def test_incremental_updates_match_a_full_rebuild(self):
+        for step in range(300):
+            if step % 7 == 0:
+                with self.feed.batch():
+                    for _ in range(5):
+                        self.mutate()
+            else:
+                self.mutate()
+            if step % 50 == 0:
+                self.assertEqual(self.stats.summary(TODAY), self.rebuilt().summary(TODAY))
+        self.assertEqual(self.stats.summary(TODAY), self.rebuilt().summary(TODAY))
+        self.assertEqual(self.stats.heatmap(2025, 2), self.rebuilt().heatmap(2025, 2))
+
+    def test_delete_everything(self):
+        for e in list(self.entries):
+            self.entries.remove(e)
+            self.feed.emit(Change(DELETED, e))
+        s = self.stats.summary(TODAY)
+        self.assertEqual((s["entries"], s["days_written"], s["words"]["total"]), (0, 0, 0))
+        self.assertEqual(s, self.rebuilt().summary(TODAY))
+
+    @unittest.skipUnless(HAVE_NUMPY, "numpy not installed")
+    def test_numpy_build_matches_python(self):
+        self.assertEqual(self.rebuilt(vectorized=True).summary(TODAY), self.rebuilt().summary(TODAY))
+
+
+class StreakTest(unittest.TestCase):
+    def stats_for(self, days):
+        entries = [{"id": str(i), "title": "t", "content": "", "date": d, "locked": False}
+                   for i, d in enumerate(days)]
+        index = SearchIndex()
+        index.rebuild(entries)
+        return DiaryStats(entries, index, vectorized=False)
+
+    def test_streaks(self):
+        stats = self.stats_for(["2025-03-01", "2025-03-02", "2025-03-03", "2025-03-03",
+                                "2025-03-08", "2025-03-09", "not a date"])
+        self.assertEqual(stats.streaks(date(2025, 3, 10)), (2, 3, "2025-03-03"))
+        self.assertEqual(stats.streaks(date(2025, 3, 12)), (0, 3, "2025-03-03"))
+        self.assertEqual(stats.total, 7)
+        self.assertEqual(len(stats.days), 5)  # the malformed date counts as an entry, not a day
+
+    def test_heat_levels(self):
+        self.assertEqual([heat_level(n) for n in (0, 149, 150, 400, 5000)], [1, 1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
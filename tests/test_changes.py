@@ -0,0 +1,85 @@
+# test_changes.py
+# Change feed and write coalescing (changes.py).
+#
+#   python -m pytest tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from changes import DELETED, INSERTED, LOCKED, UPDATED, Change, ChangeFeed, WriteCoalescer  # noqa: E402
+
+
+def entry(n, title="t"):
+    return {"id": f"e{n}", "title": title}
+
+
+class WriteCoalescerTest(unittest.TestCase):
+    def setUp(self):
+        self.writes, self.scheduled = [], []
+        self.coalescer = WriteCoalescer(self.writes.append, schedule=lambda: self.scheduled.append(1))
+
+    def test_repeated_edits_become_one_record_with_the_latest_fields(self):
+        e = entry(1)
+        for i in range(10):
+            e["title"] = f"edit {i}"
+            self.coalescer([Change(UPDATED, e)])
+        self.assertEqual(self.scheduled, [1])  # one window
+        self.assertEqual(self.coalescer.flush(), 1)
+        self.assertEqual(self.writes, [[("update", e)]])
+        self.assertEqual(e["title"], "edit 9")
+        self.assertEqual((self.coalescer.changes, self.coalescer.records), (10, 1))
+
+    def test_insert_then_updates_stay_an_insert_in_first_change_order(self):
+        a, b = entry(1), entry(2)
+        self.coalescer([Change(INSERTED, a), Change(UPDATED, b), Change(UPDATED, a), Change(LOCKED, a)])
+        self.coalescer.flush()
+        self.assertEqual(self.writes, [[("insert", a), ("update", b)]])
+
+    def test_insert_then_delete_writes_nothing(self):
+        a = entry(1)
+        self.coalescer([Change(INSERTED, a)])
+        self.coalescer([Change(DELETED, a)])
+        self.assertEqual(self.coalescer.flush(), 0)
+        self.assertEqual(self.writes, [])
+
+    def test_update_then_delete_is_a_delete_and_reinsert_an_insert(self):
+        a, b = entry(1), entry(2)
+        self.coalescer([Change(UPDATED, a), Change(DELETED, a), Change(DELETED, b), Change(INSERTED, b)])
+        self.coalescer.flush()
+        # an insert of a known id replaces it on replay (journal.apply_records)
+        self.assertEqual(self.writes, [[("delete", "e1"), ("insert", b)]])
+
+    def test_unjournaled_changes_are_ignored_and_discard_forgets(self):
+        self.coalescer([Change(LOCKED, entry(1), journal=False), Change(UPDATED, entry(2))])
+        self.assertEqual(len(self.coalescer), 1)
+        self.coalescer.discard()
+        self.assertEqual(self.coalescer.flush(), 0)
+        self.coalescer([Change(UPDATED, entry(3))])
+        self.assertEqual(self.scheduled, [1, 1])  # a new window after the discard
+
+    def test_without_schedule_every_change_is_written_at_once(self):
+        writes = []
+        coalescer = WriteCoalescer(writes.append)
+        coalescer([Change(INSERTED, entry(1))])
+        coalescer([Change(UPDATED, entry(1))])
+        self.assertEqual([[op for op, _ in ops] for ops in writes], [["insert"], ["update"]])
+
+
+class ChangeFeedTest(unittest.TestCase):
+    def test_batch_delivers_once_in_order(self):
+        feed, seen = ChangeFeed(), []
+        feed.subscribe(lambda changes: seen.append([c.entry_id for c in changes]))
+        with feed.batch():
+            feed.emit(Change(INSERTED, entry(1)))
+            with feed.batch():
+                feed.emit(Change(UPDATED, entry(2)))
+            self.assertEqual(seen, [])
+        feed.emit(Change(DELETED, entry(3)))
+        self.assertEqual(seen, [["e1", "e2"], ["e3"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
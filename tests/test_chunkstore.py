@@ -0,0 +1,122 @@
+# test_chunkstore.py
+# Chunk files (chunkstore.py): round trips, body dedup and views across compactions.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunkstore import ChunkedStore, ChunkFile, EntryView, write_chunks  # noqa: E402
+
+LONG = "a long body that repeats itself. " * 100
+
+ENTRIES = [
+    {"id": "e1", "title": "Plain", "content": "short body", "date": "2025-01-02", "locked": False},
+    {"id": "e2", "title": "Long — ünïcode", "content": LONG, "date": "2025-01-03", "locked": False},
+    {"id": "e3", "title": "Locked", "content": {"v": 3, "salt": "c2FsdA", "z": "none", "token": "gAAA"},
+     "date": "2025-01-04", "locked": True},
+    {"id": "e4", "title": "No date or flag", "content": "", "mood": "calm", "tags": ["x", "y"]},
+    {"id": "e5", "title": "Odd date", "content": "body", "date": "someday"},
+]
+
+
+class ChunkFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, entries, packed=True):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            write_chunks(f, entries, seq=7, packed=packed)
+        return path
+
+    def test_round_trip(self):
+        for packed in (True, False):
+            chunk = ChunkFile(self.write(f"rt{packed}.dat", ENTRIES, packed))
+            try:
+                self.assertEqual((chunk.count, chunk.seq), (len(ENTRIES), 7))
+                self.assertEqual([chunk.entry(i) for i in range(chunk.count)], ENTRIES)
+                views = chunk.views()
+                self.assertEqual([v.plain() for v in views], ENTRIES)
+                self.assertEqual(views[3].get("date", "none"), "none")
+                self.assertFalse("date" in views[3])
+            finally:
+                chunk.close()
+
+    def test_identical_long_bodies_are_stored_once(self):
+        unique = [dict(ENTRIES[1], id=f"u{i}", content=LONG + str(i)) for i in range(20)]
+        shared = [dict(ENTRIES[1], id=f"s{i}") for i in range(20)]
+        unique_size = os.path.getsize(self.write("unique.dat", unique, packed=False))
+        shared_path = self.write("shared.dat", shared, packed=False)
+        self.assertLess(os.path.getsize(shared_path), unique_size - 18 * len(LONG))
+        chunk = ChunkFile(shared_path)
+        try:
+            self.assertTrue(all(chunk.get(i, "content") == LONG for i in range(20)))
+        finally:
+            chunk.close()
+
+
+class ChunkedStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "data_alice.dat")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_views_survive_compaction(self):
+        store = ChunkedStore(self.path)
+        store.load()
+        store.compact([dict(e) for e in ENTRIES])
+        store.close()
+
+        store = ChunkedStore(self.path)
+        entries = store.load(lazy=True)
+        self.assertTrue(all(isinstance(e, EntryView) for e in entries))
+        entries[0]["title"] = "Edited"
+        store.update(entries[0])
+        store.compact()
+        self.assertEqual(entries[1]["content"], LONG)  # moved to the new file
+        self.assertEqual(entries[0]["title"], "Edited")
+        store.close()
+
+        reloaded = ChunkedStore(self.path)
+        self.assertEqual([e.plain() for e in reloaded.load(lazy=True)],
+                         [dict(ENTRIES[0], title="Edited")] + ENTRIES[1:])
+        reloaded.close()
+
+    def test_read_of_a_closed_file_waits_for_the_swap(self):
+        # what a reader sees on Windows, where compaction closes the mapping before replacing it
+        with open(self.path, "wb") as f:
+            write_chunks(f, ENTRIES, seq=1)
+        lock = threading.RLock()
+        old, new = ChunkFile(self.path, lock), ChunkFile(self.path, lock)
+        view = old.views()[1]
+        closed = threading.Event()
+
+        def compaction():
+            with lock:
+                old.close()
+                closed.set()
+                time.sleep(0.05)
+                view._ref = (new, 1)
+
+        worker = threading.Thread(target=compaction)
+        worker.start()
+        closed.wait()
+        self.assertEqual(view["title"], ENTRIES[1]["title"])
+        worker.join()
+        new.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
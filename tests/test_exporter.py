@@ -0,0 +1,37 @@
+# test_exporter.py
+# Tests for the streaming exporters (exporter.py).
+#
+#   python -m pytest tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporter import PdfWriter  # noqa: E402
+
+
+class PdfEncodingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out.pdf")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_winansi_punctuation_survives(self):
+        writer = PdfWriter(self.path)
+        writer.write({"title": "Notes — draft", "date": "2025-01-02",
+                      "content": "“quoted” … €5", "locked": False})
+        writer.close()
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # WinAnsiEncoding codes for the em dash, curly quotes, ellipsis and euro sign
+        self.assertIn(b"(Notes \x97 draft)", data)
+        self.assertIn(b"(\x93quoted\x94 \x85 \x805)", data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# test_importer.py
+# Round trips through exporter.py and importer.py, run against a temporary data folder.
+#
+#   python -m pytest tests
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from diary_service import DiaryService  # noqa: E402
+from exporter import export_entries  # noqa: E402
+from importer import CHUNK, import_entries  # noqa: E402
+
+ENTRIES = [
+    {"id": "a1", "title": "First day", "content": "Started a diary.\n\nSecond paragraph.",
+     "date": "2025-01-02", "locked": False},
+    {"id": "a2", "title": "Trip — Paris", "content": "Trains, cafés and \"quotes\".",
+     "date": "2025-02-14", "locked": False},
+    {"id": "a3", "title": "Short", "content": "x", "date": "2024-12-31", "locked": False},
+]
+
+
+def fields(entries):
+    return sorted((e["title"], e["content"], e["date"]) for e in entries)
+
+
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # data/ is relative to the working directory
+        storage._driver = None
+
+    def tearDown(self):
+        storage._driver = None
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def import_into(self, username, path):
+        svc = DiaryService(username)
+        try:
+            report = import_entries(svc, path)
+        finally:
+            svc.close()
+        reopened = DiaryService(username)  # what was persisted
+        try:
+            return report, list(reopened.entries)
+        finally:
+            reopened.close()
+
+    def test_jsonl_round_trip(self):
+        export_entries(ENTRIES, "out.jsonl")
+        report, entries = self.import_into("alice", "out.jsonl")
+        self.assertEqual((report.added, report.skipped), (3, 0))
+        self.assertEqual(fields(entries), fields(ENTRIES))
+
+    def test_markdown_round_trip(self):
+        export_entries(ENTRIES, "out.md")
+        report, entries = self.import_into("alice", "out.md")
+        self.assertEqual((report.added, report.skipped), (3, 0))
+        self.assertEqual(fields(entries), fields(ENTRIES))
+
+    def test_json_list_is_streamed_across_chunks(self):
+        many = [{"title": f"Entry {i}", "content": "word " * 40, "date": "2025-03-01"} for i in range(1000)]
+        with open("list.json", "w", encoding="utf-8") as f:
+            json.dump(many, f, indent=2)
+        self.assertGreater(os.path.getsize("list.json"), 2 * CHUNK)
+        report, entries = self.import_into("alice", "list.json")
+        self.assertEqual(report.added, 1000)
+        self.assertEqual(sorted(e["title"] for e in entries), sorted(e["title"] for e in many))
+
+    def test_malformed_records_are_skipped(self):
+        with open("mixed.jsonl", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"title": "good", "content": "kept", "date": "2025-01-01"}) + "\n")
+            f.write("{not json\n")
+            f.write(json.dumps({"title": "number date", "content": "c", "date": 20250101}) + "\n")
+            f.write(json.dumps({"title": "bad day", "content": "c", "date": "2025-02-30"}) + "\n")
+            f.write(json.dumps({"title": ["list"], "content": "c"}) + "\n")
+            f.write(json.dumps({"title": "also good", "content": "kept too", "date": "2025-01-03"}) + "\n")
+        report, entries = self.import_into("alice", "mixed.jsonl")
+        self.assertEqual((report.added, report.skipped), (2, 4))
+        self.assertEqual(sorted(e["title"] for e in entries), ["also good", "good"])
+        self.assertTrue(report.errors[1].startswith("mixed.jsonl:3: date must be"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# test_journal.py
+# Snapshot + log storage (journal.py): replay, compaction and torn writes.
+#
+#   python -m pytest tests
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import JournalStore, LazyEntry  # noqa: E402
+
+
+def entry(n, **fields):
+    return dict({"id": f"e{n}", "title": f"title {n}", "content": f"body {n}", "date": f"2025-01-{n:02d}",
+                 "locked": False}, **fields)
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "data_alice.json")
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.tmp.cleanup()
+
+    def open(self, **kwargs):
+        store = JournalStore(self.path, **kwargs)
+        self.stores.append(store)
+        return store
+
+    def reload(self, lazy=False):
+        return self.open().load(lazy=lazy)
+
+    def test_log_replays_inserts_updates_and_deletes(self):
+        store = self.open()
+        store.load()
+        for n in (1, 2, 3):
+            store.insert(entry(n))
+        store.update(entry(2, title="edited"))
+        store.delete("e1")
+        store.write_many([("insert", entry(4)), ("update", entry(3, content="new body")), ("delete", "e4")])
+
+        entries = self.reload()
+        self.assertEqual([e["id"] for e in entries], ["e3", "e2"])  # inserts go on top
+        self.assertEqual(entries[1]["title"], "edited")
+        self.assertEqual(entries[0]["content"], "new body")
+
+    def test_compaction_folds_the_log_into_the_snapshot(self):
+        store = self.open(compact_every=3)
+        entries = store.load()
+        for n in (1, 2, 3):
+            entries.insert(0, entry(n))
+            store.insert(entries[0])  # the third record compacts
+        self.assertEqual(os.path.getsize(store.log_path), 0)
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["seq"], store.seq)
+
+        lazy = self.reload(lazy=True)
+        self.assertTrue(all(isinstance(e, LazyEntry) for e in lazy))
+        self.assertEqual([(e["id"], e["content"]) for e in lazy],
+                         [("e3", "body 3"), ("e2", "body 2"), ("e1", "body 1")])
+
+    def test_records_before_the_snapshot_seq_are_not_replayed_twice(self):
+        store = self.open()
+        entries = store.load()
+        entries.insert(0, entry(1))
+        store.insert(entries[0])
+        with open(store.log_path, "rb") as f:
+            log = f.read()
+        store.compact()
+        with open(store.log_path, "ab") as f:
+            f.write(log)  # a crash between the snapshot rename and the log truncate
+        self.assertEqual([e["id"] for e in self.reload()], ["e1"])
+
+    def test_torn_tail_is_dropped_and_the_next_write_starts_clean(self):
+        store = self.open()
+        store.load()
+        store.insert(entry(1))
+        store.close()
+        with open(store.log_path, "ab") as f:
+            f.write(b'{"op": "insert", "at": 0, "entry": {"id": "e2", "tit')  # crashed mid-append
+
+        again = self.open()
+        self.assertEqual([e["id"] for e in again.load()], ["e1"])
+        again.insert(entry(3))
+        self.assertEqual([e["id"] for e in self.reload()], ["e3", "e1"])
+
+    def test_other_writers_records_are_reported(self):
+        ours, theirs = self.open(), self.open()
+        ours.load()
+        theirs.load()
+        seen = []
+        ours.on_external = seen.append
+        theirs.insert(entry(1))
+        ours.insert(entry(2))
+        self.assertEqual([[r["entry"]["id"] for r in records] for records in seen], [["e1"]])
+        self.assertEqual(sorted(e["id"] for e in self.reload()), ["e1", "e2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
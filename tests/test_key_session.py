@@ -0,0 +1,66 @@
+# test_key_session.py
+# KeySession (key_session.py) opening every blob format. Needs the cryptography package.
+#
+#   python -m pytest tests
+
+import base64
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+SALT = b"0123456789abcdef"
+
+
+@unittest.skipIf(Fernet is None, "cryptography not installed")
+class KeySessionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from key_session import KeySession
+        cls.session = KeySession("secret", SALT)  # one PBKDF2 run for the whole class
+
+    def test_v3_round_trip(self):
+        for text in ("short", "a long, very compressible body. " * 200, "unicode — ✓"):
+            blob = self.session.encrypt(text)
+            self.assertEqual(blob["v"], 3)
+            self.assertFalse(self.session.is_legacy(blob))
+            self.assertEqual(self.session.decrypt(blob), text)
+
+    def test_v2_blob(self):
+        from utils import derive_entry_key
+        salt = os.urandom(16)
+        token = Fernet(derive_entry_key(bytes(self.session._master), salt)).encrypt("older entry".encode())
+        blob = {"v": 2, "salt": base64.urlsafe_b64encode(salt).decode(), "token": base64.b64encode(token).decode()}
+        self.assertFalse(self.session.is_legacy(blob))
+        self.assertEqual(self.session.decrypt(blob), "older entry")
+
+    def test_legacy_blob(self):
+        from utils import encrypt_text
+        blob = encrypt_text("secret", "oldest entry")  # per-entry salt, full PBKDF2
+        self.assertTrue(self.session.is_legacy(blob))
+        self.assertEqual(self.session.decrypt(blob), "oldest entry")
+
+    def test_other_password_cannot_decrypt(self):
+        from key_session import KeySession
+        other = KeySession("wrong", SALT)
+        with self.assertRaises(InvalidToken):
+            other.decrypt(self.session.encrypt("private"))
+
+    def test_wiped_session_refuses(self):
+        from key_session import KeySession
+        session = KeySession("secret", SALT)
+        blob = session.encrypt("x")
+        session.wipe()
+        self.assertFalse(session.active)
+        with self.assertRaises(RuntimeError):
+            session.decrypt(blob)
+
+
+if __name__ == "__main__":
+    unittest.main()
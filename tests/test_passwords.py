@@ -0,0 +1,104 @@
+# test_passwords.py
+# Versioned password hashes (passwords.py) and their upgrade on login (auth.py).
+#
+#   python -m pytest tests
+
+import base64
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+import passwords  # noqa: E402
+import storage  # noqa: E402
+from passwords import (LEGACY_ITERATIONS, calibrate, hash_password, needs_rehash,  # noqa: E402
+                       parse_hash, verify_password)
+
+FAST = {"algorithm": "pbkdf2-sha256", "i": 1000}
+
+
+def legacy_hash(password, salt=b"0123456789abcdef"):
+    key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, LEGACY_ITERATIONS)
+    return base64.b64encode(salt + key).decode()
+
+
+class HashFormatTest(unittest.TestCase):
+    def test_pbkdf2_round_trip(self):
+        stored = hash_password("secret", FAST)
+        self.assertTrue(stored.startswith("$pbkdf2-sha256$i=1000$"))
+        self.assertEqual(parse_hash(stored)[0], FAST)
+        self.assertTrue(verify_password(stored, "secret"))
+        self.assertFalse(verify_password(stored, "Secret"))
+
+    def test_scrypt_round_trip(self):
+        params = {"algorithm": "scrypt", "n": 1 << 10, "r": 8, "p": 1}
+        stored = hash_password("secret", params)
+        self.assertTrue(stored.startswith("$scrypt$n=1024,r=8,p=1$"))
+        self.assertTrue(verify_password(stored, "secret"))
+        self.assertFalse(verify_password(stored, "other"))
+
+    def test_legacy_hash_verifies_and_needs_rehash(self):
+        stored = legacy_hash("secret")
+        self.assertTrue(verify_password(stored, "secret"))
+        self.assertTrue(needs_rehash(stored, FAST))
+
+    def test_needs_rehash_when_parameters_change(self):
+        stored = hash_password("secret", FAST)
+        self.assertFalse(needs_rehash(stored, FAST))
+        self.assertTrue(needs_rehash(stored, {"algorithm": "pbkdf2-sha256", "i": 2000}))
+
+    def test_unknown_or_damaged_hashes_never_verify(self):
+        for stored in ("$argon9$t=3$c2FsdA$a2V5", "$pbkdf2-sha256$x=1$c2FsdA$a2V5", "$only$two", "not base64!"):
+            self.assertFalse(verify_password(stored, "secret"), stored)
+
+    def test_calibrate(self):
+        pbkdf2 = calibrate(1)
+        self.assertEqual(pbkdf2["algorithm"], "pbkdf2-sha256")
+        self.assertGreaterEqual(pbkdf2["i"], LEGACY_ITERATIONS)  # never below the old cost
+        self.assertEqual(calibrate(1, "scrypt"), {"algorithm": "scrypt", "n": 1 << 14, "r": 8, "p": 1})
+        with self.assertRaises(ValueError):
+            calibrate(1, "md5")
+
+
+class RehashOnLoginTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # users.jsonl is relative to the working directory
+        storage._driver = None
+        passwords._params = dict(FAST)
+
+    def tearDown(self):
+        storage._driver = None
+        passwords._params = None
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def stored(self, username):
+        return storage.get_driver().get_user(username)["password"]
+
+    def test_login_upgrades_to_the_current_parameters(self):
+        auth.signup("bob", "secret")
+        passwords._params = {"algorithm": "pbkdf2-sha256", "i": 2000}
+        self.assertTrue(auth.login("bob", "secret")[0])
+        self.assertTrue(self.stored("bob").startswith("$pbkdf2-sha256$i=2000$"))
+        self.assertTrue(auth.login("bob", "secret")[0])
+
+    def test_login_upgrades_a_legacy_hash(self):
+        storage.get_driver().add_user("ann", {"password": legacy_hash("secret")})
+        self.assertFalse(auth.login("ann", "wrong")[0])
+        self.assertFalse(self.stored("ann").startswith("$"))  # no upgrade without the password
+        self.assertTrue(auth.login("ann", "secret")[0])
+        self.assertTrue(self.stored("ann").startswith("$pbkdf2-sha256$i=1000$"))
+
+    def test_login_with_an_unknown_algorithm_fails_cleanly(self):
+        storage.get_driver().add_user("cat", {"password": "$argon9$t=3$c2FsdA$a2V5"})
+        self.assertEqual(auth.login("cat", "secret"), (False, "Incorrect password!"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+# test_search_index.py
+# Tests for the inverted index (search_index.py).
+#
+#   python -m pytest tests
+
+import os
+import random
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex  # noqa: E402
+
+WORDS = ["alpha", "beta", "gamma", "mail", "travel", "trip"]
+
+
+def entry(rng, i):
+    content = " ".join(rng.choice(WORDS) + str(rng.randint(0, 30)) for _ in range(20))
+    return {"id": str(i), "title": "t", "content": content, "locked": False}
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.rebuild([
+            {"id": "1", "title": "Inbox", "content": "sent an e-mail to mom", "locked": False},
+            {"id": "2", "title": "Zoo", "content": "the elephant mailed a card", "locked": False},
+            {"id": "3", "title": "Letters", "content": "e is for elephant", "locked": False},
+        ])
+
+    def test_prefix_of_a_hyphenated_word_keeps_every_token(self):
+        # e-mail* is the term "e" plus the prefix "mail", not the prefix "e"
+        self.assertEqual(self.index.search("e-mail*"), ["1"])
+        self.assertEqual(self.index.search("e-mai*", within={"1", "2"}), ["1"])
+        self.assertEqual(self.index.search("e-ele*"), ["3"])
+
+
+class ConcurrencyTest(unittest.TestCase):
+    def test_search_on_a_worker_while_entries_change(self):
+        # what the dashboard's live search does: query on a worker, index edits on the UI thread
+        rng = random.Random(7)
+        index = SearchIndex()
+        index.rebuild([entry(rng, i) for i in range(2000)])
+        stop, errors = threading.Event(), []
+
+        def search():
+            while not stop.is_set():
+                try:
+                    index.search('al* "beta1 gamma2" tr*')
+                except Exception as exc:
+                    errors.append(exc)
+
+        worker = threading.Thread(target=search)
+        worker.start()
+        try:
+            for _ in range(5000):
+                i = rng.randint(0, 2500)
+                if rng.random() < 0.5:
+                    index.add(entry(rng, i))
+                else:
+                    index.remove(str(i))
+        finally:
+            stop.set()
+            worker.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
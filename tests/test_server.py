@@ -0,0 +1,98 @@
+# test_server.py
+# The HTTP API (server.py) answering bad requests, run against a temporary data folder.
+#
+#   python -m pytest tests
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+import passwords  # noqa: E402
+import storage  # noqa: E402
+from server import DiaryServer  # noqa: E402
+
+
+def request(method, path, body=None, token=None, length=None):
+    data = b"" if body is None else json.dumps(body).encode()
+    head = f"{method} {path} HTTP/1.1\r\nConnection: close\r\nContent-Length: {length or len(data)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    return head.encode() + b"\r\n" + data
+
+
+async def send(port, raw):
+    """(status, decoded JSON body or None)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(body) if body else None
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # data/ and users.jsonl are relative to the working directory
+        storage._driver = None
+        passwords._params = {"algorithm": "pbkdf2-sha256", "i": 1000}  # fast hashes
+        auth.signup("bob", "secret")
+
+    def tearDown(self):
+        storage._driver = None
+        passwords._params = None
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_with_server(self, scenario):
+        async def main():
+            server = DiaryServer(2)
+            _, port = await server.start("127.0.0.1", 0)
+            try:
+                return await scenario(port)
+            finally:
+                await server.close()
+        return asyncio.run(main())
+
+    def login(self, port):
+        return send(port, request("POST", "/api/login", {"username": "bob", "password": "secret"}))
+
+    def test_bad_content_length_is_400(self):
+        async def scenario(port):
+            return [(await send(port, request("POST", "/api/login", length=bad)))[0] for bad in ("abc", "-5")]
+        self.assertEqual(self.run_with_server(scenario), [400, 400])
+
+    def test_login_checks_the_username(self):
+        async def scenario(port):
+            return await send(port, request("POST", "/api/login", {"username": "../bob", "password": "x"}))
+        self.assertEqual(self.run_with_server(scenario)[0], 400)
+
+    def test_entry_dates_are_validated(self):
+        async def scenario(port):
+            token = (await self.login(port))[1]["token"]
+            statuses = []
+            for day in ("garbage", "2024-02-30", "2024-02-29"):
+                body = {"title": "t", "content": "c", "date": day}
+                statuses.append((await send(port, request("POST", "/api/entries", body, token)))[0])
+            return statuses
+        self.assertEqual(self.run_with_server(scenario), [400, 400, 201])
+
+    def test_missing_entry_is_404(self):
+        async def scenario(port):
+            token = (await self.login(port))[1]["token"]
+            return [(await send(port, request(method, "/api/entries/nope", body, token)))[0]
+                    for method, body in (("GET", None), ("PUT", {"title": "t", "content": "c"}),
+                                         ("DELETE", None))]
+        self.assertEqual(self.run_with_server(scenario), [404, 404, 404])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+# test_sqlite_store.py
+# Regression tests for the SQLite driver (sqlite_store.py).
+#
+#   python -m pytest tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_store import SqliteDriver, SqliteEntryStore, fts_query  # noqa: E402
+
+
+class CompactTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.driver = SqliteDriver(os.path.join(self.tmp.name, "diary.db"))
+
+    def tearDown(self):
+        self.driver.conn.close()
+        self.tmp.cleanup()
+
+    def test_compact_keeps_bodies_of_lazy_entries(self):
+        store = SqliteEntryStore(self.driver, "alice")
+        for i in range(3):
+            store.insert({"title": f"t{i}", "content": f"body {i}", "date": f"2025-01-0{i + 1}", "locked": False})
+
+        # what DiaryService.persist() does with a lazily loaded diary
+        lazy = SqliteEntryStore(self.driver, "alice")
+        lazy.compact([e.copy() for e in lazy.load(lazy=True)])
+
+        reloaded = SqliteEntryStore(self.driver, "alice").load()
+        self.assertEqual(sorted(e["content"] for e in reloaded), ["body 0", "body 1", "body 2"])
+
+
+class FtsQueryTest(unittest.TestCase):
+    def test_prefix_keeps_the_earlier_tokens(self):
+        self.assertEqual(fts_query("e-mail*"), '"e" AND "mail"*')
+        self.assertEqual(fts_query('trip* "new york"'), '"trip"* AND "new york"')
+
+
+if __name__ == "__main__":
+    unittest.main()
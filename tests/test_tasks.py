@@ -0,0 +1,98 @@
+# test_tasks.py
+# TaskScheduler (tasks.py) driven by a fake Tk root.
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tasks import TaskScheduler  # noqa: E402
+
+
+class FakeRoot:
+    """Collects after() callbacks; run() fires them like the Tk loop would."""
+
+    def __init__(self):
+        self.pending = []
+        self.errors = []
+
+    def after(self, ms, fn):
+        self.pending.append(fn)
+        return len(self.pending)
+
+    def after_cancel(self, timer):
+        pass
+
+    def report_callback_exception(self, exc_type, exc, tb):
+        self.errors.append(exc)
+
+    def run(self, until, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            time.sleep(0.01)
+            pending, self.pending = self.pending, []
+            for fn in pending:
+                fn()
+
+
+def boom():
+    raise ValueError("boom")
+
+
+class PollTest(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.tasks = TaskScheduler(self.root, workers=1)
+
+    def tearDown(self):
+        self.tasks.shutdown()
+
+    def test_error_without_handler_keeps_delivering(self):
+        got = []
+        self.tasks.submit(boom)
+        self.root.run(lambda: self.root.errors)
+        self.tasks.submit(lambda: 42, on_done=got.append)
+        self.root.run(lambda: got)
+        self.assertEqual(got, [42])
+        self.assertIsInstance(self.root.errors[0], ValueError)
+
+    def test_failing_call_soon_keeps_delivering(self):
+        got = []
+        self.tasks.submit(time.sleep, 0.05, on_done=lambda _: got.append("done"))
+        self.tasks.call_soon(boom)
+        self.root.run(lambda: got)
+        self.assertEqual(got, ["done"])
+        self.assertEqual(len(self.root.errors), 1)
+
+
+class CancelTest(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.tasks = TaskScheduler(self.root, workers=1)
+
+    def tearDown(self):
+        self.tasks.shutdown()
+
+    def test_cancel_by_key_drops_batches_still_in_flight(self):
+        # the dashboard's streamed live search, replaced by "View All Notes" mid-stream
+        shown, done = [], []
+
+        def work(report):
+            report([1, 2])
+            time.sleep(0.05)
+            report([3, 4])  # after the cancel
+            return "ids"
+
+        self.tasks.submit(work, on_progress=shown.extend, on_done=done.append, key="search")
+        self.root.run(lambda: shown)
+        self.tasks.cancel("search")
+        self.root.run(lambda: not self.tasks.pending(), timeout=1.0)
+        self.root.run(lambda: False, timeout=0.1)  # deliver anything left in the queue
+        self.assertEqual(shown, [1, 2])
+        self.assertEqual(done, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
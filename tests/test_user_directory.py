@@ -0,0 +1,37 @@
+# test_user_directory.py
+# Tests for the append-only account directory (user_directory.py).
+#
+#   python -m pytest tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_directory import UserDirectory  # noqa: E402
+
+
+class TornTailTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "users.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_add_after_a_partial_line_keeps_the_new_record(self):
+        UserDirectory(self.path).add("alice", {"password": "a"})
+        with open(self.path, "ab") as f:
+            f.write(b'{"user": "bob", "rec')  # a writer crashed mid-append
+
+        self.assertTrue(UserDirectory(self.path).add("carol", {"password": "c"}))
+
+        reloaded = UserDirectory(self.path)
+        self.assertEqual(sorted(reloaded.all()), ["alice", "carol"])
+        self.assertEqual(reloaded.get("carol"), {"password": "c"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+# user_directory.py
+# Append-only account directory with an in-process cache.
+#
+# users.jsonl holds one {"user": name, "record": {...}} line per change and
+# the last line for a name wins, so a signup appends one line instead of
+# rewriting every account. The parsed directory stays in memory; a stat()
+# per call tells whether another process appended (read just the new tail)
+# or rewrote the file (read it again).
+
+import json
+import os
+import threading
+from fileio import atomic_write, file_stamp, locked
+
+
+class UserDirectory:
+    """Accounts keyed by username; get/add/put are O(1) plus one stat()."""
+
+    def __init__(self, path: str, legacy_path: str = None, compact_slack: int = 1000):
+        self.path = path
+        self.legacy_path = legacy_path  # users.json imported on first use
+        self.compact_slack = compact_slack
+        self._users = {}
+        self._stamp = False  # never read yet (None means "no file")
+        self._pos = 0      # bytes of the log already parsed
+        self._lines = 0    # records in the log (superseded ones included)
+        self._guard = threading.RLock()  # threads of one process (e.g. server.py) share the cache
+
+    # ---------------- reading ----------------
+    def _refresh(self):
+        with self._guard:
+            self._refresh_locked()
+
+    def _refresh_locked(self):
+        stamp = file_stamp(self.path)
+        if stamp == self._stamp:
+            return
+        if stamp is None:
+            self._migrate()
+            stamp = file_stamp(self.path)
+            if stamp is None:
+                self._users, self._stamp, self._pos, self._lines = {}, None, 0, 0
+                return
+        if not self._stamp or stamp[0] != self._stamp[0] or stamp[2] < self._pos:
+            # new file (rewritten by a compaction): start over
+            self._users, self._pos, self._lines = {}, 0, 0
+        self._read_tail()
+        self._stamp = file_stamp(self.path)
+
+    def _read_tail(self):
+        with open(self.path, "rb") as f:
+            f.seek(self._pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer is mid-append (or crashed); read it next time
+                self._pos += len(line)
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                self._lines += 1
+                if rec.get("record") is None:
+                    self._users.pop(rec["user"], None)
+                else:
+                    self._users[rec["user"]] = rec["record"]
+
+    def _migrate(self):
+        """Create the log from the legacy users.json, if there is one."""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        with locked(self.path):
+            if os.path.exists(self.path):
+                return
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                users = json.load(f)
+            self._write_all(users)
+
+    def get(self, username: str):
+        self._refresh()
+        record = self._users.get(username)
+        return dict(record) if record is not None else None
+
+    def all(self) -> dict:
+        self._refresh()
+        return {name: dict(record) for name, record in self._users.items()}
+
+    def __contains__(self, username):
+        self._refresh()
+        return username in self._users
+
+    def __len__(self):
+        self._refresh()
+        return len(self._users)
+
+    # ---------------- writing ----------------
+    def add(self, username: str, record: dict) -> bool:
+        """Create an account; False if the name is taken (checked under the lock)."""
+        with self._guard, locked(self.path):
+            self._refresh()
+            if username in self._users:
+                return False
+            self._append(username, record)
+        return True
+
+    def put(self, username: str, record: dict):
+        with self._guard, locked(self.path):
+            self._refresh()
+            self._append(username, record)
+
+    def update(self, username: str, change):
+        """Atomic read-modify-write: change(record) edits a copy in place.
+
+        Only writes if the record actually changed. Returns the new record.
+        """
+        with self._guard, locked(self.path):
+            self._refresh()
+            old = self._users[username]
+            record = json.loads(json.dumps(old))
+            change(record)
+            if record != old:
+                self._append(username, record)
+        return dict(record)
+
+    def replace_all(self, users: dict):
+        """Rewrite the directory with exactly `users`."""
+        with self._guard, locked(self.path):
+            self._write_all(users)
+            self._stamp = None
+            self._refresh()
+
+    def _append(self, username, record):
+        """Append one record (file lock held, directory just refreshed)."""
+        line = json.dumps({"user": username, "record": record}, ensure_ascii=False).encode("utf-8") + b"\n"
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self._pos:
+            # a writer died mid-append: drop its partial line so ours starts on a clean one
+            with open(self.path, "r+b") as f:
+                f.truncate(self._pos)
+        with open(self.path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._pos += len(line)
+        self._lines += 1
+        self._users[username] = record
+        self._stamp = file_stamp(self.path)
+        if self._lines - len(self._users) > self.compact_slack:
+            self.compact()
+
+    def compact(self):
+        """Drop superseded records (one line per live account)."""
+        with self._guard, locked(self.path):
+            self._refresh()
+            self._write_all(self._users)
+            self._stamp = None
+            self._refresh()
+
+    def _write_all(self, users):
+        data = "".join(json.dumps({"user": u, "record": r}, ensure_ascii=False) + "\n"
+                       for u, r in users.items())
+        atomic_write(self.path, data)
@@ -1,28 +1,14 @@
 # utils.py
-# Helpers: date parsing + encryption helpers (Fernet key derivation)
+# Helpers: encryption helpers (Fernet key derivation); date parsing lives in dates.py
 
 import base64
-import re
-from datetime import datetime
-from typing import Optional
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes
 from cryptography.fernet import Fernet
 from cryptography.hazmat.backends import default_backend
 
 
-def parse_date(date_str: Optional[str]):
-    """Validate YYYY-MM-DD or return None."""
-    if not date_str:
-        return None
-    date_str = date_str.strip()
-    if re.match(r"^\d{4}-\d{2}-\d{2}$", date_str):
-        # will raise ValueError if invalid date
-        datetime.strptime(date_str, "%Y-%m-%d")
-        return date_str
-    raise ValueError("Date must be YYYY-MM-DD")
-
-
 def derive_key_from_password(password: str, salt: bytes) -> bytes:
     """Derive a Fernet-compatible 32-byte key from a password and salt."""
     # PBKDF2HMAC to derive 32 bytes, then base64-url-safe for Fernet
@@ -37,6 +23,18 @@ def derive_key_from_password(password: str, salt: bytes) -> bytes:
     return base64.urlsafe_b64encode(key)
 
 
+def derive_entry_key(master_key: bytes, salt: bytes) -> bytes:
+    """Cheap per-entry Fernet key: HKDF-SHA256 over an already-stretched master key."""
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b"diary-entry-v2",
+        backend=default_backend(),
+    )
+    return base64.urlsafe_b64encode(hkdf.derive(master_key))
+
+
 def encrypt_text(password: str, plaintext: str) -> dict:
     """
     Encrypt plaintext with a password.
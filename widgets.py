@@ -0,0 +1,237 @@
+# widgets.py
+# Reusable CustomTkinter widgets for the dashboard.
+
+import math
+import customtkinter as ctk
+from tkinter import filedialog
+import instrument
+from analytics import format_summary
+
+
+class VirtualList(ctk.CTkFrame):
+    """Scrollable list that only renders the rows in view.
+
+    `items` can be any sequence (list, lazy view, ...). A fixed pool of row
+    buttons, sized to the viewport, is recycled as the list scrolls, so
+    set_items() and scrolling cost O(visible rows) whatever the length.
+
+    format_row(item) -> (text, fg_color)
+    on_select(position, items) is called when a row is clicked.
+    """
+
+    def __init__(self, master, format_row, on_select, row_height=36, height=300, **kwargs):
+        super().__init__(master, height=height, **kwargs)
+        self.pack_propagate(False)
+        self.format_row = format_row
+        self.on_select = on_select
+        self.row_height = row_height
+        self.items = []
+        self.offset = 0
+        self.pool = []
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y", pady=4)
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.rows_frame.pack(side="left", fill="both", expand=True)
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+        self.empty_label = ctk.CTkLabel(self.rows_frame, text="")
+
+        self.rows_frame.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.rows_frame)
+
+    # ---------------- public API ----------------
+    def set_items(self, items, empty_text="No entries found."):
+        self.items = items
+        self.offset = 0
+        self.empty_label.configure(text=empty_text)
+        self.redraw()
+
+    def extend(self, more):
+        """Append items to the current list (e.g. streamed search results)."""
+        visible = len(self.items) < self.offset + len(self.pool)
+        self.items.extend(more)
+        if visible:
+            self.redraw()
+        else:
+            self._update_scrollbar()
+
+    def redraw(self):
+        """Re-render the visible window (call after items change in place)."""
+        total = len(self.items)
+        self.offset = max(0, min(self.offset, total - self._visible_rows()))
+        for k, btn in enumerate(self.pool):
+            pos = self.offset + k
+            if pos < total:
+                text, color = self.format_row(self.items[pos])
+                btn.configure(text=text, fg_color=color, command=lambda p=pos: self._select(p))
+                btn.grid(row=k, column=0, sticky="ew", padx=10, pady=4)
+            else:
+                btn.grid_remove()
+
+        if total == 0:
+            self.empty_label.grid(row=0, column=0, pady=10)
+        else:
+            self.empty_label.grid_remove()
+        self._update_scrollbar()
+
+    def refresh_rows(self, changed):
+        """Re-render just the visible rows whose item satisfies changed(item); returns how many."""
+        total = len(self.items)
+        count = 0
+        for k, btn in enumerate(self.pool):
+            pos = self.offset + k
+            if pos < total and changed(self.items[pos]):
+                text, color = self.format_row(self.items[pos])
+                btn.configure(text=text, fg_color=color)
+                count += 1
+        return count
+
+    def scroll_to(self, position):
+        self.offset = position
+        self.redraw()
+
+    # ---------------- internals ----------------
+    def _visible_rows(self):
+        return max(1, len(self.pool))
+
+    def _select(self, position):
+        if position < len(self.items):
+            self.on_select(position, self.items)
+
+    def _on_resize(self, event):
+        wanted = max(1, math.ceil(event.height / (self.row_height + 8)))
+        while len(self.pool) < wanted:
+            btn = ctk.CTkButton(self.rows_frame, text="", height=self.row_height, corner_radius=4,
+                                text_color="#E6E1E1", hover_color="#536B61", anchor="w")
+            self._bind_wheel(btn)
+            self.pool.append(btn)
+        for btn in self.pool[wanted:]:
+            btn.destroy()
+        del self.pool[wanted:]
+        self.redraw()
+
+    def _update_scrollbar(self):
+        total = len(self.items)
+        if total == 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        first = self.offset / total
+        last = min(1.0, (self.offset + len(self.pool)) / total)
+        self.scrollbar.set(first, last)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        total = len(self.items)
+        if action == "moveto":
+            self.offset = int(float(amount) * total)
+        elif unit == "pages":
+            self.offset += int(amount) * self._visible_rows()
+        else:
+            self.offset += int(amount)
+        self.redraw()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", lambda e: self._on_scrollbar("scroll", -3))
+        widget.bind("<Button-5>", lambda e: self._on_scrollbar("scroll", 3))
+
+    def _on_wheel(self, event):
+        step = -3 if event.delta > 0 else 3
+        self._on_scrollbar("scroll", step)
+
+
+class DiagnosticsPanel(ctk.CTkToplevel):
+    """Hidden tracing panel (Ctrl+Shift+D in the dashboard).
+
+    Shows latency percentiles per traced name, toggles tracing and the
+    cProfile / tracemalloc captures, and exports what was collected.
+    """
+
+    REFRESH_MS = 1000
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Diagnostics")
+        self.geometry("760x480")
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=8, pady=6)
+        self.trace_switch = ctk.CTkSwitch(bar, text="Tracing", command=self._toggle_tracing)
+        self.trace_switch.pack(side="left", padx=4)
+        if instrument.enabled():
+            self.trace_switch.select()
+        self.profile_btn = ctk.CTkButton(bar, text="Start profile", width=110, command=self._toggle_profile)
+        self.profile_btn.pack(side="left", padx=4)
+        self.memory_btn = ctk.CTkButton(bar, text="Start memory", width=110, command=self._toggle_memory)
+        self.memory_btn.pack(side="left", padx=4)
+        ctk.CTkButton(bar, text="Reset", width=70, command=instrument.reset).pack(side="left", padx=4)
+        ctk.CTkButton(bar, text="Export...", width=80, command=self._export).pack(side="left", padx=4)
+
+        self.text = ctk.CTkTextbox(self, font=("Courier", 11), wrap="none")
+        self.text.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+        self._report = ""  # last profiler / memory report, shown under the table
+        self._refresh()
+
+    def _toggle_tracing(self):
+        instrument.set_enabled(self.trace_switch.get())
+
+    def _toggle_profile(self):
+        if instrument.profiling():
+            path = filedialog.asksaveasfilename(parent=self, defaultextension=".prof",
+                                                initialfile="diary.prof", filetypes=[("cProfile", "*.prof")])
+            self._report = instrument.stop_profile(path or None)
+            self.profile_btn.configure(text="Start profile")
+        else:
+            instrument.start_profile()
+            self.profile_btn.configure(text="Stop profile")
+
+    def _toggle_memory(self):
+        if self.memory_btn.cget("text") == "Stop memory":
+            self._report = instrument.stop_memory()
+            self.memory_btn.configure(text="Start memory")
+        else:
+            instrument.start_memory()
+            self.memory_btn.configure(text="Stop memory")
+
+    def _export(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                            initialfile="diary_diagnostics.json", filetypes=[("JSON", "*.json")])
+        if path:
+            instrument.export(path)
+
+    def _refresh(self):
+        if not self.winfo_exists():
+            return
+        text = instrument.format_table()
+        if self._report:
+            text += "\n\n" + self._report
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", text)
+        self.text.configure(state="disabled")
+        self.after(self.REFRESH_MS, self._refresh)
+
+
+class StatsPanel(ctk.CTkToplevel):
+    """Writing statistics (the dashboard's Statistics button).
+
+    Shows analytics.format_summary() of load(), which reads the service's
+    cached aggregates; the dashboard calls refresh() after entries change.
+    """
+
+    def __init__(self, master, load):
+        super().__init__(master)
+        self.title("Statistics")
+        self.geometry("640x560")
+        self.load = load
+        self.text = ctk.CTkTextbox(self, font=("Courier", 11), wrap="none")
+        self.text.pack(fill="both", expand=True, padx=8, pady=8)
+        self.refresh()
+
+    @instrument.traced("ui.stats_panel")
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", format_summary(self.load()))
+        self.text.configure(state="disabled")